@@ -0,0 +1,37 @@
+from django.db.models import Aggregate, Avg, DurationField
+
+
+class Percentile(Aggregate):
+    """
+    PostgreSQL ``percentile_cont`` ordered-set aggregate.
+    """
+    function = 'PERCENTILE_CONT'
+    name = 'Percentile'
+    template = '%(function)s(%(percentile)s) WITHIN GROUP (ORDER BY %(expressions)s)'
+    
+    def __init__(self, expression, percentile, **extra):
+        if not 0 <= percentile <= 1:
+            raise ValueError('Percentile must be between 0 and 1.')
+        super().__init__(expression, percentile=float(percentile), **extra)
+
+
+def duration_aggregates(field='duration', percentiles=(0.5, 0.9)):
+    """
+    Aggregate expressions for a duration annotation, usable with
+    ``aggregate()`` or with ``values(...).annotate()`` for grouped results.
+    """
+    aggregates = {'average': Avg(field, output_field=DurationField())}
+    for percentile in percentiles:
+        aggregates[f'p{round(percentile * 100)}'] = Percentile(
+            field, percentile, output_field=DurationField()
+        )
+    return aggregates
+
+
+def to_minutes(duration):
+    """
+    Convert a timedelta to minutes, keeping ``None`` as is.
+    """
+    if duration is None:
+        return None
+    return round(duration.total_seconds() / 60, 2)
@@ -0,0 +1,133 @@
+"""
+Time-bucketed delivery analytics.
+
+Buckets are grouped with ``date_trunc`` over ``created_at``. Closed buckets
+are cached individually and only dropped when a delivery is created inside
+them or one created inside them changes status or is deleted, so a request recomputes just the current bucket and any
+buckets that are not cached yet.
+"""
+from datetime import timedelta
+
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from sajilo_life import cache
+from .models import DeliveryRequest
+
+INTERVALS = {
+    'hour': (TruncHour, timedelta(hours=1)),
+    'day': (TruncDay, timedelta(days=1)),
+}
+
+DEFAULT_RANGES = {
+    'hour': timedelta(days=1),
+    'day': timedelta(days=30),
+}
+
+MAX_BUCKETS = 2000
+
+
+def bucket_start(value, interval):
+    """
+    Start of the bucket containing ``value``.
+    """
+    value = timezone.localtime(value)
+    if interval == 'hour':
+        return value.replace(minute=0, second=0, microsecond=0)
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def bucket_starts(interval, start, end):
+    """
+    Starts of every bucket overlapping ``[start, end)``.
+    """
+    step = INTERVALS[interval][1]
+    starts = []
+    current = bucket_start(start, interval)
+    while current < end:
+        starts.append(current)
+        current += step
+    return starts
+
+
+def _bucket_key(interval, start):
+    return f'api:{cache.DELIVERY_ANALYTICS}:{interval}:{start.isoformat()}'
+
+
+def invalidate_buckets(created_at):
+    """
+    Drop the cached buckets that contain a delivery created at ``created_at``.
+    """
+    cache.get_cache().delete_many([
+        _bucket_key(interval, bucket_start(created_at, interval))
+        for interval in INTERVALS
+    ])
+
+
+def _count_buckets(interval, start, end):
+    trunc = INTERVALS[interval][0]
+    rows = DeliveryRequest.objects.filter(
+        created_at__gte=start,
+        created_at__lt=end
+    ).order_by().annotate(
+        bucket=trunc('created_at')
+    ).values('bucket').annotate(
+        total=Count('*'),
+        delivered=Count('status', filter=Q(status='delivered')),
+        cancelled=Count('status', filter=Q(status='cancelled')),
+    )
+    return {
+        row['bucket']: {
+            'total': row['total'],
+            'delivered': row['delivered'],
+            'cancelled': row['cancelled'],
+        }
+        for row in rows
+    }
+
+
+def _rate(count, total):
+    if total == 0:
+        return 0.0
+    return round((count / total) * 100, 2)
+
+
+def get_delivery_series(interval, start, end):
+    """
+    Volume, completion rate and cancellation rate per bucket.
+    """
+    step = INTERVALS[interval][1]
+    current = bucket_start(timezone.now(), interval)
+    starts = bucket_starts(interval, start, end)
+
+    store = cache.get_cache()
+    cached = store.get_many([_bucket_key(interval, b) for b in starts if b < current])
+    missing = [b for b in starts if _bucket_key(interval, b) not in cached]
+
+    counted = {}
+    if missing:
+        counted = _count_buckets(interval, missing[0], missing[-1] + step)
+
+    fresh = {}
+    series = []
+    for start_at in starts:
+        key = _bucket_key(interval, start_at)
+        counts = cached.get(key)
+        if counts is None:
+            counts = counted.get(start_at, {'total': 0, 'delivered': 0, 'cancelled': 0})
+            if start_at < current:
+                fresh[key] = counts
+        series.append({
+            'bucket': start_at,
+            'total': counts['total'],
+            'delivered': counts['delivered'],
+            'cancelled': counts['cancelled'],
+            'completion_rate': _rate(counts['delivered'], counts['total']),
+            'cancellation_rate': _rate(counts['cancelled'], counts['total']),
+        })
+
+    if fresh:
+        store.set_many(fresh, cache.get_ttl(cache.DELIVERY_ANALYTICS))
+
+    return series
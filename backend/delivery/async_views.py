@@ -0,0 +1,112 @@
+"""
+Async delivery read endpoints, served instead of their DRF views when
+``ASYNC_VIEWS`` is on (see ``sajilo_life/asyncviews.py``).
+"""
+from rest_framework import exceptions
+
+from sajilo_life import cache, pubsub, sse
+from sajilo_life.asyncviews import (
+    async_api_view, check_permissions, exception_response, render_response
+)
+from sajilo_life.conditional import make_etag, not_modified_response
+from sajilo_life.fastjson import FastJSONRenderer
+from users.permissions import IsOwnerOrPartnerOrAdmin
+
+from . import events, views
+from .aggregates import duration_aggregates
+from .changes import scope_for_user
+from .models import DeliveryRequest, DeliveryStatusChange
+from .serializers import DeliveryEventsQuerySerializer, DeliveryRequestSerializer
+
+
+@async_api_view(views.DeliveryRequestDetailView.as_view(), fallback_params=('fields', 'expand'))
+async def delivery_request_detail_view(request, pk):
+    """
+    Retrieve a delivery request.
+    """
+    try:
+        instance = await DeliveryRequest.objects.select_related(
+            'customer', 'partner__user'
+        ).aget(pk=pk)
+    except DeliveryRequest.DoesNotExist:
+        return exception_response(request, exceptions.NotFound())
+
+    response = check_permissions(request, [IsOwnerOrPartnerOrAdmin], instance)
+    if response is not None:
+        return response
+
+    # Same ETag as ConditionalRetrieveMixin
+    etag = make_etag(
+        type(instance).__name__,
+        request.accepted_media_type,
+        request.get_full_path(),
+        instance.pk,
+        instance.updated_at.isoformat()
+    )
+    response = not_modified_response(request, etag)
+    if response is not None:
+        return response
+
+    data = DeliveryRequestSerializer(instance).data
+    return render_response(request, data, headers={'ETag': etag})
+
+
+@async_api_view(views.delivery_statistics_view)
+async def delivery_statistics_view(request):
+    """
+    Get delivery statistics.
+    """
+    statistics = await cache.aget_or_compute(
+        cache.DELIVERY_STATISTICS, acompute_delivery_statistics
+    )
+    return render_response(request, statistics)
+
+
+async def acompute_delivery_statistics():
+    """
+    ``compute_delivery_statistics`` with the async ORM.
+    """
+    totals = await DeliveryRequest.objects.aaggregate(**views.statistics_aggregates())
+    delivery_times = await DeliveryStatusChange.objects.deliveries().aaggregate(
+        **duration_aggregates()
+    )
+    return views.build_delivery_statistics(totals, delivery_times)
+
+
+# Under ASGI a synchronous stream is buffered whole, so only the browsable
+# API is left to the DRF view
+@async_api_view(
+    views.delivery_events_view,
+    renderer_classes=sse.renderer_classes(),
+    async_renderer_classes=(FastJSONRenderer, sse.EventStreamRenderer)
+)
+async def delivery_events_view(request):
+    """
+    Push delivery events as server-sent events; see
+    ``views.delivery_events_view``.
+    """
+    serializer = DeliveryEventsQuerySerializer(data=request.GET)
+    if not serializer.is_valid():
+        return exception_response(request, exceptions.ValidationError(serializer.errors))
+    delivery_id = serializer.validated_data.get('delivery')
+    user = request.user
+
+    if delivery_id is not None:
+        deliveries, _ = scope_for_user(user)
+        if not await deliveries.filter(pk=delivery_id).aexists():
+            return render_response(request, {'error': 'Delivery request not found.'}, status=404)
+        channels = [events.delivery_channel(delivery_id)]
+    elif user.is_admin:
+        channels = [events.ALL_DELIVERIES]
+    elif user.is_partner:
+        from partners.models import DeliveryPartner
+        partner_id = await DeliveryPartner.objects.filter(user=user).values_list(
+            'pk', flat=True
+        ).afirst()
+        if partner_id is None:
+            return render_response(request, {'error': 'Partner profile not found.'}, status=404)
+        channels = [events.partner_channel(partner_id)]
+    else:
+        channels = [events.customer_channel(user.pk)]
+
+    return await sse.async_event_stream_response(await pubsub.asubscribe(channels))
@@ -0,0 +1,127 @@
+"""
+Delta sync: deliveries created, updated or deleted since a client cursor.
+
+The cursor is an opaque token holding the ``(updated_at, id)`` position of
+the last delivery and the ``(deleted_at, id)`` position of the last tombstone
+the client has seen. Rows newer than ``SETTLE_WINDOW`` are held back until
+the next request, so writes from transactions that were still in flight when
+the page was read are not skipped.
+"""
+import base64
+import json
+from datetime import datetime, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import DeliveryRequest, DeliveryTombstone
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+
+SETTLE_WINDOW = timedelta(seconds=2)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(position):
+    """
+    Encode a cursor position as an opaque URL-safe token.
+    """
+    payload = {
+        key: [value[0].isoformat(), value[1]] if value else None
+        for key, value in position.items()
+    }
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """
+    Decode a cursor token; an empty token means "from the beginning".
+    """
+    if not token:
+        return {'deliveries': None, 'tombstones': None}
+
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+        return {
+            key: (datetime.fromisoformat(payload[key][0]), int(payload[key][1]))
+            if payload.get(key) else None
+            for key in ('deliveries', 'tombstones')
+        }
+    except (ValueError, TypeError, KeyError, IndexError) as exc:
+        raise InvalidCursor('Invalid sync cursor.') from exc
+
+
+def scope_for_user(user):
+    """
+    Deliveries and tombstones visible to ``user`` in the changes feed.
+    """
+    deliveries = DeliveryRequest.objects.all()
+    tombstones = DeliveryTombstone.objects.all()
+
+    if user.is_admin:
+        return deliveries, tombstones
+    if user.is_partner:
+        return (
+            deliveries.filter(partner__user=user),
+            tombstones.filter(partner__user=user)
+        )
+    return deliveries.filter(customer=user), tombstones.filter(customer=user)
+
+
+def _after(queryset, field, position):
+    if position is None:
+        return queryset
+    timestamp, pk = position
+    return queryset.filter(
+        Q(**{f'{field}__gt': timestamp}) | Q(**{field: timestamp, 'pk__gt': pk})
+    )
+
+
+def get_changes(deliveries, tombstones, position, limit=DEFAULT_LIMIT):
+    """
+    Return the next batch of changes after ``position``.
+    """
+    settled = timezone.now() - SETTLE_WINDOW
+
+    changed = list(
+        _after(deliveries, 'updated_at', position['deliveries'])
+        .filter(updated_at__lt=settled)
+        .select_related('customer', 'partner__user')
+        .order_by('updated_at', 'pk')[:limit + 1]
+    )
+    if position['deliveries'] is None and position['tombstones'] is None:
+        # A first sync has nothing to delete; start the tombstone feed here
+        position = dict(position, tombstones=(settled, 0))
+    deleted = list(
+        _after(tombstones, 'deleted_at', position['tombstones'])
+        .filter(deleted_at__lt=settled)
+        .order_by('deleted_at', 'pk')[:limit + 1]
+    )
+
+    has_more = len(changed) > limit or len(deleted) > limit
+    changed = changed[:limit]
+    deleted = deleted[:limit]
+
+    since = position['deliveries'][0] if position['deliveries'] else None
+    created = [d for d in changed if since is None or d.created_at > since]
+    updated = [d for d in changed if since is not None and d.created_at <= since]
+
+    next_position = dict(position)
+    if changed:
+        next_position['deliveries'] = (changed[-1].updated_at, changed[-1].pk)
+    if deleted:
+        next_position['tombstones'] = (deleted[-1].deleted_at, deleted[-1].pk)
+
+    return {
+        'created': created,
+        'updated': updated,
+        'deleted': deleted,
+        'cursor': encode_cursor(next_position),
+        'has_more': has_more,
+    }
@@ -0,0 +1,42 @@
+"""
+Content digests for offline sync reconciliation.
+
+The digest is the SHA-256 hex of the canonical JSON of the synced fields:
+keys sorted, no whitespace, UTF-8, text fields as strings (missing -> ""),
+coordinates as fixed-point strings with 8 decimal places (missing -> null).
+Clients compute the same digest locally and only upload deliveries whose
+digest the server doesn't have.
+"""
+import hashlib
+import json
+from decimal import Decimal
+
+HASHED_TEXT_FIELDS = [
+    'pickup_address', 'dropoff_address', 'customer_name', 'customer_phone',
+    'delivery_notes'
+]
+
+HASHED_COORDINATE_FIELDS = ['pickup_lat', 'pickup_lng', 'dropoff_lat', 'dropoff_lng']
+
+HASHED_FIELDS = HASHED_TEXT_FIELDS + HASHED_COORDINATE_FIELDS
+
+COORDINATE_PLACES = Decimal('0.00000001')
+
+
+def _coordinate(value):
+    if value is None or value == '':
+        return None
+    return format(Decimal(str(value)).quantize(COORDINATE_PLACES), 'f')
+
+
+def content_hash(values):
+    """
+    Digest of the synced fields in ``values`` (a dict or a model instance).
+    """
+    get = values.get if isinstance(values, dict) else lambda name: getattr(values, name, None)
+
+    canonical = {name: get(name) or '' for name in HASHED_TEXT_FIELDS}
+    canonical.update({name: _coordinate(get(name)) for name in HASHED_COORDINATE_FIELDS})
+
+    payload = json.dumps(canonical, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
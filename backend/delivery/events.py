@@ -0,0 +1,109 @@
+"""
+Delivery events pushed to clients over the event stream.
+
+Events are published, after the transaction commits, to these channels:
+
+- ``delivery:<id>``: one delivery, for anyone watching it
+- ``customer:<user id>``: all of a customer's deliveries
+- ``partner:<partner id>``: deliveries assigned to a partner, or taken
+  away from them
+- ``deliveries``: every delivery, for admins
+
+Partner location updates are throttled to one event per partner every
+``EVENTS_LOCATION_INTERVAL`` seconds. They are only sent while the
+partner has an active delivery, to that delivery's watchers.
+"""
+from django.conf import settings
+
+from sajilo_life import cache, pubsub
+
+from .models import ACTIVE_STATUSES, DeliveryRequest
+
+ALL_DELIVERIES = 'deliveries'
+
+DEFAULT_LOCATION_INTERVAL = 5
+
+
+def delivery_channel(pk):
+    return f'delivery:{pk}'
+
+
+def customer_channel(user_id):
+    return f'customer:{user_id}'
+
+
+def partner_channel(partner_id):
+    return f'partner:{partner_id}'
+
+
+def delivery_channels(pk, customer_id, partner_ids=()):
+    channels = [ALL_DELIVERIES, delivery_channel(pk), customer_channel(customer_id)]
+    return channels + [partner_channel(partner_id) for partner_id in partner_ids if partner_id]
+
+
+def status_changed(results, new_status):
+    """
+    Publish the transitions applied by ``compare_and_set_statuses``.
+    """
+    for pk, result in results.items():
+        pubsub.publish_on_commit(
+            delivery_channels(pk, result['customer_id'], [result['partner_id']]),
+            {
+                'type': 'status',
+                'id': pk,
+                'status': new_status,
+                'from_status': result['from_status'],
+                'partner_id': result['partner_id'],
+                'version': result['version'],
+                'updated_at': result['updated_at'],
+            }
+        )
+
+
+def partner_assigned(delivery, previous_partner_id=None):
+    """
+    Publish a partner assignment; a partner it was taken from hears too.
+    """
+    pubsub.publish_on_commit(
+        delivery_channels(
+            delivery.pk, delivery.customer_id, [delivery.partner_id, previous_partner_id]
+        ),
+        {
+            'type': 'assigned',
+            'id': delivery.pk,
+            'status': delivery.status,
+            'partner_id': delivery.partner_id,
+            'previous_partner_id': previous_partner_id,
+            'version': delivery.version,
+            'updated_at': delivery.updated_at,
+        }
+    )
+
+
+def partner_moved(partner):
+    """
+    Publish a partner's new location to their active deliveries' watchers,
+    unless one was published within the throttle interval.
+    """
+    interval = getattr(settings, 'EVENTS_LOCATION_INTERVAL', DEFAULT_LOCATION_INTERVAL)
+    if not cache.get_cache().add(f'events:location:{partner.pk}', True, timeout=interval):
+        return False
+
+    deliveries = list(DeliveryRequest.objects.filter(
+        partner_id=partner.pk, status__in=ACTIVE_STATUSES
+    ).values_list('pk', 'customer_id'))
+    if not deliveries:
+        return False
+
+    channels = []
+    for pk, customer_id in deliveries:
+        channels += [delivery_channel(pk), customer_channel(customer_id)]
+    pubsub.publish_on_commit(channels, {
+        'type': 'location',
+        'partner_id': partner.pk,
+        'lat': float(partner.current_lat),
+        'lng': float(partner.current_lng),
+        'deliveries': [pk for pk, _ in deliveries],
+        'at': partner.last_active,
+    })
+    return True
@@ -0,0 +1,100 @@
+"""
+Streaming export of delivery requests as CSV or NDJSON.
+
+Rows are read as tuples with ``QuerySet.iterator(chunk_size=...)``, which
+uses a server-side cursor on PostgreSQL, and encoded one chunk at a time, so
+memory stays flat however many rows match. Used by the export endpoint and
+the ``export_deliveries`` management command.
+"""
+import csv
+import io
+
+from sajilo_life import fastjson, ndjson
+
+from .models import DeliveryRequest
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': ndjson.CONTENT_TYPE,
+}
+
+DEFAULT_CHUNK_SIZE = 5000
+
+COLUMNS = [
+    'id', 'status', 'customer_id', 'partner_id',
+    'pickup_address', 'pickup_lat', 'pickup_lng',
+    'dropoff_address', 'dropoff_lat', 'dropoff_lng',
+    'customer_name', 'customer_phone', 'delivery_notes',
+    'estimated_distance', 'estimated_duration', 'actual_distance', 'actual_duration',
+    'created_at', 'updated_at', 'is_synced', 'local_id', 'version',
+]
+
+DATETIME_COLUMNS = ('created_at', 'updated_at')
+
+
+def export_queryset(start=None, end=None, statuses=None, partner_id=None):
+    """
+    Delivery requests created in ``[start, end)``, as tuples of ``COLUMNS``.
+    """
+    queryset = DeliveryRequest.objects.all()
+    if start is not None:
+        queryset = queryset.filter(created_at__gte=start)
+    if end is not None:
+        queryset = queryset.filter(created_at__lt=end)
+    if statuses:
+        queryset = queryset.filter(status__in=statuses)
+    if partner_id is not None:
+        queryset = queryset.filter(partner_id=partner_id)
+
+    # created_at is indexed, so the cursor streams without a sort step
+    return queryset.order_by('created_at', 'id').values_list(*COLUMNS)
+
+
+def iter_chunks(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Read ``queryset`` in lists of up to ``chunk_size`` rows.
+    """
+    chunk = []
+    for row in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def encode_csv(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield the header and then one block of CSV lines per chunk.
+    """
+    datetimes = [COLUMNS.index(name) for name in DATETIME_COLUMNS]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(COLUMNS)
+    for chunk in iter_chunks(queryset, chunk_size):
+        for row in chunk:
+            row = list(row)
+            for index in datetimes:
+                row[index] = row[index].isoformat()
+            writer.writerow(row)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def encode_ndjson(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield one block of NDJSON lines per chunk.
+    """
+    for chunk in iter_chunks(queryset, chunk_size):
+        yield b''.join(fastjson.dumps(dict(zip(COLUMNS, row))) + b'\n' for row in chunk)
+
+
+def encode(queryset, export_format, chunk_size=DEFAULT_CHUNK_SIZE):
+    if export_format == 'ndjson':
+        return encode_ndjson(queryset, chunk_size)
+    return encode_csv(queryset, chunk_size)
@@ -0,0 +1,159 @@
+"""
+Compare the stdlib and orjson API JSON engines on representative payloads.
+
+Payloads are built from in-memory objects shaped like the responses of
+bulk_sync_view and DeliveryRequestListView and the bulk sync request body,
+so no database rows are needed.
+
+    python manage.py benchmark_json --rows 100 --iterations 500
+"""
+import json
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from delivery.models import DeliveryRequest
+from delivery.serializers import DeliveryRequestListSerializer, DeliveryRequestSerializer
+from partners.models import DeliveryPartner
+from sajilo_life import fastjson
+from sajilo_life.fastjson import FastJSONParser, FastJSONRenderer
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the stdlib and orjson JSON renderers and parsers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100, help='Deliveries per payload.')
+        parser.add_argument('--iterations', type=int, default=500, help='Runs timed per engine.')
+
+    def handle(self, *args, **options):
+        if fastjson.orjson is None:
+            raise CommandError('orjson is not installed; the API uses the stdlib engine.')
+
+        rows = options['rows']
+        iterations = options['iterations']
+        deliveries = self.build_deliveries(rows)
+
+        payloads = {
+            'bulk sync response': {
+                'message': f'Synced {rows} requests, 1 failed.',
+                'synced_requests': DeliveryRequestSerializer(deliveries, many=True).data,
+                'failed_requests': [
+                    {'local_id': 'local-x', 'errors': {'pickup_address': ['This field is required.']}}
+                ],
+            },
+            'delivery list page': {
+                'count': rows * 10,
+                'next': 'http://localhost:8000/api/delivery/requests/?page=2',
+                'previous': None,
+                'results': DeliveryRequestListSerializer(deliveries, many=True).data,
+            },
+            'unserialized values': [
+                {
+                    'lat': delivery.pickup_lat,
+                    'created_at': delivery.created_at,
+                    'duration': timedelta(minutes=index),
+                    'status': delivery.get_status_display(),
+                }
+                for index, delivery in enumerate(deliveries)
+            ],
+        }
+        request_body = json.dumps({
+            'requests': [
+                {
+                    'local_id': f'local-{index}',
+                    'pickup_address': f'{index} Pickup Street, Kathmandu',
+                    'dropoff_address': f'{index} Dropoff Street, Lalitpur',
+                    'pickup_lat': '27.71720000',
+                    'pickup_lng': '85.32400000',
+                    'customer_name': 'Sita Sharma',
+                    'customer_phone': '9800000000',
+                    'delivery_notes': 'Call on arrival - गेटमा',
+                }
+                for index in range(rows)
+            ]
+        }, ensure_ascii=False).encode()
+
+        stdlib_renderer = JSONRenderer()
+        fast_renderer = FastJSONRenderer()
+        for name, payload in payloads.items():
+            expected = stdlib_renderer.render(payload)
+            with override_settings(API_JSON_ENGINE='orjson'):
+                actual = fast_renderer.render(payload)
+            if json.loads(expected) != json.loads(actual):
+                raise CommandError(f'{name}: orjson output differs from the stdlib renderer.')
+
+            stdlib = self.time(iterations, lambda: stdlib_renderer.render(payload))
+            fast = self.time(iterations, lambda: fast_renderer.render(payload))
+            self.report(f'render {name}', len(actual), stdlib, fast, expected == actual)
+
+        stdlib_parser = JSONParser()
+        fast_parser = FastJSONParser()
+        with override_settings(API_JSON_ENGINE='orjson'):
+            parsed = fast_parser.parse(BytesIO(request_body))
+        if stdlib_parser.parse(BytesIO(request_body)) != parsed:
+            raise CommandError('bulk sync request: orjson parse differs from the stdlib parser.')
+
+        stdlib = self.time(iterations, lambda: stdlib_parser.parse(BytesIO(request_body)))
+        fast = self.time(iterations, lambda: fast_parser.parse(BytesIO(request_body)))
+        self.report('parse bulk sync request', len(request_body), stdlib, fast, True)
+
+    def build_deliveries(self, rows):
+        now = timezone.now()
+        statuses = [status for status, _ in DeliveryRequest.STATUS_CHOICES]
+        customer = User(
+            id=1, username='sita', email='sita@example.com', phone='9800000000',
+            first_name='Sita', last_name='Sharma', role='customer', created_at=now
+        )
+        partner = DeliveryPartner(
+            id=1,
+            user=User(id=2, username='ram', first_name='Ram', last_name='Thapa', role='partner'),
+            vehicle_type='motorcycle'
+        )
+        return [
+            DeliveryRequest(
+                id=index + 1,
+                customer=customer,
+                partner=None if index % 4 == 0 else partner,
+                pickup_address=f'{index} Pickup Street, Kathmandu',
+                dropoff_address=f'{index} Dropoff Street, Lalitpur',
+                pickup_lat=Decimal('27.71720000'),
+                pickup_lng=Decimal('85.32400000'),
+                dropoff_lat=Decimal('27.66440000'),
+                dropoff_lng=Decimal('85.31880000'),
+                customer_name='Sita Sharma',
+                customer_phone='9800000000',
+                delivery_notes='Call on arrival',
+                status=statuses[index % len(statuses)],
+                estimated_distance=Decimal('5.40'),
+                estimated_duration=25,
+                created_at=now - timedelta(minutes=index),
+                updated_at=now,
+                local_id=f'local-{index}',
+                version=1,
+            )
+            for index in range(rows)
+        ]
+
+    def report(self, name, size, stdlib, fast, identical):
+        self.stdout.write(
+            f'{name} ({size / 1024:.1f} KiB): stdlib {stdlib:.3f} ms, orjson {fast:.3f} ms '
+            f'({stdlib / fast:.1f}x){"" if identical else ", equivalent but not byte-identical"}'
+        )
+
+    @staticmethod
+    def time(iterations, function):
+        with override_settings(API_JSON_ENGINE='orjson'):
+            function()
+            started = time.perf_counter()
+            for _ in range(iterations):
+                function()
+        return (time.perf_counter() - started) * 1000 / iterations
@@ -0,0 +1,124 @@
+"""
+Time the compiled list serializers against DRF.
+
+Synthetic deliveries and partners are created inside a transaction that is
+rolled back at the end, so the command can run against any database.
+Output parity is covered by the tests in delivery/tests.py.
+
+    python manage.py benchmark_list_serializers --rows 100 --iterations 200
+"""
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from delivery.models import DeliveryRequest
+from delivery.serializers import DeliveryRequestListSerializer
+from partners.models import DeliveryPartner
+from partners.serializers import DeliveryPartnerListSerializer
+from sajilo_life.compiled import CompiledSerializer
+from users.models import User
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark compiled list serializers against DRF.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100, help='Rows per page.')
+        parser.add_argument('--iterations', type=int, default=200, help='Pages timed per path.')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.create_fixtures(options['rows'])
+                self.benchmark(options['rows'], options['iterations'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def create_fixtures(self, rows):
+        statuses = [status for status, _ in DeliveryRequest.STATUS_CHOICES]
+        vehicles = [vehicle for vehicle, _ in DeliveryPartner.VEHICLE_CHOICES]
+
+        customer = User.objects.create_user(
+            username='benchmark-customer', email='benchmark-customer@example.com',
+            password='benchmark-password', role='customer'
+        )
+        partners = []
+        for index in range(max(rows // 10, 2)):
+            user = User.objects.create_user(
+                username=f'benchmark-partner-{index}',
+                email=f'benchmark-partner-{index}@example.com',
+                password='benchmark-password',
+                role='partner',
+                # Every other partner has no name, so user_name falls back
+                first_name='' if index % 2 else f'Partner {index}',
+                last_name='' if index % 2 else 'Benchmark'
+            )
+            partners.append(DeliveryPartner.objects.create(
+                user=user,
+                vehicle_type=vehicles[index % len(vehicles)],
+                rating=Decimal('4.25'),
+                total_deliveries=index * 3,
+                successful_deliveries=index * 2,
+                current_lat=None if index % 3 == 0 else Decimal('27.71720000'),
+                current_lng=None if index % 3 == 0 else Decimal('85.32400000'),
+            ))
+
+        DeliveryRequest.objects.bulk_create([
+            DeliveryRequest(
+                customer=customer,
+                partner=None if index % 4 == 0 else partners[index % len(partners)],
+                pickup_address=f'{index} Pickup Street',
+                dropoff_address=f'{index} Dropoff Street',
+                customer_name='Benchmark Customer',
+                customer_phone='9800000000',
+                status=statuses[index % len(statuses)],
+                local_id=None if index % 5 == 0 else f'benchmark-{index}',
+                is_synced=index % 2 == 0,
+            )
+            for index in range(rows)
+        ])
+
+    def querysets(self):
+        return [
+            (DeliveryRequestListSerializer, DeliveryRequest.objects.order_by('pk')),
+            (DeliveryPartnerListSerializer, DeliveryPartner.objects.order_by('pk')),
+        ]
+
+    def benchmark(self, rows, iterations):
+        for serializer_class, queryset in self.querysets():
+            page = queryset[:rows]
+            compiled = CompiledSerializer.compile(serializer_class())
+
+            drf_page = page.select_related('partner__user') if queryset.model is DeliveryRequest \
+                else page.select_related('user')
+
+            drf = self.time(iterations, lambda: serializer_class(list(drf_page), many=True).data)
+            fast = self.time(iterations, lambda: compiled.serialize(page.values(*compiled.paths)))
+
+            instances = list(drf_page)
+            values = list(page.values(*compiled.paths))
+            drf_only = self.time(iterations, lambda: serializer_class(instances, many=True).data)
+            fast_only = self.time(iterations, lambda: compiled.serialize(values))
+
+            self.stdout.write(
+                f'{serializer_class.__name__} ({len(values)} rows/page)\n'
+                f'  query + serialize: DRF {drf:.2f} ms, compiled {fast:.2f} ms '
+                f'({drf / fast:.1f}x)\n'
+                f'  serialize only:    DRF {drf_only:.2f} ms, compiled {fast_only:.2f} ms '
+                f'({drf_only / fast_only:.1f}x)'
+            )
+
+    @staticmethod
+    def time(iterations, function):
+        function()
+        started = time.perf_counter()
+        for _ in range(iterations):
+            function()
+        return (time.perf_counter() - started) * 1000 / iterations
+
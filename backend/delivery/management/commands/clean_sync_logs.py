@@ -0,0 +1,48 @@
+"""
+Compact successful sync logs older than the retention period into per-day
+summaries, in short chunked transactions.
+
+    python manage.py clean_sync_logs --days 30 --chunk-size 5000 --pause 0.05
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from delivery import retention
+
+
+class Command(BaseCommand):
+    help = 'Compact old successful sync logs into per-day summaries.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=getattr(settings, 'SYNC_LOG_RETENTION_DAYS', 30),
+            help='Keep successful logs newer than this many days.'
+        )
+        parser.add_argument('--chunk-size', type=int, default=retention.DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--pause', type=float, default=0.0, help='Seconds to sleep between chunks.')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the logs that would go.')
+
+    def handle(self, *args, **options):
+        if options['days'] < 0 or options['chunk_size'] < 1:
+            raise CommandError('--days must be >= 0 and --chunk-size >= 1.')
+
+        before = timezone.now() - timedelta(days=options['days'])
+        if options['dry_run']:
+            self.stdout.write(
+                f'{retention.count_expired(before)} successful logs created before '
+                f'{before:%Y-%m-%d %H:%M} would be compacted.'
+            )
+            return
+
+        total = 0
+        for removed in retention.compact_sync_logs(before, options['chunk_size'], options['pause']):
+            total += removed
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Compacted {total} logs...')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Compacted {total} successful logs created before {before:%Y-%m-%d %H:%M}.'
+        ))
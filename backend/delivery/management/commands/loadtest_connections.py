@@ -0,0 +1,264 @@
+"""
+Load test a running server's concurrent-connection capacity.
+
+Opens ``--streams`` delivery event streams and holds them open, then sends
+``--requests`` reads to the hot endpoints (delivery detail, nearby partners,
+statistics) from ``--concurrency`` keep-alive connections while they are.
+It reports how many streams the server accepted and the read throughput
+and latency under that load. Run it against both deployments to compare:
+
+    gunicorn sajilo_life.wsgi --worker-class gthread --workers 2 --threads 8 --bind 127.0.0.1:8000
+    uvicorn sajilo_life.asgi:application --workers 2 --port 8001
+
+    python manage.py loadtest_connections --url http://127.0.0.1:8000 \\
+        --email admin@example.com --password secret --streams 500
+
+The WSGI deployment doesn't serve event streams (it answers 501), so
+against it every stream counts as failed and ``--streams 0`` times the
+reads alone. Event streams only reach clients of the worker that published
+the event unless ``EVENTS_BACKEND`` is the Redis backend; the test only
+holds them open.
+
+The client is plain asyncio, so the command needs nothing beyond the
+standard library to run from any machine with the project checked out.
+"""
+import asyncio
+import json
+import resource
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Kathmandu
+DEFAULT_LAT = 27.7172
+DEFAULT_LNG = 85.3240
+
+
+class Command(BaseCommand):
+    help = 'Hold event streams open against a running server and time the hot reads.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Server base URL.')
+        parser.add_argument('--token', help='Access token to authenticate with.')
+        parser.add_argument('--email', help='Log in with this user to get a token.')
+        parser.add_argument('--password', help='Password for --email.')
+        parser.add_argument('--streams', type=int, default=200, help='Event streams to hold open.')
+        parser.add_argument('--requests', type=int, default=3000, help='Reads to send.')
+        parser.add_argument(
+            '--concurrency', type=int, default=50, help='Connections sending reads.'
+        )
+        parser.add_argument(
+            '--delivery', type=int, help='Delivery to read; defaults to the first visible.'
+        )
+        parser.add_argument(
+            '--timeout', type=float, default=10.0, help='Seconds to wait for a response.'
+        )
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        if url.scheme != 'http' or not url.hostname:
+            raise CommandError('--url must be an http:// URL.')
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.timeout = options['timeout']
+
+        # One descriptor per connection, plus some slack
+        needed = options['streams'] + options['concurrency'] + 64
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft != resource.RLIM_INFINITY and soft < needed:
+            if hard != resource.RLIM_INFINITY and hard < needed:
+                raise CommandError(f'Open file limit {hard} is too low for {needed} connections.')
+            resource.setrlimit(resource.RLIMIT_NOFILE, (needed, hard))
+
+        asyncio.run(self.run(options))
+
+    async def run(self, options):
+        token = options['token'] or await self.obtain_token(options['email'], options['password'])
+        delivery_id = options['delivery'] or await self.first_delivery(token)
+        paths = [
+            ('detail', f'/api/delivery/requests/{delivery_id}/'),
+            ('nearby', f'/api/partners/nearby/?lat={DEFAULT_LAT}&lng={DEFAULT_LNG}'),
+            ('statistics', '/api/delivery/statistics/'),
+        ]
+
+        started = time.monotonic()
+        results = await asyncio.gather(
+            *[self.open_stream(token) for _ in range(options['streams'])]
+        )
+        streams = [stream for stream in results if stream is not None]
+        self.stdout.write(
+            f'streams: {len(streams)}/{options["streams"]} open, '
+            f'{options["streams"] - len(streams)} failed ({time.monotonic() - started:.1f} s)'
+        )
+
+        try:
+            latencies = {name: [] for name, _ in paths}
+            errors = {}
+            remaining = iter(range(options['requests']))
+            started = time.monotonic()
+            await asyncio.gather(*[
+                self.send_reads(token, paths, remaining, latencies, errors)
+                for _ in range(options['concurrency'])
+            ])
+            elapsed = time.monotonic() - started
+            alive = sum(1 for _, drain in streams if not drain.done())
+        finally:
+            for writer, drain in streams:
+                drain.cancel()
+                writer.close()
+
+        sent = sum(len(values) for values in latencies.values()) + sum(errors.values())
+        self.stdout.write(
+            f'reads: {sent} in {elapsed:.1f} s ({sent / elapsed:.0f}/s), '
+            f'{sum(errors.values())} errors{format_errors(errors)}'
+        )
+        for name, values in latencies.items():
+            if values:
+                values.sort()
+                self.stdout.write(
+                    f'  {name}: p50 {percentile(values, 0.5):.1f} ms, '
+                    f'p95 {percentile(values, 0.95):.1f} ms, p99 {percentile(values, 0.99):.1f} ms'
+                )
+        self.stdout.write(f'streams still open after the reads: {alive}/{len(streams)}')
+
+    async def obtain_token(self, email, password):
+        if not email or not password:
+            raise CommandError('Pass --token, or --email and --password.')
+        body = json.dumps({'email': email, 'password': password}).encode()
+        status, _, content = await self.fetch('/api/auth/token/', method='POST', body=body)
+        if status != 200:
+            raise CommandError(f'Could not log in ({status}): {content[:200].decode()}')
+        return json.loads(content)['access']
+
+    async def first_delivery(self, token):
+        status, _, content = await self.fetch('/api/delivery/requests/?page_size=1', token)
+        results = json.loads(content).get('results') if status == 200 else None
+        if not results:
+            raise CommandError('No delivery visible to this user; pass --delivery.')
+        return results[0]['id']
+
+    async def fetch(self, path, token=None, method='GET', body=None):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            writer.write(self.request(path, token, method=method, body=body))
+            return await asyncio.wait_for(read_response(reader), self.timeout)
+        finally:
+            writer.close()
+
+    def request(self, path, token, method='GET', body=None, accept='application/json'):
+        lines = [
+            f'{method} {path} HTTP/1.1',
+            f'Host: {self.host}:{self.port}',
+            f'Accept: {accept}',
+        ]
+        if token:
+            lines.append(f'Authorization: Bearer {token}')
+        if body is not None:
+            lines += ['Content-Type: application/json', f'Content-Length: {len(body)}']
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode() + (body or b'')
+
+    async def open_stream(self, token):
+        """
+        Open an event stream and wait for its first frame; returns
+        ``(writer, drain task)``, or None if it didn't open in time.
+        """
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port), self.timeout
+            )
+        except (OSError, asyncio.TimeoutError):
+            return None
+
+        try:
+            writer.write(self.request('/api/delivery/events/', token, accept='text/event-stream'))
+            status, _ = await asyncio.wait_for(read_head(reader), self.timeout)
+            if status != 200:
+                raise ConnectionError(status)
+            await asyncio.wait_for(reader.readuntil(b'\n\n'), self.timeout)
+        except (OSError, ConnectionError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+            writer.close()
+            return None
+        return writer, asyncio.create_task(drain(reader))
+
+    async def send_reads(self, token, paths, remaining, latencies, errors):
+        connection = None
+        for index in remaining:
+            name, path = paths[index % len(paths)]
+            started = time.monotonic()
+            try:
+                if connection is None:
+                    connection = await asyncio.wait_for(
+                        asyncio.open_connection(self.host, self.port), self.timeout
+                    )
+                reader, writer = connection
+                writer.write(self.request(path, token))
+                status, headers, _ = await asyncio.wait_for(read_response(reader), self.timeout)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError) as exc:
+                error = type(exc).__name__
+                errors[error] = errors.get(error, 0) + 1
+                if connection is not None:
+                    connection[1].close()
+                    connection = None
+                continue
+
+            if status == 200:
+                latencies[name].append((time.monotonic() - started) * 1000)
+            else:
+                errors[f'HTTP {status}'] = errors.get(f'HTTP {status}', 0) + 1
+            if headers.get('connection', '').lower() == 'close':
+                connection[1].close()
+                connection = None
+
+        if connection is not None:
+            connection[1].close()
+
+
+async def read_head(reader):
+    """
+    Status code and lower-cased headers of an HTTP/1.1 response.
+    """
+    head = await reader.readuntil(b'\r\n\r\n')
+    status_line, *header_lines = head.decode('latin-1').split('\r\n')
+    headers = {}
+    for line in header_lines:
+        if line:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+    return int(status_line.split()[1]), headers
+
+
+async def read_response(reader):
+    status, headers = await read_head(reader)
+    if 'content-length' in headers:
+        body = await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding', '').lower() == 'chunked':
+        body = b''
+        while True:
+            size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+            body += (await reader.readexactly(size + 2))[:-2]
+            if size == 0:
+                break
+    elif status in (204, 304):
+        body = b''
+    else:
+        body = await reader.read()
+    return status, headers, body
+
+
+async def drain(reader):
+    """
+    Read a held stream until the server ends it.
+    """
+    while await reader.read(4096):
+        pass
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def format_errors(errors):
+    if not errors:
+        return ''
+    return ' (' + ', '.join(f'{name}: {count}' for name, count in sorted(errors.items())) + ')'
@@ -0,0 +1,139 @@
+"""
+Create upcoming monthly partitions and archive old ones.
+
+Run daily from cron:
+
+    python manage.py maintain_partitions --keep-months 24
+    python manage.py maintain_partitions --keep-months 24 --dump-dir /var/backups/sajilo
+
+Partitions whose month ended more than ``--keep-months`` months ago are
+detached. They are then moved to the ``archive`` schema, where they can
+still be queried, or written to ``<dump-dir>/<partition>.csv.gz`` and
+dropped. A delivery_requests partition that still holds unfinished
+deliveries is skipped unless ``--force`` is given.
+
+The status changes and sync logs of archived deliveries are moved out of
+the live tables in the same transaction, into ``<partition>_<table>``
+tables archived alongside the partition. Their local ids are released:
+a client that syncs an archived delivery's local id again creates a new
+delivery, so keep partitions for longer than clients keep offline data.
+"""
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from delivery.models import (
+    FINAL_STATUSES, LOCAL_ID_KEYS_TABLE, DeliveryRequest, DeliveryStatusChange, SyncLog
+)
+from sajilo_life import partitions
+
+TABLES = [
+    (DeliveryRequest._meta.db_table, 'created_at'),
+    (SyncLog._meta.db_table, 'created_at'),
+]
+
+
+class Command(BaseCommand):
+    help = 'Create upcoming monthly partitions and detach and archive old ones.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months-ahead', type=int, default=partitions.MONTHS_AHEAD,
+            help='Months of partitions to keep ready after the current one.'
+        )
+        parser.add_argument(
+            '--keep-months', type=int,
+            help='Archive partitions older than this many months; omit to archive nothing.'
+        )
+        parser.add_argument('--dump-dir', help='Write archived partitions here and drop them.')
+        parser.add_argument('--force', action='store_true', help='Archive unfinished deliveries too.')
+        parser.add_argument('--dry-run', action='store_true', help='Report without changing anything.')
+
+    def handle(self, *args, **options):
+        if options['dump_dir'] and not os.path.isdir(options['dump_dir']):
+            raise CommandError(f"Not a directory: {options['dump_dir']}")
+
+        current = partitions.month_start(timezone.now())
+        with connection.cursor() as cursor:
+            for table, column in TABLES:
+                if not partitions.is_partitioned(cursor, table):
+                    raise CommandError(f'{table} is not partitioned; run the migrations first.')
+
+                self.create_upcoming(cursor, table, column, current, options)
+                if options['keep_months'] is not None:
+                    cutoff = partitions.add_months(current, -options['keep_months'])
+                    self.archive_old(cursor, table, cutoff, options)
+
+    def create_upcoming(self, cursor, table, column, current, options):
+        last = partitions.add_months(current, options['months_ahead'])
+        existing = set(partitions.list_partitions(cursor, table))
+
+        month = current
+        while month <= last:
+            name = partitions.partition_name(table, month)
+            if name not in existing:
+                if not options['dry_run']:
+                    with transaction.atomic():
+                        partitions.create_partition(cursor, table, column, month)
+                self.stdout.write(f'Created {name}')
+            month = partitions.add_months(month, 1)
+
+    def archive_old(self, cursor, table, cutoff, options):
+        for name in partitions.list_partitions(cursor, table):
+            month = partitions.partition_month(table, name)
+            if month is None or partitions.add_months(month, 1) > cutoff:
+                continue
+
+            if table == DeliveryRequest._meta.db_table and not options['force']:
+                cursor.execute(
+                    f'SELECT EXISTS (SELECT 1 FROM "{name}" WHERE NOT (status = ANY(%s)))',
+                    [list(FINAL_STATUSES)]
+                )
+                if cursor.fetchone()[0]:
+                    self.stdout.write(self.style.WARNING(
+                        f'Skipped {name}: it has unfinished deliveries (use --force).'
+                    ))
+                    continue
+
+            if options['dry_run']:
+                self.stdout.write(f'Would archive {name}')
+                continue
+
+            with transaction.atomic():
+                partitions.detach_partition(cursor, table, name)
+                archived = [name]
+                if table == DeliveryRequest._meta.db_table:
+                    archived += self.detach_delivery_rows(cursor, name)
+
+                for archived_name in archived:
+                    if options['dump_dir']:
+                        path = os.path.join(options['dump_dir'], f'{archived_name}.csv.gz')
+                        partitions.archive_to_file(cursor, archived_name, path)
+                        self.stdout.write(f'Archived {archived_name} to {path}')
+                    else:
+                        partitions.archive_to_schema(cursor, archived_name)
+                        self.stdout.write(
+                            f'Archived {archived_name} to {partitions.ARCHIVE_SCHEMA}.{archived_name}'
+                        )
+
+    def detach_delivery_rows(self, cursor, name):
+        """
+        Move the rows referencing the deliveries in detached partition
+        ``name`` out of the live tables and release their local ids.
+        """
+        dependents = []
+        for model in (DeliveryStatusChange, SyncLog):
+            table = model._meta.db_table
+            dependent = f'{name}_{table}'
+            partitions.move_referencing_rows(
+                cursor, name, table, model._meta.get_field('request').column, dependent
+            )
+            dependents.append(dependent)
+
+        cursor.execute(
+            f'DELETE FROM "{LOCAL_ID_KEYS_TABLE}" AS k USING "{name}" AS d '
+            f'WHERE k.customer_id = d.customer_id AND k.local_id = d.local_id'
+        )
+        return dependents
@@ -0,0 +1,110 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:46
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("partners", "0001_initial"),
+        ("delivery", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DeliveryStatusChange",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "from_status",
+                    models.CharField(
+                        blank=True,
+                        choices=[
+                            ("pending", "Pending"),
+                            ("assigned", "Assigned to Partner"),
+                            ("picked_up", "Picked Up"),
+                            ("in_transit", "In Transit"),
+                            ("delivered", "Delivered"),
+                            ("cancelled", "Cancelled"),
+                            ("failed", "Failed"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "to_status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("assigned", "Assigned to Partner"),
+                            ("picked_up", "Picked Up"),
+                            ("in_transit", "In Transit"),
+                            ("delivered", "Delivered"),
+                            ("cancelled", "Cancelled"),
+                            ("failed", "Failed"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("changed_at", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "actor",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "partner",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="status_changes",
+                        to="partners.deliverypartner",
+                    ),
+                ),
+                (
+                    "request",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="status_changes",
+                        to="delivery.deliveryrequest",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "delivery_status_changes",
+                "ordering": ["changed_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["request", "to_status", "changed_at"],
+                        name="delivery_st_request_d3f632_idx",
+                    ),
+                    models.Index(
+                        fields=["partner", "to_status", "changed_at"],
+                        name="delivery_st_partner_26fdf4_idx",
+                    ),
+                    models.Index(
+                        fields=["to_status", "changed_at"],
+                        name="delivery_st_to_stat_d41651_idx",
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("delivery", "0002_delivery_status_change"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="deliveryrequest",
+            index=models.Index(
+                fields=["created_at", "status"], name="delivery_re_created_2f2bf4_idx"
+            ),
+        ),
+    ]
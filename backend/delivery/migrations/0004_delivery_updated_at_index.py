@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("delivery", "0003_delivery_created_status_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="deliveryrequest",
+            index=models.Index(
+                fields=["updated_at"], name="delivery_re_updated_8f206d_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:51
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("partners", "0001_initial"),
+        ("delivery", "0004_delivery_updated_at_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DeliveryTombstone",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("delivery_id", models.BigIntegerField()),
+                ("local_id", models.CharField(blank=True, max_length=50, null=True)),
+                ("deleted_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                "db_table": "delivery_tombstones",
+                "ordering": ["deleted_at", "id"],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="deliveryrequest",
+            index=models.Index(
+                fields=["customer", "updated_at"], name="delivery_re_custome_79ed72_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="deliveryrequest",
+            index=models.Index(
+                fields=["partner", "updated_at"], name="delivery_re_partner_b04808_idx"
+            ),
+        ),
+        migrations.AddField(
+            model_name="deliverytombstone",
+            name="customer",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddField(
+            model_name="deliverytombstone",
+            name="partner",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="partners.deliverypartner",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="deliverytombstone",
+            index=models.Index(
+                fields=["deleted_at"], name="delivery_to_deleted_67e7c1_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="deliverytombstone",
+            index=models.Index(
+                fields=["customer", "deleted_at"], name="delivery_to_custome_eb84ce_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="deliverytombstone",
+            index=models.Index(
+                fields=["partner", "deleted_at"], name="delivery_to_partner_cf0c2c_idx"
+            ),
+        ),
+    ]
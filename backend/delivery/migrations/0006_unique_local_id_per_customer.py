@@ -0,0 +1,50 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:52
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def clear_duplicate_local_ids(apps, schema_editor):
+    """
+    Make existing rows satisfy the new constraint without deleting data.
+
+    Blank local ids become NULL; for duplicated (customer, local_id) pairs the
+    oldest row keeps the local id and later copies get it suffixed with their id.
+    """
+    DeliveryRequest = apps.get_model("delivery", "DeliveryRequest")
+
+    DeliveryRequest.objects.filter(local_id="").update(local_id=None)
+
+    duplicates = (
+        DeliveryRequest.objects.exclude(local_id=None)
+        .values("customer_id", "local_id")
+        .annotate(copies=Count("id"))
+        .filter(copies__gt=1)
+        .order_by()
+    )
+    for duplicate in duplicates:
+        copies = DeliveryRequest.objects.filter(
+            customer_id=duplicate["customer_id"], local_id=duplicate["local_id"]
+        ).order_by("id")
+        for copy in list(copies)[1:]:
+            suffix = f"#{copy.id}"
+            copy.local_id = copy.local_id[: 50 - len(suffix)] + suffix
+            copy.save(update_fields=["local_id"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("delivery", "0005_delivery_changes_feed"),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_duplicate_local_ids, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="deliveryrequest",
+            constraint=models.UniqueConstraint(
+                fields=("customer", "local_id"),
+                name="unique_delivery_local_id_per_customer",
+            ),
+        ),
+    ]
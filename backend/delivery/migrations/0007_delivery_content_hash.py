@@ -0,0 +1,53 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:54
+
+from django.db import migrations, models
+
+from delivery.digests import HASHED_FIELDS, content_hash
+
+
+def backfill_content_hash(apps, schema_editor):
+    DeliveryRequest = apps.get_model("delivery", "DeliveryRequest")
+
+    batch = []
+    rows = DeliveryRequest.objects.only("id", *HASHED_FIELDS).iterator(chunk_size=2000)
+    for delivery_request in rows:
+        delivery_request.content_hash = content_hash(delivery_request)
+        batch.append(delivery_request)
+        if len(batch) >= 2000:
+            DeliveryRequest.objects.bulk_update(batch, ["content_hash"])
+            batch = []
+    if batch:
+        DeliveryRequest.objects.bulk_update(batch, ["content_hash"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("delivery", "0006_unique_local_id_per_customer"),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name="deliveryrequest",
+            name="unique_delivery_local_id_per_customer",
+        ),
+        migrations.AddField(
+            model_name="deliveryrequest",
+            name="content_hash",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                help_text="SHA-256 of the synced fields, see delivery/digests.py",
+                max_length=64,
+            ),
+        ),
+        migrations.RunPython(backfill_content_hash, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="deliveryrequest",
+            constraint=models.UniqueConstraint(
+                fields=("customer", "local_id"),
+                include=("content_hash",),
+                name="unique_delivery_local_id_per_customer",
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("delivery", "0007_delivery_content_hash"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="deliveryrequest",
+            name="version",
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+from sajilo_life.partitions import partition_table, unpartition_table
+
+# Unique indexes must include the partition key, created_at
+DELIVERY_UNIQUE_INDEXES = [
+    (
+        "unique_delivery_local_id_per_customer",
+        "(customer_id, local_id, created_at) INCLUDE (content_hash)",
+    ),
+]
+
+
+def partition_tables(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        partition_table(
+            cursor,
+            "delivery_requests",
+            "created_at",
+            ["id", "created_at"],
+            DELIVERY_UNIQUE_INDEXES,
+        )
+        partition_table(cursor, "sync_logs", "created_at", ["id", "created_at"])
+
+
+def unpartition_tables(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        unpartition_table(cursor, "sync_logs", ["id"])
+        unpartition_table(cursor, "delivery_requests", ["id"], DELIVERY_UNIQUE_INDEXES)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("delivery", "0008_delivery_version"),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name="deliveryrequest",
+            name="unique_delivery_local_id_per_customer",
+        ),
+        migrations.AlterField(
+            model_name="deliveryrequest",
+            name="created_at",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now, editable=False
+            ),
+        ),
+        migrations.AlterField(
+            model_name="deliverystatuschange",
+            name="request",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="status_changes",
+                to="delivery.deliveryrequest",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="synclog",
+            name="request",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="sync_logs",
+                to="delivery.deliveryrequest",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="deliveryrequest",
+            constraint=models.UniqueConstraint(
+                fields=("customer", "local_id", "created_at"),
+                include=("content_hash",),
+                name="unique_delivery_local_id_per_customer",
+            ),
+        ),
+        migrations.RunPython(partition_tables, unpartition_tables),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("delivery", "0009_partition_by_month"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SyncLogSummary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                (
+                    "sync_status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("success", "Success"),
+                            ("failed", "Failed"),
+                            ("retry", "Retry"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("count", models.PositiveIntegerField(default=0)),
+                ("retry_count", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "db_table": "sync_log_summaries",
+                "ordering": ["-day"],
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name="synclog",
+            name="sync_logs_request_5868ab_idx",
+        ),
+        migrations.AlterField(
+            model_name="synclog",
+            name="request",
+            field=models.ForeignKey(
+                db_constraint=False,
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="sync_logs",
+                to="delivery.deliveryrequest",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="synclog",
+            index=models.Index(
+                fields=["request", "-created_at"],
+                include=(
+                    "id",
+                    "sync_status",
+                    "retry_count",
+                    "synced_at",
+                ),
+                name="sync_logs_request_list_idx",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="synclogsummary",
+            constraint=models.UniqueConstraint(
+                fields=("day", "sync_status"), name="unique_sync_log_summary_per_day"
+            ),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:26
+
+from django.db import migrations, models
+
+from sajilo_life.operations import AddIndexConcurrently, RemoveIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # Indexes are built concurrently, which can't run in a transaction
+    atomic = False
+
+    dependencies = [
+        ("delivery", "0010_sync_log_retention"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="deliveryrequest",
+            index=models.Index(
+                condition=models.Q(
+                    ("status__in", ("assigned", "picked_up", "in_transit"))
+                ),
+                fields=["partner"],
+                name="delivery_partner_active_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="deliveryrequest",
+            index=models.Index(
+                fields=["customer", "-created_at"], name="delivery_customer_recent_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="deliveryrequest",
+            index=models.Index(
+                condition=models.Q(("is_synced", False)),
+                fields=["created_at"],
+                name="delivery_unsynced_idx",
+            ),
+        ),
+        RemoveIndexConcurrently(
+            model_name="deliveryrequest",
+            name="delivery_re_custome_dfd2f2_idx",
+        ),
+        RemoveIndexConcurrently(
+            model_name="deliveryrequest",
+            name="delivery_re_partner_da9366_idx",
+        ),
+        RemoveIndexConcurrently(
+            model_name="deliveryrequest",
+            name="delivery_re_is_sync_151e99_idx",
+        ),
+    ]
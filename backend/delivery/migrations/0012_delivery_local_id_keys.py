@@ -0,0 +1,68 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:12
+
+from django.db import migrations
+
+# Unique indexes on the partitioned delivery_requests must include
+# created_at, so (customer_id, local_id) is enforced through this
+# unpartitioned key table, kept in step by triggers
+CREATE_LOCAL_ID_KEYS = """
+CREATE TABLE delivery_local_ids (
+    customer_id bigint NOT NULL,
+    local_id varchar(50) NOT NULL,
+    PRIMARY KEY (customer_id, local_id)
+);
+
+CREATE FUNCTION delivery_local_ids_sync() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.local_id IS NOT NULL THEN
+        DELETE FROM delivery_local_ids
+        WHERE customer_id = OLD.customer_id AND local_id = OLD.local_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.local_id IS NOT NULL THEN
+        INSERT INTO delivery_local_ids (customer_id, local_id)
+        VALUES (NEW.customer_id, NEW.local_id);
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+CREATE TRIGGER delivery_local_ids_insert
+    AFTER INSERT ON delivery_requests
+    FOR EACH ROW WHEN (NEW.local_id IS NOT NULL)
+    EXECUTE FUNCTION delivery_local_ids_sync();
+
+CREATE TRIGGER delivery_local_ids_update
+    AFTER UPDATE OF customer_id, local_id ON delivery_requests
+    FOR EACH ROW WHEN (
+        OLD.customer_id IS DISTINCT FROM NEW.customer_id
+        OR OLD.local_id IS DISTINCT FROM NEW.local_id
+    )
+    EXECUTE FUNCTION delivery_local_ids_sync();
+
+CREATE TRIGGER delivery_local_ids_delete
+    AFTER DELETE ON delivery_requests
+    FOR EACH ROW WHEN (OLD.local_id IS NOT NULL)
+    EXECUTE FUNCTION delivery_local_ids_sync();
+
+INSERT INTO delivery_local_ids (customer_id, local_id)
+SELECT customer_id, local_id FROM delivery_requests WHERE local_id IS NOT NULL;
+"""
+
+DROP_LOCAL_ID_KEYS = """
+DROP TRIGGER delivery_local_ids_delete ON delivery_requests;
+DROP TRIGGER delivery_local_ids_update ON delivery_requests;
+DROP TRIGGER delivery_local_ids_insert ON delivery_requests;
+DROP FUNCTION delivery_local_ids_sync();
+DROP TABLE delivery_local_ids;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("delivery", "0011_query_pattern_indexes"),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_LOCAL_ID_KEYS, DROP_LOCAL_ID_KEYS),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:05
+
+from django.db import migrations
+
+# Databases migrated with an earlier 0010 have error_message as
+# varchar(500), already truncated, and in sync_logs_request_list_idx.
+# Bring them in line with the current 0010; the truncated text is lost.
+RESTORE_ERROR_MESSAGE = """
+DO $$
+BEGIN
+    IF (
+        SELECT data_type FROM information_schema.columns
+        WHERE table_schema = current_schema()
+          AND table_name = 'sync_logs' AND column_name = 'error_message'
+    ) = 'character varying' THEN
+        DROP INDEX sync_logs_request_list_idx;
+        ALTER TABLE sync_logs ALTER COLUMN error_message TYPE text;
+        CREATE INDEX sync_logs_request_list_idx ON sync_logs (request_id, created_at DESC)
+            INCLUDE (id, sync_status, retry_count, synced_at);
+    END IF;
+END
+$$;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("delivery", "0012_delivery_local_id_keys"),
+    ]
+
+    operations = [
+        migrations.RunSQL(RESTORE_ERROR_MESSAGE, migrations.RunSQL.noop),
+    ]
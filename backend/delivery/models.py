@@ -1,10 +1,47 @@
-from django.db import models
+from collections import Counter
+
+from django.db import connection, models, transaction
+from django.db.models import DurationField, ExpressionWrapper, F, OuterRef, Subquery
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 from decimal import Decimal
+from sajilo_life import cache
+from .digests import HASHED_FIELDS, content_hash
 
 User = get_user_model()
 
+# Allowed status transitions, and the reverse map used by compare-and-set
+VALID_TRANSITIONS = {
+    'pending': ('assigned', 'cancelled'),
+    'assigned': ('picked_up', 'cancelled'),
+    'picked_up': ('in_transit', 'cancelled'),
+    'in_transit': ('delivered', 'failed'),
+    'delivered': (),
+    'cancelled': (),
+    'failed': (),
+}
+
+FINAL_STATUSES = ('delivered', 'cancelled', 'failed')
+
+# A partner with a delivery in one of these is busy
+ACTIVE_STATUSES = ('assigned', 'picked_up', 'in_transit')
+
+# Unpartitioned table holding every live (customer_id, local_id) pair, kept
+# in step with delivery_requests by triggers (migration 0012)
+LOCAL_ID_KEYS_TABLE = 'delivery_local_ids'
+
+ALLOWED_PREDECESSORS = {
+    status: tuple(source for source, targets in VALID_TRANSITIONS.items() if status in targets)
+    for status in VALID_TRANSITIONS
+}
+
+
+class VersionConflict(Exception):
+    """
+    Raised when a delivery request changed since it was loaded.
+    """
+
 
 class DeliveryRequest(models.Model):
     """
@@ -104,60 +141,353 @@ class DeliveryRequest(models.Model):
     )
     
     # Timestamps
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Partition key (see sajilo_life/partitions.py); set explicitly by the sync
+    # upsert to match an existing row
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
     updated_at = models.DateTimeField(auto_now=True)
     
     # Offline sync fields
     is_synced = models.BooleanField(default=True)
     local_id = models.CharField(max_length=50, blank=True, null=True)
+    # Optimistic concurrency: bumped on every write
+    version = models.PositiveIntegerField(default=1)
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        editable=False,
+        help_text='SHA-256 of the synced fields, see delivery/digests.py'
+    )
     
     class Meta:
         db_table = 'delivery_requests'
         ordering = ['-created_at']
+        # See QueryPlanTests in delivery/tests.py for the queries each index serves
         indexes = [
-            models.Index(fields=['customer']),
-            models.Index(fields=['partner']),
             models.Index(fields=['status']),
             models.Index(fields=['created_at']),
-            models.Index(fields=['is_synced']),
+            models.Index(fields=['created_at', 'status']),
+            models.Index(fields=['updated_at']),
+            models.Index(fields=['customer', 'updated_at']),
+            models.Index(fields=['partner', 'updated_at']),
             models.Index(fields=['local_id']),
+            # Busy partner checks and the available partner lists
+            models.Index(
+                fields=['partner'],
+                condition=models.Q(status__in=ACTIVE_STATUSES),
+                name='delivery_partner_active_idx'
+            ),
+            # A customer's deliveries, newest first
+            models.Index(fields=['customer', '-created_at'], name='delivery_customer_recent_idx'),
+            # The pending sync list; only a small fraction is ever unsynced
+            models.Index(
+                fields=['created_at'],
+                condition=models.Q(is_synced=False),
+                name='delivery_unsynced_idx'
+            ),
+        ]
+        constraints = [
+            # Offline sync is idempotent per client-generated id. Unique
+            # indexes on the partitioned table must include created_at;
+            # (customer, local_id) itself is unique in LOCAL_ID_KEYS_TABLE.
+            models.UniqueConstraint(
+                fields=['customer', 'local_id', 'created_at'],
+                include=['content_hash'],
+                name='unique_delivery_local_id_per_customer'
+            ),
         ]
     
     def __str__(self):
         return f"Delivery #{self.id} - {self.customer_name} ({self.status})"
     
+    @staticmethod
+    def lock_local_ids(customer_id):
+        """
+        Serialize writers of a customer's local ids until the transaction ends.
+        
+        The key table rejects a second row with the same (customer, local_id)
+        from any write path. Code that creates rows with a local id takes
+        this lock, then checks for an existing row, so concurrent syncs of
+        the same id wait for each other instead of failing.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_advisory_xact_lock(hashtext('delivery_requests.local_id'), %s)",
+                [customer_id]
+            )
+    
+    def save(self, *args, **kwargs):
+        """
+        Save, bumping ``version`` on updates.
+        
+        Updating an existing row only applies if its version still matches
+        the one this instance was loaded with; otherwise VersionConflict is
+        raised and the instance is left unchanged.
+        """
+        self.content_hash = content_hash(self)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and set(update_fields) & set(HASHED_FIELDS):
+            update_fields = set(update_fields) | {'content_hash'}
+        expected_version = None
+        if not self._state.adding:
+            expected_version = self._expected_version = self.version
+            self.version += 1
+            if update_fields is not None:
+                update_fields = set(update_fields) | {'version'}
+        if update_fields is not None:
+            kwargs['update_fields'] = update_fields
+        if expected_version is None:
+            super().save(*args, **kwargs)
+            return
+        try:
+            # A savepoint, so a conflict leaves the caller's transaction usable
+            with transaction.atomic(using=kwargs.get('using')):
+                super().save(*args, **kwargs)
+        except BaseException:
+            self.version = expected_version
+            raise
+        finally:
+            self._expected_version = None
+    
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        # Called by Model.save() for existing rows: add WHERE version = expected
+        expected_version = getattr(self, '_expected_version', None)
+        if expected_version is None:
+            return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+        
+        updated = super()._do_update(
+            base_qs.filter(version=expected_version), using, pk_val, values, update_fields,
+            forced_update
+        )
+        if not updated and base_qs.filter(pk=pk_val).exists():
+            raise VersionConflict(pk_val)
+        return updated
+    
+    def apply_update(self, changes, expected_version=None):
+        """
+        Write changed fields with ``UPDATE ... WHERE version = expected``.
+        
+        Only fields whose value differs are written. Returns False without
+        writing if the row's version no longer matches (defaults to the
+        version this instance was loaded with).
+        """
+        if expected_version is None:
+            expected_version = self.version
+        
+        changed = {}
+        for name, value in changes.items():
+            field = self._meta.get_field(name)
+            new_value = value.pk if isinstance(value, models.Model) else value
+            if getattr(self, field.attname) != new_value:
+                changed[name] = value
+        
+        if not changed:
+            return expected_version == self.version
+        
+        for name, value in changed.items():
+            setattr(self, name, value)
+        
+        updated_at = timezone.now()
+        values = dict(changed, version=models.F('version') + 1, updated_at=updated_at)
+        if set(changed) & set(HASHED_FIELDS):
+            values['content_hash'] = self.content_hash = content_hash(self)
+        
+        applied = DeliveryRequest.objects.filter(
+            pk=self.pk,
+            version=expected_version
+        ).update(**values)
+        
+        if applied:
+            self.version = expected_version + 1
+            self.updated_at = updated_at
+        return bool(applied)
+    
     def can_transition_to(self, new_status):
         """
         Check if status transition is valid.
         """
-        valid_transitions = {
-            'pending': ['assigned', 'cancelled'],
-            'assigned': ['picked_up', 'cancelled'],
-            'picked_up': ['in_transit', 'cancelled'],
-            'in_transit': ['delivered', 'failed'],
-            'delivered': [],
-            'cancelled': [],
-            'failed': [],
-        }
+        return new_status in VALID_TRANSITIONS.get(self.status, ())
+    
+    @classmethod
+    def compare_and_set_statuses(cls, new_status, expected_versions, actor=None):
+        """
+        Move requests to ``new_status`` where their current status allows it.
         
-        return new_status in valid_transitions.get(self.status, [])
+        ``expected_versions`` maps each pk to the version the caller last saw,
+        or None to skip the version check. Runs a single ``UPDATE ... WHERE
+        id = ANY(%s) AND status IN (allowed predecessors)`` and records the
+        status changes in the same transaction. Returns a dict of pk to the
+        updated row's ``from_status``, ``partner_id``, ``created_at``,
+        ``updated_at`` and ``version``; rows that were not updated are absent.
+        """
+        predecessors = ALLOWED_PREDECESSORS.get(new_status)
+        if not predecessors or not expected_versions:
+            return {}
+        
+        if actor is not None and not actor.is_authenticated:
+            actor = None
+        
+        table = connection.ops.quote_name(cls._meta.db_table)
+        pks = list(expected_versions)
+        params = [
+            new_status, timezone.now(),
+            pks, [expected_versions[pk] for pk in pks],
+            list(predecessors)
+        ]
+        
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                # Rows are locked in id order so concurrent batches can't deadlock
+                cursor.execute(
+                    f"""
+                    UPDATE {table} AS d
+                    SET status = %s, version = d.version + 1, updated_at = %s
+                    FROM (
+                        SELECT current.id, current.status, expected.version AS expected_version
+                        FROM {table} AS current
+                        JOIN unnest(%s::bigint[], %s::integer[]) AS expected(id, version)
+                            ON expected.id = current.id
+                        ORDER BY current.id
+                        FOR UPDATE OF current
+                    ) AS previous
+                    WHERE d.id = previous.id
+                        AND d.status = ANY(%s)
+                        AND (previous.expected_version IS NULL OR d.version = previous.expected_version)
+                    RETURNING d.id, previous.status, d.partner_id, d.customer_id, d.created_at,
+                        d.updated_at, d.version
+                    """,
+                    params
+                )
+                rows = cursor.fetchall()
+            
+            if not rows:
+                return {}
+            
+            results = {
+                row[0]: dict(zip(
+                    ['from_status', 'partner_id', 'customer_id', 'created_at', 'updated_at', 'version'],
+                    row[1:]
+                ))
+                for row in rows
+            }
+            
+            DeliveryStatusChange.objects.bulk_create([
+                DeliveryStatusChange(
+                    request_id=pk,
+                    partner_id=result['partner_id'],
+                    from_status=result['from_status'] or '',
+                    to_status=new_status,
+                    actor=actor
+                )
+                for pk, result in results.items()
+            ])
+            
+            partner_ids = {result['partner_id'] for result in results.values() if result['partner_id']}
+            if new_status in FINAL_STATUSES:
+                # One counter/rating UPDATE per partner, however many of
+                # their deliveries finished in this batch
+                finished = Counter(
+                    result['partner_id'] for result in results.values() if result['partner_id']
+                )
+                DeliveryPartner = cls._meta.get_field('partner').related_model
+                for partner_id, count in finished.items():
+                    DeliveryPartner.record_outcomes(partner_id, {new_status: count})
+            
+            cache.invalidate_on_commit(
+                cache.DELIVERY_STATISTICS, cache.AVAILABLE_PARTNERS,
+                *[cache.partner_scope(partner_id) for partner_id in partner_ids]
+            )
+            
+            from .analytics import invalidate_buckets
+            created_ats = [result['created_at'] for result in results.values()]
+            transaction.on_commit(lambda: [invalidate_buckets(created_at) for created_at in created_ats])
+            
+            from .events import status_changed
+            status_changed(results, new_status)
+        
+        return results
+    
+    @classmethod
+    def compare_and_set_status(cls, pk, new_status, actor=None, expected_version=None):
+        """
+        Move a single request to ``new_status`` if its current status allows it.
+        
+        Returns the updated row's details, or None if the transition was not
+        applied.
+        """
+        return cls.compare_and_set_statuses(new_status, {pk: expected_version}, actor=actor).get(pk)
     
-    def transition_status(self, new_status):
+    def transition_status(self, new_status, actor=None, expected_version=None):
         """
         Transition to new status if valid.
+        
+        Raises VersionConflict if the row changed since it was loaded so the
+        transition no longer applies.
+        """
+        if not self.can_transition_to(new_status):
+            return False
+        
+        result = DeliveryRequest.compare_and_set_status(
+            self.pk, new_status, actor=actor, expected_version=expected_version
+        )
+        if result is None:
+            raise VersionConflict(self.pk)
+        
+        self.status = new_status
+        self.partner_id = result['partner_id']
+        self.updated_at = result['updated_at']
+        self.version = result['version']
+        return True
+    
+    def assign_partner(self, partner, actor=None, expected_version=None):
+        """
+        Assign a delivery partner and move the request to 'assigned'.
+        
+        Raises VersionConflict if the row changed since it was loaded.
+        """
+        from_status = self.status
+        previous_partner_id = self.partner_id
+        with transaction.atomic():
+            if not self.apply_update({'partner': partner, 'status': 'assigned'}, expected_version):
+                raise VersionConflict(self.pk)
+            if previous_partner_id and previous_partner_id != partner.pk:
+                cache.invalidate_on_commit(cache.partner_scope(previous_partner_id))
+            self.record_status_change(from_status, 'assigned', actor)
+            
+            from .events import partner_assigned
+            partner_assigned(
+                self, previous_partner_id if previous_partner_id != partner.pk else None
+            )
+    
+    def record_status_change(self, from_status, to_status, actor=None):
+        """
+        Record a status change row for this request.
         """
-        if self.can_transition_to(new_status):
-            self.status = new_status
-            self.save()
-            return True
-        return False
+        if actor is not None and not actor.is_authenticated:
+            actor = None
+        
+        scopes = [cache.DELIVERY_STATISTICS, cache.AVAILABLE_PARTNERS]
+        if self.partner_id:
+            scopes.append(cache.partner_scope(self.partner_id))
+        cache.invalidate_on_commit(*scopes)
+        
+        from .analytics import invalidate_buckets
+        created_at = self.created_at
+        transaction.on_commit(lambda: invalidate_buckets(created_at))
+        
+        return DeliveryStatusChange.objects.create(
+            request=self,
+            partner_id=self.partner_id,
+            from_status=from_status or '',
+            to_status=to_status,
+            actor=actor
+        )
     
     @property
     def is_completed(self):
         """
         Check if delivery is completed.
         """
-        return self.status in ['delivered', 'cancelled', 'failed']
+        return self.status in FINAL_STATUSES
     
     @property
     def is_active(self):
@@ -167,6 +497,43 @@ class DeliveryRequest(models.Model):
         return not self.is_completed
 
 
+class SyncLogQuerySet(models.QuerySet):
+    """
+    Batched writes for sync logs.
+    """
+    
+    def record(self, delivery_requests, sync_status='success', error_message='', batch_size=500):
+        """
+        Write one log per delivery request in batched INSERTs.
+        """
+        synced_at = timezone.now() if sync_status == 'success' else None
+        return self.bulk_create(
+            [
+                self.model(
+                    request=delivery_request,
+                    sync_status=sync_status,
+                    error_message=error_message,
+                    synced_at=synced_at
+                )
+                for delivery_request in delivery_requests
+            ],
+            batch_size=batch_size
+        )
+    
+    def mark_success(self):
+        return self.update(sync_status='success', synced_at=timezone.now())
+    
+    def mark_failed(self, error_message=''):
+        return self.update(
+            sync_status='failed',
+            error_message=error_message,
+            retry_count=F('retry_count') + 1
+        )
+    
+    def mark_retry(self):
+        return self.update(sync_status='retry', retry_count=F('retry_count') + 1)
+
+
 class SyncLog(models.Model):
     """
     Model for tracking sync operations.
@@ -181,7 +548,11 @@ class SyncLog(models.Model):
     request = models.ForeignKey(
         DeliveryRequest,
         on_delete=models.CASCADE,
-        related_name='sync_logs'
+        related_name='sync_logs',
+        # delivery_requests is partitioned; its id alone can't be referenced
+        db_constraint=False,
+        # Covered by sync_logs_request_list_idx
+        db_index=False
     )
     sync_status = models.CharField(max_length=20, choices=STATUS_CHOICES)
     error_message = models.TextField(blank=True)
@@ -189,11 +560,20 @@ class SyncLog(models.Model):
     synced_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    objects = SyncLogQuerySet.as_manager()
+    
     class Meta:
         db_table = 'sync_logs'
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['request']),
+            # Every column SyncLogListView reads except the unbounded
+            # error_message, so its count is an index-only scan and a page
+            # only visits the heap for the rows it returns
+            models.Index(
+                fields=['request', '-created_at'],
+                include=['id', 'sync_status', 'retry_count', 'synced_at'],
+                name='sync_logs_request_list_idx'
+            ),
             models.Index(fields=['sync_status']),
             models.Index(fields=['created_at']),
         ]
@@ -201,14 +581,17 @@ class SyncLog(models.Model):
     def __str__(self):
         return f"Sync Log for Delivery #{self.request.id} - {self.sync_status}"
     
+    def _row(self):
+        # created_at lets PostgreSQL go straight to the right partition
+        return SyncLog.objects.filter(pk=self.pk, created_at=self.created_at)
+    
     def mark_success(self):
         """
         Mark sync as successful.
         """
-        from django.utils import timezone
         self.sync_status = 'success'
         self.synced_at = timezone.now()
-        self.save()
+        self._row().update(sync_status=self.sync_status, synced_at=self.synced_at)
     
     def mark_failed(self, error_message=''):
         """
@@ -217,7 +600,11 @@ class SyncLog(models.Model):
         self.sync_status = 'failed'
         self.error_message = error_message
         self.retry_count += 1
-        self.save()
+        self._row().update(
+            sync_status=self.sync_status,
+            error_message=self.error_message,
+            retry_count=F('retry_count') + 1
+        )
     
     def mark_retry(self):
         """
@@ -225,4 +612,155 @@ class SyncLog(models.Model):
         """
         self.sync_status = 'retry'
         self.retry_count += 1
-        self.save() 
\ No newline at end of file
+        self._row().update(sync_status=self.sync_status, retry_count=F('retry_count') + 1)
+
+
+class SyncLogSummary(models.Model):
+    """
+    Per-day counts of sync logs compacted by the retention job.
+    """
+    day = models.DateField()
+    sync_status = models.CharField(max_length=20, choices=SyncLog.STATUS_CHOICES)
+    count = models.PositiveIntegerField(default=0)
+    retry_count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        db_table = 'sync_log_summaries'
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'sync_status'],
+                name='unique_sync_log_summary_per_day'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.day} {self.sync_status}: {self.count}"
+
+
+class DeliveryStatusChangeQuerySet(models.QuerySet):
+    """
+    QuerySet helpers for status history.
+    """
+    
+    def with_duration(self, since_status=None):
+        """
+        Annotate each change with the time elapsed since the request entered
+        ``since_status`` (or since the request was created when ``None``).
+        Changes without a matching earlier row are excluded.
+        """
+        if since_status is None:
+            started_at = F('request__created_at')
+        else:
+            started_at = Subquery(
+                DeliveryStatusChange.objects.filter(
+                    request=OuterRef('request'),
+                    to_status=since_status
+                ).order_by('changed_at').values('changed_at')[:1]
+            )
+        
+        return self.annotate(started_at=started_at).filter(
+            started_at__isnull=False
+        ).annotate(
+            duration=ExpressionWrapper(
+                F('changed_at') - F('started_at'),
+                output_field=DurationField()
+            )
+        )
+    
+    def deliveries(self):
+        """
+        Completed deliveries annotated with pickup-to-dropoff duration.
+        """
+        return self.filter(to_status='delivered').with_duration('picked_up')
+
+
+class DeliveryStatusChange(models.Model):
+    """
+    Model for recording delivery status transitions.
+    """
+    request = models.ForeignKey(
+        DeliveryRequest,
+        on_delete=models.CASCADE,
+        related_name='status_changes',
+        db_constraint=False
+    )
+    # Partner at the time of the change, kept here so per-partner duration
+    # queries don't need to join back to delivery_requests.
+    partner = models.ForeignKey(
+        'partners.DeliveryPartner',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='status_changes'
+    )
+    from_status = models.CharField(max_length=20, choices=DeliveryRequest.STATUS_CHOICES, blank=True)
+    to_status = models.CharField(max_length=20, choices=DeliveryRequest.STATUS_CHOICES)
+    changed_at = models.DateTimeField(default=timezone.now)
+    actor = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    
+    objects = DeliveryStatusChangeQuerySet.as_manager()
+    
+    class Meta:
+        db_table = 'delivery_status_changes'
+        ordering = ['changed_at']
+        indexes = [
+            models.Index(fields=['request', 'to_status', 'changed_at']),
+            models.Index(fields=['partner', 'to_status', 'changed_at']),
+            models.Index(fields=['to_status', 'changed_at']),
+        ]
+    
+    def __str__(self):
+        return f"Delivery #{self.request_id}: {self.from_status or '-'} -> {self.to_status}"
+
+
+
+class DeliveryTombstone(models.Model):
+    """
+    Record of a deleted delivery request, kept for delta sync clients.
+    """
+    delivery_id = models.BigIntegerField()
+    customer = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    partner = models.ForeignKey(
+        'partners.DeliveryPartner',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    local_id = models.CharField(max_length=50, blank=True, null=True)
+    deleted_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        db_table = 'delivery_tombstones'
+        ordering = ['deleted_at', 'id']
+        indexes = [
+            models.Index(fields=['deleted_at']),
+            models.Index(fields=['customer', 'deleted_at']),
+            models.Index(fields=['partner', 'deleted_at']),
+        ]
+    
+    def __str__(self):
+        return f"Deleted delivery #{self.delivery_id}"
+    
+    @classmethod
+    def for_delivery(cls, delivery_request):
+        """
+        Build a tombstone for a delivery request about to be deleted.
+        """
+        return cls(
+            delivery_id=delivery_request.pk,
+            customer_id=delivery_request.customer_id,
+            partner_id=delivery_request.partner_id,
+            local_id=delivery_request.local_id
+        )
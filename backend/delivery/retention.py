@@ -0,0 +1,70 @@
+"""
+Sync log retention.
+
+Successful sync logs older than the retention period are deleted in small
+chunks, each in its own short transaction, and folded into per-day
+``SyncLogSummary`` rows by the same statement, so the summaries always
+match what was removed even if the job is interrupted. Chunks are picked
+with ``SKIP LOCKED`` so the job never waits on rows a sync is writing.
+"""
+import time
+
+from django.db import connection, transaction
+
+from .models import SyncLog, SyncLogSummary
+
+DEFAULT_CHUNK_SIZE = 5000
+
+COMPACT_SQL = """
+    WITH doomed AS (
+        DELETE FROM {logs} AS log
+        USING (
+            SELECT id, created_at
+            FROM {logs}
+            WHERE sync_status = 'success' AND created_at < %s
+            ORDER BY created_at
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        ) AS chunk
+        WHERE log.id = chunk.id AND log.created_at = chunk.created_at
+        RETURNING log.created_at, log.sync_status, log.retry_count
+    ),
+    summarized AS (
+        INSERT INTO {summaries} (day, sync_status, count, retry_count)
+        SELECT (created_at AT TIME ZONE 'UTC')::date, sync_status, count(*), sum(retry_count)
+        FROM doomed
+        GROUP BY 1, 2
+        ON CONFLICT (day, sync_status) DO UPDATE
+        SET count = {summaries}.count + EXCLUDED.count,
+            retry_count = {summaries}.retry_count + EXCLUDED.retry_count
+    )
+    SELECT count(*) FROM doomed
+"""
+
+
+def count_expired(before):
+    return SyncLog.objects.filter(sync_status='success', created_at__lt=before).count()
+
+
+def compact_sync_logs(before, chunk_size=DEFAULT_CHUNK_SIZE, pause=0.0):
+    """
+    Compact successful sync logs created before ``before``.
+
+    Yields the number of logs removed by each chunk. ``pause`` seconds are
+    slept between chunks to leave room for replication and vacuum.
+    """
+    sql = COMPACT_SQL.format(
+        logs=connection.ops.quote_name(SyncLog._meta.db_table),
+        summaries=connection.ops.quote_name(SyncLogSummary._meta.db_table)
+    )
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(sql, [before, chunk_size])
+            removed = cursor.fetchone()[0]
+
+        if removed:
+            yield removed
+        if removed < chunk_size:
+            return
+        if pause:
+            time.sleep(pause)
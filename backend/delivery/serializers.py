@@ -1,9 +1,15 @@
 from rest_framework import serializers
-from .models import DeliveryRequest, SyncLog
+from django.db import transaction
+from django.utils import timezone
+from .models import DeliveryRequest, DeliveryTombstone, SyncLog, VersionConflict
 from users.serializers import UserSerializer
+from partners.serializers import DeliveryPartnerListSerializer
+from users.models import full_name
+from sajilo_life.compiled import choice_display
+from sajilo_life.fieldsets import SparseFieldsetSerializerMixin
 
 
-class DeliveryRequestSerializer(serializers.ModelSerializer):
+class DeliveryRequestSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for DeliveryRequest model.
     """
@@ -20,12 +26,19 @@ class DeliveryRequestSerializer(serializers.ModelSerializer):
             'dropoff_lat', 'dropoff_lng', 'customer_name', 'customer_phone',
             'delivery_notes', 'status', 'status_display', 'estimated_distance',
             'estimated_duration', 'actual_distance', 'actual_duration',
-            'created_at', 'updated_at', 'is_synced', 'local_id'
+            'created_at', 'updated_at', 'is_synced', 'local_id', 'version'
         ]
         read_only_fields = [
             'id', 'customer', 'partner', 'partner_name', 'partner_phone',
-            'status_display', 'created_at', 'updated_at', 'is_synced'
+            'status_display', 'created_at', 'updated_at', 'is_synced', 'version'
         ]
+        expandable_fields = {
+            'partner': (DeliveryPartnerListSerializer, {}),
+        }
+        field_sources = {
+            'partner_name': ['partner__user__first_name', 'partner__user__last_name', 'partner__user__username'],
+            'status_display': ['status'],
+        }
 
 
 class DeliveryRequestCreateSerializer(serializers.ModelSerializer):
@@ -40,32 +53,60 @@ class DeliveryRequestCreateSerializer(serializers.ModelSerializer):
             'delivery_notes', 'local_id'
         ]
     
+    def validate_local_id(self, value):
+        if not value:
+            return None
+        user = self.context['request'].user
+        if DeliveryRequest.objects.filter(customer=user, local_id=value).exists():
+            raise serializers.ValidationError("A delivery request with this local ID already exists.")
+        return value
+    
     def create(self, validated_data):
         # Set the customer to the current user
-        validated_data['customer'] = self.context['request'].user
-        return super().create(validated_data)
+        user = self.context['request'].user
+        validated_data['customer'] = user
+        if not validated_data.get('local_id'):
+            return super().create(validated_data)
+        
+        with transaction.atomic():
+            DeliveryRequest.lock_local_ids(user.pk)
+            self.validate_local_id(validated_data['local_id'])
+            return super().create(validated_data)
 
 
 class DeliveryRequestUpdateSerializer(serializers.ModelSerializer):
     """
     Serializer for updating delivery requests.
+    
+    ``version`` is the version the client last saw; the update is rejected
+    with VersionConflict if the row has changed since.
     """
+    version = serializers.IntegerField(required=False)
+    
     class Meta:
         model = DeliveryRequest
         fields = [
             'pickup_address', 'dropoff_address', 'pickup_lat', 'pickup_lng',
             'dropoff_lat', 'dropoff_lng', 'customer_name', 'customer_phone',
-            'delivery_notes'
+            'delivery_notes', 'version'
         ]
+    
+    def update(self, instance, validated_data):
+        expected_version = validated_data.pop('version', None)
+        if not instance.apply_update(validated_data, expected_version):
+            raise VersionConflict(instance.pk)
+        return instance
 
 
 class DeliveryRequestStatusUpdateSerializer(serializers.ModelSerializer):
     """
     Serializer for updating delivery request status.
     """
+    version = serializers.IntegerField(required=False)
+    
     class Meta:
         model = DeliveryRequest
-        fields = ['status']
+        fields = ['status', 'version']
     
     def validate_status(self, value):
         instance = self.instance
@@ -77,12 +118,44 @@ class DeliveryRequestStatusUpdateSerializer(serializers.ModelSerializer):
     
     def update(self, instance, validated_data):
         new_status = validated_data.get('status')
-        if instance.transition_status(new_status):
+        request = self.context.get('request')
+        actor = request.user if request else None
+        if instance.transition_status(
+            new_status, actor=actor, expected_version=validated_data.get('version')
+        ):
             return instance
         else:
             raise serializers.ValidationError("Invalid status transition")
 
 
+class BulkStatusUpdateItemSerializer(serializers.Serializer):
+    """
+    Serializer for one item of a bulk status update.
+    """
+    id = serializers.IntegerField()
+    status = serializers.ChoiceField(choices=DeliveryRequest.STATUS_CHOICES)
+    version = serializers.IntegerField(required=False)
+
+
+class BulkStatusUpdateSerializer(serializers.Serializer):
+    """
+    Serializer for bulk status update requests.
+    """
+    MAX_UPDATES = 500
+    
+    updates = BulkStatusUpdateItemSerializer(many=True, allow_empty=False)
+    
+    def validate_updates(self, value):
+        if len(value) > self.MAX_UPDATES:
+            raise serializers.ValidationError(
+                f"At most {self.MAX_UPDATES} updates per request."
+            )
+        ids = [item['id'] for item in value]
+        if len(set(ids)) != len(ids):
+            raise serializers.ValidationError("Each delivery request may appear only once.")
+        return value
+
+
 class SyncLogSerializer(serializers.ModelSerializer):
     """
     Serializer for SyncLog model.
@@ -113,23 +186,14 @@ class OfflineSyncSerializer(serializers.Serializer):
     created_at = serializers.DateTimeField(required=False)
     
     def create(self, validated_data):
-        # Set the customer to the current user
-        validated_data['customer'] = self.context['request'].user
-        validated_data['is_synced'] = True  # Mark as synced since it's being created on server
-        
-        # Create the delivery request
-        delivery_request = DeliveryRequest.objects.create(**validated_data)
+        from .services import upsert_deliveries
         
-        # Create a success sync log
-        SyncLog.objects.create(
-            request=delivery_request,
-            sync_status='success'
-        )
-        
-        return delivery_request
+        # Upsert on (customer, local_id) so a retried sync doesn't duplicate
+        # the request; a success sync log is written either way
+        return upsert_deliveries(self.context['request'].user, [validated_data])[0]
 
 
-class DeliveryRequestListSerializer(serializers.ModelSerializer):
+class DeliveryRequestListSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for listing delivery requests with minimal data.
     """
@@ -143,6 +207,18 @@ class DeliveryRequestListSerializer(serializers.ModelSerializer):
             'status', 'status_display', 'partner_name', 'created_at',
             'is_synced', 'local_id'
         ]
+        expandable_fields = {
+            'customer': (UserSerializer, {}),
+            'partner': (DeliveryPartnerListSerializer, {}),
+        }
+        field_sources = {
+            'partner_name': ['partner__user__first_name', 'partner__user__last_name', 'partner__user__username'],
+            'status_display': ['status'],
+        }
+        compiled_fields = {
+            'partner_name': full_name,
+            'status_display': choice_display(DeliveryRequest.STATUS_CHOICES),
+        }
 
 
 class DeliveryStatisticsSerializer(serializers.Serializer):
@@ -156,4 +232,127 @@ class DeliveryStatisticsSerializer(serializers.Serializer):
     cancelled_requests = serializers.IntegerField()
     success_rate = serializers.FloatField()
     average_delivery_time = serializers.FloatField(required=False, allow_null=True)
-    total_distance = serializers.FloatField(required=False, allow_null=True) 
\ No newline at end of file
+    median_delivery_time = serializers.FloatField(required=False, allow_null=True)
+    p90_delivery_time = serializers.FloatField(required=False, allow_null=True)
+    total_distance = serializers.FloatField(required=False, allow_null=True) 
+
+
+class DeliveryAnalyticsQuerySerializer(serializers.Serializer):
+    """
+    Serializer for delivery analytics query parameters.
+    """
+    interval = serializers.ChoiceField(choices=['hour', 'day'], default='hour')
+    start = serializers.DateTimeField(required=False)
+    end = serializers.DateTimeField(required=False)
+    
+    def validate(self, attrs):
+        from .analytics import DEFAULT_RANGES, INTERVALS, MAX_BUCKETS
+        
+        interval = attrs['interval']
+        attrs.setdefault('end', timezone.now())
+        attrs.setdefault('start', attrs['end'] - DEFAULT_RANGES[interval])
+        
+        if attrs['start'] >= attrs['end']:
+            raise serializers.ValidationError("'start' must be before 'end'.")
+        
+        if (attrs['end'] - attrs['start']) / INTERVALS[interval][1] > MAX_BUCKETS:
+            raise serializers.ValidationError(
+                f"Range too large: at most {MAX_BUCKETS} {interval} buckets per request."
+            )
+        return attrs
+
+
+class DeliveryExportQuerySerializer(serializers.Serializer):
+    """
+    Serializer for delivery export query parameters.
+    """
+    start = serializers.DateTimeField(required=False)
+    end = serializers.DateTimeField(required=False)
+    status = serializers.CharField(required=False)
+    partner = serializers.IntegerField(required=False)
+    export_format = serializers.ChoiceField(choices=['csv', 'ndjson'], default='csv')
+    
+    def validate_status(self, value):
+        statuses = [status.strip() for status in value.split(',') if status.strip()]
+        valid = dict(DeliveryRequest.STATUS_CHOICES)
+        unknown = [status for status in statuses if status not in valid]
+        if unknown:
+            raise serializers.ValidationError(f"Unknown status: {', '.join(unknown)}.")
+        return statuses
+    
+    def validate(self, attrs):
+        if attrs.get('start') and attrs.get('end') and attrs['start'] >= attrs['end']:
+            raise serializers.ValidationError("'start' must be before 'end'.")
+        return attrs
+
+
+class DeliveryAnalyticsBucketSerializer(serializers.Serializer):
+    """
+    Serializer for a single delivery analytics bucket.
+    """
+    bucket = serializers.DateTimeField()
+    total = serializers.IntegerField()
+    delivered = serializers.IntegerField()
+    cancelled = serializers.IntegerField()
+    completion_rate = serializers.FloatField()
+    cancellation_rate = serializers.FloatField()
+
+
+
+class DeliveryChangesQuerySerializer(serializers.Serializer):
+    """
+    Serializer for delta sync query parameters.
+    """
+    cursor = serializers.CharField(required=False, allow_blank=True)
+    limit = serializers.IntegerField(required=False, min_value=1)
+    
+    def validate_cursor(self, value):
+        from .changes import InvalidCursor, decode_cursor
+        try:
+            return decode_cursor(value)
+        except InvalidCursor as exc:
+            raise serializers.ValidationError(str(exc))
+    
+    def validate_limit(self, value):
+        from .changes import MAX_LIMIT
+        return min(value, MAX_LIMIT)
+
+
+class DeliveryEventsQuerySerializer(serializers.Serializer):
+    """
+    Serializer for event stream query parameters.
+    """
+    delivery = serializers.IntegerField(required=False, min_value=1)
+
+
+class DeliveryTombstoneSerializer(serializers.ModelSerializer):
+    """
+    Serializer for deleted delivery requests in the changes feed.
+    """
+    id = serializers.IntegerField(source='delivery_id', read_only=True)
+    
+    class Meta:
+        model = DeliveryTombstone
+        fields = ['id', 'local_id', 'deleted_at']
+
+
+
+class SyncReconcileSerializer(serializers.Serializer):
+    """
+    Serializer for offline sync reconciliation requests.
+    """
+    MAX_DIGESTS = 5000
+    
+    digests = serializers.DictField(
+        child=serializers.CharField(max_length=64),
+        allow_empty=True
+    )
+    
+    def validate_digests(self, value):
+        if len(value) > self.MAX_DIGESTS:
+            raise serializers.ValidationError(
+                f"At most {self.MAX_DIGESTS} digests per request."
+            )
+        if any(len(local_id) > 50 for local_id in value):
+            raise serializers.ValidationError("Local IDs are at most 50 characters.")
+        return value
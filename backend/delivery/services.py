@@ -0,0 +1,304 @@
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.utils import timezone
+from .analytics import invalidate_buckets
+from .models import VALID_TRANSITIONS, DeliveryRequest, SyncLog
+from .changes import scope_for_user
+from .digests import content_hash
+from .serializers import OfflineSyncSerializer
+from sajilo_life import cache
+
+
+BULK_SYNC_BATCH_SIZE = 500
+
+# Columns refreshed when a retried sync hits an existing (customer, local_id)
+# with different content
+SYNC_UPDATE_FIELDS = [
+    'pickup_address', 'dropoff_address', 'pickup_lat', 'pickup_lng',
+    'dropoff_lat', 'dropoff_lng', 'customer_name', 'customer_phone',
+    'delivery_notes', 'content_hash', 'is_synced', 'updated_at'
+]
+
+
+def validate_sync_items(items, context):
+    """
+    Validate offline sync items, splitting them into valid data and errors.
+    """
+    valid_items = []
+    failed_items = []
+
+    for item in items:
+        if not isinstance(item, dict):
+            failed_items.append({
+                'local_id': None,
+                'errors': {'non_field_errors': ['Expected an object.']}
+            })
+            continue
+
+        serializer = OfflineSyncSerializer(data=item, context=context)
+        if serializer.is_valid():
+            valid_items.append(serializer.validated_data)
+        else:
+            failed_items.append({
+                'local_id': item.get('local_id'),
+                'errors': serializer.errors
+            })
+
+    return valid_items, failed_items
+
+
+def upsert_deliveries(user, valid_items):
+    """
+    Insert or update offline delivery requests keyed on (customer, local_id).
+
+    Retried syncs update the existing rows instead of creating duplicates,
+    and only where the content hash differs: an identical retry writes
+    nothing and keeps the row's version, so optimistic writers holding it
+    aren't sent a spurious conflict. Returns the stored delivery requests
+    in input order.
+    """
+    # ON CONFLICT can't touch the same row twice in one statement
+    items_by_local_id = {}
+    for data in valid_items:
+        items_by_local_id[data['local_id']] = data
+
+    if not items_by_local_id:
+        return []
+
+    started_at = timezone.now()
+    with transaction.atomic():
+        # The conflict target includes the partition key, so existing rows are
+        # matched on their own created_at; new rows get started_at
+        DeliveryRequest.lock_local_ids(user.pk)
+        stored_by_local_id = {
+            delivery_request.local_id: delivery_request
+            for delivery_request in DeliveryRequest.objects.filter(
+                customer=user,
+                local_id__in=list(items_by_local_id)
+            ).select_related('partner__user')
+        }
+
+        inserted = len(stored_by_local_id) < len(items_by_local_id)
+        rows = []
+        for local_id, data in items_by_local_id.items():
+            stored = stored_by_local_id.get(local_id)
+            rows.append(DeliveryRequest(
+                customer=user, is_synced=True, content_hash=content_hash(data),
+                **dict(data, created_at=stored.created_at if stored else started_at)
+            ))
+
+        for start in range(0, len(rows), BULK_SYNC_BATCH_SIZE):
+            for written in _insert_or_update_changed(rows[start:start + BULK_SYNC_BATCH_SIZE]):
+                stored = stored_by_local_id.get(written.local_id)
+                if stored is not None and stored.partner_id == written.partner_id:
+                    written.partner = stored.partner
+                stored_by_local_id[written.local_id] = written
+
+        delivery_requests = [stored_by_local_id[local_id] for local_id in items_by_local_id]
+        for delivery_request in delivery_requests:
+            delivery_request.customer = user
+
+        SyncLog.objects.record(delivery_requests, 'success', batch_size=BULK_SYNC_BATCH_SIZE)
+        cache.invalidate_on_commit(cache.DELIVERY_STATISTICS)
+        if inserted:
+            # An hour bucket that closed while this ran may be cached without them
+            transaction.on_commit(lambda: invalidate_buckets(started_at))
+
+    return delivery_requests
+
+
+def _insert_or_update_changed(rows):
+    """
+    Upsert unsaved delivery requests in one ``INSERT ... ON CONFLICT``.
+
+    A conflicting row is updated, and its version bumped, only if its
+    content hash differs or it isn't marked synced. Returns the inserted
+    and updated rows as loaded by ``RETURNING``; unchanged rows are absent.
+    """
+    meta = DeliveryRequest._meta
+    fields = [field for field in meta.concrete_fields if not field.primary_key]
+    quote = connection.ops.quote_name
+
+    values = []
+    for row in rows:
+        values.extend(
+            field.get_db_prep_save(field.pre_save(row, add=True), connection)
+            for field in fields
+        )
+    placeholders = '(' + ', '.join(['%s'] * len(fields)) + ')'
+    updates = ', '.join(
+        f'{quote(column)} = EXCLUDED.{quote(column)}'
+        for column in [meta.get_field(name).column for name in SYNC_UPDATE_FIELDS]
+    )
+
+    return list(DeliveryRequest.objects.raw(
+        f"""
+        INSERT INTO {quote(meta.db_table)} AS d ({', '.join(quote(field.column) for field in fields)})
+        VALUES {', '.join([placeholders] * len(rows))}
+        ON CONFLICT (customer_id, local_id, created_at) DO UPDATE
+        SET {updates}, version = d.version + 1
+        WHERE d.content_hash IS DISTINCT FROM EXCLUDED.content_hash OR NOT d.is_synced
+        RETURNING d.*
+        """,
+        values
+    ))
+
+
+def bulk_sync_deliveries(user, items, context=None):
+    """
+    Validate and upsert offline delivery requests in a single transaction.
+
+    Returns the stored delivery requests and the per-item failures.
+    """
+    valid_items, failed_items = validate_sync_items(items, context or {})
+    return upsert_deliveries(user, valid_items), failed_items
+
+
+def stream_sync_deliveries(user, lines, context=None, batch_size=BULK_SYNC_BATCH_SIZE):
+    """
+    Validate and upsert parsed NDJSON lines in fixed-size batches.
+
+    ``lines`` yields ``(line_number, item, error)`` tuples. Yields one result
+    per item as soon as its batch is stored, so memory stays bounded by the
+    batch size regardless of the upload size. Each batch commits on its own;
+    because the upsert is idempotent, a client can safely resend the whole
+    upload after a failure.
+    """
+    context = context or {}
+    pending = []
+    pending_lines = {}
+
+    def flush():
+        for delivery_request in upsert_deliveries(user, pending):
+            yield {
+                'line': pending_lines[delivery_request.local_id],
+                'local_id': delivery_request.local_id,
+                'id': delivery_request.id,
+                'status': 'synced',
+            }
+        pending.clear()
+        pending_lines.clear()
+
+    for line_number, item, error in lines:
+        if error:
+            yield {
+                'line': line_number,
+                'local_id': None,
+                'status': 'failed',
+                'errors': {'non_field_errors': [error]},
+            }
+            continue
+
+        valid_items, failed_items = validate_sync_items([item], context)
+        for failure in failed_items:
+            yield dict(failure, line=line_number, status='failed')
+        for data in valid_items:
+            if data['local_id'] in pending_lines:
+                # Repeated local id: store the earlier copy first so every
+                # line gets its own result
+                yield from flush()
+            pending.append(data)
+            pending_lines[data['local_id']] = line_number
+
+        if len(pending) >= batch_size:
+            yield from flush()
+
+    if pending:
+        yield from flush()
+
+
+def reconcile_digests(user, digests):
+    """
+    Compare client (local_id -> content hash) digests with stored rows.
+
+    Returns the local ids the server doesn't have and those it holds a
+    different version of, using one query on the (customer, local_id)
+    unique index, which also covers ``content_hash``.
+    """
+    stored = dict(
+        DeliveryRequest.objects.filter(
+            customer=user,
+            local_id__in=list(digests)
+        ).order_by().values_list('local_id', 'content_hash')
+    )
+
+    missing = []
+    changed = []
+    for local_id, digest in digests.items():
+        if local_id not in stored:
+            missing.append(local_id)
+        elif stored[local_id] != digest:
+            changed.append(local_id)
+
+    return missing, changed
+
+
+def bulk_transition_status(user, updates):
+    """
+    Apply a batch of status transitions in one transaction.
+    
+    ``updates`` is a list of ``{'id', 'status', 'version'}`` items with unique
+    ids. Current statuses are read in one query and checked against the
+    transition rules; the valid transitions are then applied with one
+    compare-and-set UPDATE per target status. Returns one result per item,
+    in input order.
+    """
+    deliveries, _ = scope_for_user(user)
+    current = {
+        row['id']: row
+        for row in deliveries.filter(
+            pk__in=[update['id'] for update in updates]
+        ).order_by().values('id', 'status', 'version')
+    }
+    
+    results = {}
+    expected_by_status = defaultdict(dict)
+    for update in updates:
+        pk = update['id']
+        expected_version = update.get('version')
+        row = current.get(pk)
+        if row is None:
+            results[pk] = {
+                'id': pk,
+                'outcome': 'not_found',
+                'error': 'Delivery request not found.'
+            }
+        elif update['status'] not in VALID_TRANSITIONS.get(row['status'], ()):
+            results[pk] = {
+                'id': pk,
+                'outcome': 'invalid_transition',
+                'error': f"Cannot transition from '{row['status']}' to '{update['status']}'"
+            }
+        elif expected_version is not None and expected_version != row['version']:
+            results[pk] = {
+                'id': pk,
+                'outcome': 'conflict',
+                'error': 'Delivery request was modified by another request.',
+                'version': row['version']
+            }
+        else:
+            expected_by_status[update['status']][pk] = expected_version
+    
+    with transaction.atomic():
+        for new_status, expected_versions in expected_by_status.items():
+            applied = DeliveryRequest.compare_and_set_statuses(
+                new_status, expected_versions, actor=user
+            )
+            for pk in expected_versions:
+                if pk in applied:
+                    results[pk] = {
+                        'id': pk,
+                        'outcome': 'updated',
+                        'status': new_status,
+                        'version': applied[pk]['version']
+                    }
+                else:
+                    # Changed between the check and the update
+                    results[pk] = {
+                        'id': pk,
+                        'outcome': 'conflict',
+                        'error': 'Delivery request was modified by another request.'
+                    }
+    
+    return [results[update['id']] for update in updates]
@@ -0,0 +1,1601 @@
+import base64
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+import random
+import tempfile
+import threading
+from contextlib import nullcontext
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache as django_cache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import AsyncRequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework_simplejwt.tokens import AccessToken
+
+from partners.models import DeliveryPartner
+from partners.serializers import DeliveryPartnerListSerializer
+from sajilo_life import columnar, messagepack, ndjson, partitions, pubsub
+from sajilo_life.compiled import CompiledSerializer
+from sajilo_life.fieldsets import parse_fieldset
+
+from . import analytics, async_views, changes, events, export, retention, services
+from .changes import scope_for_user
+from .models import (
+    ACTIVE_STATUSES, LOCAL_ID_KEYS_TABLE, DeliveryRequest, DeliveryStatusChange, SyncLog,
+    SyncLogSummary, VersionConflict
+)
+from .serializers import DeliveryRequestListSerializer, DeliveryRequestSerializer
+from .services import bulk_sync_deliveries, stream_sync_deliveries
+
+User = get_user_model()
+
+
+def create_delivery(customer, **fields):
+    return DeliveryRequest.objects.create(**dict({
+        'customer': customer,
+        'pickup_address': 'Thamel, Kathmandu',
+        'dropoff_address': 'Jawalakhel, Lalitpur',
+        'customer_name': 'Sita Sharma',
+        'customer_phone': '+9779800000000',
+    }, **fields))
+
+
+def sync_item(local_id, **overrides):
+    return dict({
+        'local_id': local_id,
+        'pickup_address': 'Thamel, Kathmandu',
+        'dropoff_address': 'Jawalakhel, Lalitpur',
+        'pickup_lat': '27.71500000',
+        'pickup_lng': '85.31200000',
+        'customer_name': 'Sita Sharma',
+        'customer_phone': '+9779800000000',
+    }, **overrides)
+
+
+class UpsertDeliveriesTests(APITestCase):
+    """
+    Offline sync upserts on (customer, local_id) and only rewrites changed rows.
+    """
+    
+    def setUp(self):
+        self.customer = User.objects.create_user(
+            username='customer', email='customer@example.com', password='secret'
+        )
+    
+    def sync(self, *items):
+        stored, failed = bulk_sync_deliveries(self.customer, list(items))
+        self.assertEqual(failed, [])
+        return stored
+    
+    def test_new_insert(self):
+        stored = self.sync(sync_item('a'), sync_item('b'))
+        
+        self.assertEqual([d.local_id for d in stored], ['a', 'b'])
+        self.assertEqual([d.version for d in stored], [1, 1])
+        self.assertTrue(all(d.pk for d in stored))
+        self.assertEqual(DeliveryRequest.objects.filter(customer=self.customer).count(), 2)
+    
+    def test_identical_retry_writes_nothing(self):
+        first, = self.sync(sync_item('a'))
+        
+        retried, = self.sync(sync_item('a'))
+        
+        self.assertEqual(retried.pk, first.pk)
+        self.assertEqual(retried.version, first.version)
+        stored = DeliveryRequest.objects.get(pk=first.pk)
+        self.assertEqual(stored.version, first.version)
+        self.assertEqual(stored.updated_at, first.updated_at)
+        self.assertEqual(DeliveryRequest.objects.filter(customer=self.customer).count(), 1)
+    
+    def test_changed_retry_updates_and_bumps_version(self):
+        first, unchanged = self.sync(sync_item('a'), sync_item('b'))
+        
+        retried, same = self.sync(sync_item('a', delivery_notes='Ring twice'), sync_item('b'))
+        
+        self.assertEqual(retried.pk, first.pk)
+        self.assertEqual(retried.version, first.version + 1)
+        self.assertEqual(same.version, unchanged.version)
+        stored = DeliveryRequest.objects.get(pk=first.pk)
+        self.assertEqual(stored.delivery_notes, 'Ring twice')
+        self.assertEqual(stored.version, first.version + 1)
+        self.assertNotEqual(stored.content_hash, first.content_hash)
+        self.assertEqual(DeliveryRequest.objects.get(pk=unchanged.pk).version, unchanged.version)
+
+
+class BulkSyncTests(APITestCase):
+    """
+    Bulk sync validates every item, then stores the valid ones in one batch.
+    """
+    
+    def setUp(self):
+        self.customer = User.objects.create_user(
+            username='customer', email='customer@example.com', password='secret'
+        )
+        self.client.force_authenticate(self.customer)
+    
+    def post(self, items):
+        return self.client.post('/api/delivery/sync/bulk/', {'requests': items}, format='json')
+    
+    def test_reports_each_failure(self):
+        response = self.post([sync_item('a'), {'local_id': 'b'}, 'not an object', sync_item('c')])
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['message'], 'Synced 2 requests, 2 failed.')
+        self.assertEqual(
+            [item['local_id'] for item in response.data['synced_requests']], ['a', 'c']
+        )
+        self.assertEqual(
+            [item['local_id'] for item in response.data['failed_requests']], ['b', None]
+        )
+        self.assertIn('pickup_address', response.data['failed_requests'][0]['errors'])
+        self.assertEqual(
+            sorted(DeliveryRequest.objects.values_list('local_id', flat=True)), ['a', 'c']
+        )
+        self.assertEqual(SyncLog.objects.filter(sync_status='success').count(), 2)
+    
+    def test_queries_do_not_grow_with_items(self):
+        with CaptureQueriesContext(connection) as few:
+            self.post([sync_item(f'a{index}') for index in range(2)])
+        with CaptureQueriesContext(connection) as many:
+            self.post([sync_item(f'b{index}') for index in range(50)])
+        
+        self.assertEqual(len(many), len(few))
+        self.assertEqual(DeliveryRequest.objects.count(), 52)
+    
+    def test_requests_must_be_a_list(self):
+        response = self.client.post(
+            '/api/delivery/sync/bulk/', {'requests': {'local_id': 'a'}}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class BulkSyncLayoutTests(APITestCase):
+    """
+    Bulk sync takes the rows layout, as JSON or MessagePack.
+    """
+    
+    columns = ['local_id', 'pickup_address', 'dropoff_address', 'customer_name', 'customer_phone']
+    
+    def setUp(self):
+        self.customer = User.objects.create_user(
+            username='customer', email='customer@example.com', password='secret'
+        )
+        self.client.force_authenticate(self.customer)
+    
+    def rows(self, *local_ids):
+        return [
+            [local_id, 'Thamel, Kathmandu', 'Jawalakhel, Lalitpur', 'Sita Sharma', '+9779800000000']
+            for local_id in local_ids
+        ]
+    
+    def test_rows_layout(self):
+        rows = self.rows('a', 'b')
+        rows.insert(1, ['short'])
+        rows.append(['c', '', 'Jawalakhel, Lalitpur', 'Sita Sharma', '+9779800000000'])
+        
+        response = self.client.post(
+            '/api/delivery/sync/bulk/', {'columns': self.columns, 'rows': rows}, format='json'
+        )
+        
+        self.assertEqual(response.status_code, 200)
+        synced = response.data['synced_requests']
+        self.assertEqual(synced['columns'], list(DeliveryRequestSerializer().fields))
+        local_ids = [row[synced['columns'].index('local_id')] for row in synced['rows']]
+        self.assertEqual(local_ids, ['a', 'b'])
+        
+        failed = response.data['failed_requests']
+        self.assertEqual((failed[0]['row'], failed[0]['local_id']), (1, None))
+        self.assertEqual(failed[1]['local_id'], 'c')
+        self.assertIn('pickup_address', failed[1]['errors'])
+    
+    def test_duplicate_columns(self):
+        response = self.client.post('/api/delivery/sync/bulk/', {
+            'columns': ['local_id', 'local_id'], 'rows': [['a', 'b']]
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(DeliveryRequest.objects.exists())
+    
+    @skipUnless(messagepack.msgpack is not None, 'msgpack is not installed')
+    def test_messagepack(self):
+        body = {'columns': self.columns, 'rows': self.rows('a', 'b')}
+        as_json = self.client.post('/api/delivery/sync/bulk/', body, format='json')
+        
+        # An identical retry, so the stored rows come back unchanged
+        response = self.client.post(
+            '/api/delivery/sync/bulk/', messagepack.msgpack.packb(body),
+            content_type=messagepack.MEDIA_TYPE, HTTP_ACCEPT=messagepack.MEDIA_TYPE
+        )
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], messagepack.MEDIA_TYPE)
+        self.assertEqual(messagepack.msgpack.unpackb(response.content), json.loads(as_json.content))
+        self.assertEqual(DeliveryRequest.objects.count(), 2)
+
+
+class BulkSyncStreamTests(APITestCase):
+    """
+    NDJSON uploads are stored in batches and answered line by line.
+    """
+    
+    def setUp(self):
+        self.customer = User.objects.create_user(
+            username='customer', email='customer@example.com', password='secret'
+        )
+        self.client.force_authenticate(self.customer)
+    
+    def upload(self, lines):
+        response = self.client.post(
+            '/api/delivery/sync/bulk/stream/', b'\n'.join(lines), content_type=ndjson.CONTENT_TYPE
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], ndjson.CONTENT_TYPE)
+        return [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+    
+    def test_results_and_summary(self):
+        results = self.upload([
+            json.dumps(sync_item('a')).encode(),
+            b'{"local_id": "broken", ',
+            b'',
+            json.dumps(sync_item('b')).encode(),
+            json.dumps({'local_id': 'c'}).encode(),
+        ])
+        
+        summary = results.pop()
+        self.assertEqual(summary, {'summary': {'synced': 2, 'failed': 2}})
+        results.sort(key=lambda result: result['line'])
+        self.assertEqual(
+            [(result['line'], result['local_id'], result['status']) for result in results],
+            [(1, 'a', 'synced'), (2, None, 'failed'), (4, 'b', 'synced'), (5, 'c', 'failed')]
+        )
+        self.assertEqual(results[1]['errors'], {'non_field_errors': ['Invalid JSON.']})
+        self.assertIn('pickup_address', results[3]['errors'])
+        stored = dict(DeliveryRequest.objects.values_list('local_id', 'id'))
+        self.assertEqual(results[0]['id'], stored['a'])
+        self.assertEqual(sorted(stored), ['a', 'b'])
+    
+    def test_stored_in_batches(self):
+        lines = [(number, sync_item(f'l{number}'), None) for number in range(1, 6)]
+        results = stream_sync_deliveries(self.customer, iter(lines), batch_size=2)
+        
+        self.assertEqual(next(results)['line'], 1)
+        self.assertEqual(DeliveryRequest.objects.count(), 2)
+        self.assertEqual([result['line'] for result in results], [2, 3, 4, 5])
+        self.assertEqual(DeliveryRequest.objects.count(), 5)
+    
+    def test_requires_ndjson(self):
+        response = self.client.post(
+            '/api/delivery/sync/bulk/stream/', {'requests': [sync_item('a')]}, format='json'
+        )
+        self.assertEqual(response.status_code, 415)
+
+
+class SyncReconcileTests(APITestCase):
+    """
+    Digests computed the documented way match the server's.
+    """
+    
+    def setUp(self):
+        self.customer = User.objects.create_user(
+            username='customer', email='customer@example.com', password='secret'
+        )
+        self.client.force_authenticate(self.customer)
+    
+    def client_digest(self, item):
+        """
+        The digest as docs/delivery_api_endpoints.md tells clients to compute it.
+        """
+        canonical = {
+            name: item.get(name) or ''
+            for name in ('pickup_address', 'dropoff_address', 'customer_name', 'customer_phone',
+                         'delivery_notes')
+        }
+        for name in ('pickup_lat', 'pickup_lng', 'dropoff_lat', 'dropoff_lng'):
+            value = item.get(name)
+            canonical[name] = None if value is None else f'{Decimal(str(value)):.8f}'
+        payload = json.dumps(canonical, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def test_round_trip(self):
+        items = [
+            sync_item('a', pickup_address='ठमेल, काठमाडौं', pickup_lat=27.715, dropoff_lng='85.3'),
+            sync_item('b', delivery_notes='Ring twice'),
+        ]
+        bulk_sync_deliveries(self.customer, items)
+        
+        digests = {item['local_id']: self.client_digest(item) for item in items}
+        self.assertEqual(
+            digests, dict(DeliveryRequest.objects.values_list('local_id', 'content_hash'))
+        )
+        
+        changed = dict(items[1], delivery_notes='Ring once')
+        digests.update(b=self.client_digest(changed), c=self.client_digest(sync_item('c')))
+        response = self.client.post('/api/delivery/sync/reconcile/', {'digests': digests}, format='json')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'missing': ['c'], 'changed': ['b']})
+    
+    def test_only_own_deliveries(self):
+        other = User.objects.create_user(
+            username='other', email='other@example.com', password='secret'
+        )
+        bulk_sync_deliveries(other, [sync_item('a')])
+        
+        response = self.client.post('/api/delivery/sync/reconcile/', {
+            'digests': {'a': self.client_digest(sync_item('a'))}
+        }, format='json')
+        self.assertEqual(response.data, {'missing': ['a'], 'changed': []})
+
+
+class OptimisticSaveTests(APITestCase):
+    """
+    Saves and updates of a delivery only apply to the version they loaded.
+    """
+    
+    def setUp(self):
+        self.customer = User.objects.create_user(
+            username='customer', email='customer@example.com', password='secret'
+        )
+        self.delivery = create_delivery(self.customer)
+        self.client.force_authenticate(self.customer)
+    
+    def test_save_bumps_version(self):
+        self.delivery.delivery_notes = 'Ring twice'
+        self.delivery.save()
+        
+        self.assertEqual(self.delivery.version, 2)
+        self.assertEqual(DeliveryRequest.objects.get(pk=self.delivery.pk).version, 2)
+    
+    def test_stale_save_raises_conflict(self):
+        stale = DeliveryRequest.objects.get(pk=self.delivery.pk)
+        self.delivery.delivery_notes = 'Ring twice'
+        self.delivery.save()
+        
+        stale.delivery_notes = 'Leave at the gate'
+        with self.assertRaises(VersionConflict):
+            stale.save()
+        
+        self.assertEqual(stale.version, 1)
+        stored = DeliveryRequest.objects.get(pk=self.delivery.pk)
+        self.assertEqual(stored.delivery_notes, 'Ring twice')
+        self.assertEqual(stored.version, 2)
+    
+    def test_stale_save_with_update_fields_raises_conflict(self):
+        DeliveryRequest.objects.filter(pk=self.delivery.pk).update(version=5)
+        
+        self.delivery.status = 'cancelled'
+        with self.assertRaises(VersionConflict):
+            self.delivery.save(update_fields=['status'])
+        self.assertEqual(DeliveryRequest.objects.get(pk=self.delivery.pk).status, 'pending')
+    
+    def test_update_with_stale_version_returns_409(self):
+        response = self.client.patch(
+            f'/api/delivery/requests/{self.delivery.pk}/',
+            {'delivery_notes': 'Ring twice', 'version': 1},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        
+        response = self.client.patch(
+            f'/api/delivery/requests/{self.delivery.pk}/',
+            {'delivery_notes': 'Leave at the gate', 'version': 1},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['delivery_request']['version'], 2)
+        self.assertEqual(response.data['delivery_request']['delivery_notes'], 'Ring twice')
+    
+    def test_status_update_with_stale_version_returns_409(self):
+        response = self.client.patch(
+            f'/api/delivery/requests/{self.delivery.pk}/status/',
+            {'status': 'cancelled', 'version': 7},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['delivery_request']['status'], 'pending')
+
+
+class StatusTransitionTests(APITestCase):
+    """
+    Status transitions are a compare-and-set on status and version.
+    """
+    
+    def setUp(self):
+        self.customer = User.objects.create_user(
+            username='customer', email='customer@example.com', password='secret'
+        )
+        partner_user = User.objects.create_user(
+            username='partner', email='partner@example.com', password='secret', role='partner'
+        )
+        self.partner = DeliveryPartner.objects.create(
+            user=partner_user, vehicle_type='motorcycle', rating=Decimal('4.00')
+        )
+    
+    def test_transition(self):
+        delivery = create_delivery(self.customer, partner=self.partner, status='assigned')
+        
+        self.assertTrue(delivery.transition_status('picked_up', actor=self.partner.user))
+        
+        self.assertEqual(delivery.status, 'picked_up')
+        self.assertEqual(delivery.version, 2)
+        stored = DeliveryRequest.objects.get(pk=delivery.pk)
+        self.assertEqual((stored.status, stored.version), ('picked_up', 2))
+        change = DeliveryStatusChange.objects.get(request_id=delivery.pk)
+        self.assertEqual(
+            (change.from_status, change.to_status, change.partner_id, change.actor_id),
+            ('assigned', 'picked_up', self.partner.pk, self.partner.user.pk)
+        )
+    
+    def test_stale_version_conflicts(self):
+        delivery = create_delivery(self.customer)
+        
+        with self.assertRaises(VersionConflict):
+            delivery.transition_status('cancelled', expected_version=3)
+        
+        stored = DeliveryRequest.objects.get(pk=delivery.pk)
+        self.assertEqual((stored.status, stored.version), ('pending', 1))
+        self.assertFalse(DeliveryStatusChange.objects.filter(request_id=delivery.pk).exists())
+    
+    def test_illegal_transition_is_refused(self):
+        delivery = create_delivery(self.customer)
+        
+        self.assertFalse(delivery.transition_status('delivered'))
+        self.assertEqual(DeliveryRequest.objects.get(pk=delivery.pk).status, 'pending')
+    
+    def test_changed_predecessor_conflicts(self):
+        # Loaded as in_transit, but cancelled since: delivered no longer applies
+        delivery = create_delivery(self.customer, partner=self.partner, status='in_transit')
+        DeliveryRequest.objects.filter(pk=delivery.pk).update(status='cancelled')
+        
+        self.assertIsNone(DeliveryRequest.compare_and_set_status(delivery.pk, 'delivered'))
+        with self.assertRaises(VersionConflict):
+            delivery.transition_status('delivered')
+        
+        self.assertEqual(DeliveryRequest.objects.get(pk=delivery.pk).status, 'cancelled')
+        self.partner.refresh_from_db()
+        self.assertEqual(self.partner.total_deliveries, 0)
+    
+    def test_final_status_records_outcome(self):
+        delivered = create_delivery(self.customer, partner=self.partner, status='in_transit')
+        failed = create_delivery(self.customer, partner=self.partner, status='in_transit')
+        
+        delivered.transition_status('delivered')
+        failed.transition_status('failed')
+        
+        self.partner.refresh_from_db()
+        self.assertEqual(self.partner.total_deliveries, 2)
+        self.assertEqual(self.partner.successful_deliveries, 1)
+        self.assertEqual(self.partner.cancelled_deliveries, 1)
+        self.assertEqual(self.partner.rating, Decimal('3.90'))
+    
+    def test_bulk_update_reports_each_item(self):
+        picked_up = create_delivery(self.customer, partner=self.partner, status='assigned')
+        delivered = create_delivery(self.customer, partner=self.partner, status='in_transit')
+        pending = create_delivery(self.customer, partner=self.partner)
+        stale = create_delivery(self.customer, partner=self.partner, status='in_transit')
+        other = create_delivery(self.customer, status='assigned')
+        
+        self.client.force_authenticate(self.partner.user)
+        response = self.client.post('/api/delivery/requests/status/bulk/', {'updates': [
+            {'id': picked_up.pk, 'status': 'picked_up'},
+            {'id': delivered.pk, 'status': 'delivered', 'version': 1},
+            {'id': pending.pk, 'status': 'delivered'},
+            {'id': stale.pk, 'status': 'delivered', 'version': 4},
+            {'id': other.pk, 'status': 'picked_up'},
+        ]}, format='json')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(result['id'], result['outcome']) for result in response.data['results']],
+            [
+                (picked_up.pk, 'updated'),
+                (delivered.pk, 'updated'),
+                (pending.pk, 'invalid_transition'),
+                (stale.pk, 'conflict'),
+                (other.pk, 'not_found'),
+            ]
+        )
+        self.assertEqual(response.data['results'][1]['version'], 2)
+        self.assertEqual(response.data['results'][3]['version'], 1)
+        
+        statuses = dict(DeliveryRequest.objects.values_list('id', 'status'))
+        self.assertEqual(statuses[picked_up.pk], 'picked_up')
+        self.assertEqual(statuses[delivered.pk], 'delivered')
+        self.assertEqual(statuses[pending.pk], 'pending')
+        self.assertEqual(statuses[stale.pk], 'in_transit')
+        self.assertEqual(statuses[other.pk], 'assigned')
+        self.partner.refresh_from_db()
+        self.assertEqual(
+            (self.partner.total_deliveries, self.partner.successful_deliveries), (1, 1)
+        )
+
+
+class DeliveryTimeStatisticsTests(APITestCase):
+    """
+    Delivery times are measured from pickup to dropoff in the status history.
+    """
+    
+    def setUp(self):
+        django_cache.clear()
+        self.customer = User.objects.create_user(
+            username='customer', email='customer@example.com', password='secret'
+        )
+        partner_user = User.objects.create_user(
+            username='partner', email='partner@example.com', password='secret', role='partner'
+        )
+        self.partner = DeliveryPartner.objects.create(user=partner_user, vehicle_type='motorcycle')
+    
+    def deliver(self, minutes):
+        """
+        Run a delivery from assigned to delivered, ``minutes`` after pickup.
+        """
+        delivery = create_delivery(self.customer, partner=self.partner, status='assigned')
+        for status in ('picked_up', 'in_transit', 'delivered'):
+            delivery.transition_status(status, actor=self.partner.user)
+        
+        picked_up_at = datetime(2026, 3, 2, 10, 0, tzinfo=dt_timezone.utc)
+        changes = DeliveryStatusChange.objects.filter(request_id=delivery.pk)
+        changes.filter(to_status='picked_up').update(changed_at=picked_up_at)
+        changes.filter(to_status='in_transit').update(changed_at=picked_up_at + timedelta(minutes=1))
+        changes.filter(to_status='delivered').update(
+            changed_at=picked_up_at + timedelta(minutes=minutes)
+        )
+        return delivery
+    
+    def statistics(self):
+        self.client.force_authenticate(self.customer)
+        delivery = self.client.get('/api/delivery/statistics/')
+        self.client.force_authenticate(self.partner.user)
+        partner = self.client.get('/api/partners/statistics/')
+        self.assertEqual((delivery.status_code, partner.status_code), (200, 200))
+        return delivery.data, partner.data
+    
+    def test_median_and_p90(self):
+        for minutes in (40, 10, 30, 50, 20):
+            self.deliver(minutes)
+        # Still in transit: not a completed delivery
+        create_delivery(self.customer, partner=self.partner, status='in_transit')
+        
+        for statistics in self.statistics():
+            self.assertEqual(statistics['average_delivery_time'], 30.0)
+            self.assertEqual(statistics['median_delivery_time'], 30.0)
+            # percentile_cont interpolates: 40 + 0.6 * (50 - 40)
+            self.assertEqual(statistics['p90_delivery_time'], 46.0)
+    
+    def test_no_completed_deliveries(self):
+        delivery = create_delivery(self.customer, partner=self.partner, status='assigned')
+        delivery.transition_status('picked_up')
+        
+        for statistics in self.statistics():
+            self.assertIsNone(statistics['average_delivery_time'])
+            self.assertIsNone(statistics['median_delivery_time'])
+            self.assertIsNone(statistics['p90_delivery_time'])
+
+
+class DeliveryAnalyticsTests(APITestCase):
+    """
+    Closed analytics buckets are cached until a delivery inside them changes.
+    """
+    
+    def setUp(self):
+        django_cache.clear()
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='secret', role='admin'
+        )
+        self.customer = User.objects.create_user(
+            username='customer', email='customer@example.com', password='secret'
+        )
+        self.client.force_authenticate(self.admin)
+        self.created_at = (timezone.now() - timedelta(days=2)).replace(
+            hour=10, minute=30, second=0, microsecond=0
+        )
+    
+    def buckets(self, interval, start, end):
+        response = self.client.get('/api/delivery/analytics/', {
+            'interval': interval, 'start': start.isoformat(), 'end': end.isoformat()
+        })
+        self.assertEqual(response.status_code, 200)
+        return [
+            (bucket['total'], bucket['delivered'], bucket['cancelled'])
+            for bucket in response.data['buckets']
+        ]
+    
+    def hours(self):
+        return self.buckets(
+            'hour', self.created_at - timedelta(hours=1), self.created_at + timedelta(hours=1)
+        )
+    
+    def days(self):
+        return self.buckets(
+            'day', self.created_at - timedelta(days=1), self.created_at + timedelta(days=1)
+        )
+    
+    def bucket_cached(self, interval, value):
+        key = analytics._bucket_key(interval, analytics.bucket_start(value, interval))
+        return django_cache.get(key) is not None
+    
+    def test_status_change_invalidates_its_buckets(self):
+        delivery = create_delivery(self.customer, status='assigned')
+        DeliveryRequest.objects.filter(pk=delivery.pk).update(created_at=self.created_at)
+        delivery.refresh_from_db()
+        
+        self.assertEqual(self.hours(), [(0, 0, 0), (1, 0, 0), (0, 0, 0)])
+        self.assertEqual(self.days(), [(0, 0, 0), (1, 0, 0), (0, 0, 0)])
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(delivery.transition_status('cancelled'))
+        
+        self.assertFalse(self.bucket_cached('hour', self.created_at))
+        self.assertFalse(self.bucket_cached('day', self.created_at))
+        # Neighbouring buckets stay cached
+        self.assertTrue(self.bucket_cached('hour', self.created_at - timedelta(hours=1)))
+        self.assertTrue(self.bucket_cached('day', self.created_at - timedelta(days=1)))
+        
+        self.assertEqual(self.hours(), [(0, 0, 0), (1, 0, 1), (0, 0, 0)])
+        self.assertEqual(self.days(), [(0, 0, 0), (1, 0, 1), (0, 0, 0)])
+    
+    def test_create_invalidates_its_buckets(self):
+        now = timezone.now()
+        for interval in analytics.INTERVALS:
+            django_cache.set(
+                analytics._bucket_key(interval, analytics.bucket_start(now, interval)),
+                {'total': 0, 'delivered': 0, 'cancelled': 0}
+            )
+        
+        self.client.force_authenticate(self.customer)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/delivery/requests/', {
+                'pickup_address': 'Thamel, Kathmandu',
+                'dropoff_address': 'Jawalakhel, Lalitpur',
+                'customer_name': 'Sita Sharma',
+                'customer_phone': '+9779800000000',
+            })
+        self.assertEqual(response.status_code, 201)
+        
+        self.assertFalse(self.bucket_cached('hour', now))
+        self.assertFalse(self.bucket_cached('day', now))
+    
+    def test_sync_insert_invalidates_its_buckets(self):
+        now = timezone.now()
+        django_cache.set(
+            analytics._bucket_key('hour', analytics.bucket_start(now, 'hour')),
+            {'total': 0, 'delivered': 0, 'cancelled': 0}
+        )
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_sync_deliveries(self.customer, [sync_item('a')])
+        
+        self.assertFalse(self.bucket_cached('hour', now))
+    
+    def test_too_many_buckets(self):
+        end = analytics.bucket_start(timezone.now(), 'hour')
+        response = self.client.get('/api/delivery/analytics/', {
+            'interval': 'hour',
+            'start': (end - timedelta(hours=analytics.MAX_BUCKETS + 1)).isoformat(),
+            'end': end.isoformat(),
+        })
+        self.assertEqual(response.status_code, 400)
+        
+        self.assertEqual(len(self.buckets(
+            'hour', end - timedelta(hours=analytics.MAX_BUCKETS), end
+        )), analytics.MAX_BUCKETS)
+
+
+class DeliveryChangesTests(APITestCase):
+    """
+    The delta sync feed pages through changes after a cursor.
+    """
+    
+    def setUp(self):
+        self.customer = User.objects.create_user(
+            username='customer', email='customer@example.com', password='secret'
+        )
+        self.other = User.objects.create_user(
+            username='other', email='other@example.com', password='secret'
+        )
+        partner_user = User.objects.create_user(
+            username='partner', email='partner@example.com', password='secret', role='partner'
+        )
+        self.partner = DeliveryPartner.objects.create(user=partner_user, vehicle_type='motorcycle')
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='secret', role='admin'
+        )
+    
+    def settled(self, *deliveries):
+        """
+        Move ``deliveries`` out of the settle window, in the given order.
+        """
+        start = timezone.now() - timedelta(minutes=10)
+        for offset, delivery in enumerate(deliveries):
+            changed_at = start + timedelta(seconds=offset)
+            DeliveryRequest.objects.filter(pk=delivery.pk).update(
+                created_at=changed_at, updated_at=changed_at
+            )
+    
+    def changes(self, user=None, cursor=None, later=False, **params):
+        """
+        Fetch the next batch, ``later`` once the settle window has passed.
+        """
+        self.client.force_authenticate(user or self.customer)
+        if cursor is not None:
+            params['cursor'] = cursor
+        now = timezone.now() + changes.SETTLE_WINDOW + timedelta(seconds=1)
+        with mock.patch.object(changes.timezone, 'now', return_value=now) if later else nullcontext():
+            response = self.client.get('/api/delivery/sync/changes/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+    
+    def ids(self, deliveries):
+        return [delivery['id'] for delivery in deliveries]
+    
+    def test_first_sync(self):
+        first = create_delivery(self.customer)
+        second = create_delivery(self.customer)
+        other = create_delivery(self.other)
+        self.settled(first, second, other)
+        
+        data = self.changes()
+        
+        self.assertEqual(self.ids(data['created']), [first.pk, second.pk])
+        self.assertEqual((data['updated'], data['deleted'], data['has_more']), ([], [], False))
+        self.assertEqual(self.changes(cursor=data['cursor'])['created'], [])
+    
+    def test_cursor_continuation(self):
+        deliveries = [create_delivery(self.customer) for _ in range(3)]
+        self.settled(*deliveries)
+        
+        data = self.changes(limit=2)
+        self.assertEqual(self.ids(data['created']), [deliveries[0].pk, deliveries[1].pk])
+        self.assertTrue(data['has_more'])
+        
+        data = self.changes(cursor=data['cursor'], limit=2)
+        self.assertEqual(self.ids(data['created']), [deliveries[2].pk])
+        self.assertFalse(data['has_more'])
+        
+        DeliveryRequest.objects.filter(pk=deliveries[0].pk).update(
+            status='cancelled', updated_at=timezone.now() - timedelta(minutes=1)
+        )
+        data = self.changes(cursor=data['cursor'])
+        self.assertEqual(data['created'], [])
+        self.assertEqual(self.ids(data['updated']), [deliveries[0].pk])
+        self.assertEqual(data['updated'][0]['status'], 'cancelled')
+    
+    def test_deletions_are_reported(self):
+        kept = create_delivery(self.customer)
+        deleted = create_delivery(self.customer, local_id='local_1')
+        self.settled(kept, deleted)
+        cursor = self.changes()['cursor']
+        
+        response = self.client.delete(f'/api/delivery/requests/{deleted.pk}/')
+        self.assertEqual(response.status_code, 204)
+        
+        data = self.changes(cursor=cursor, later=True)
+        self.assertEqual(
+            [(tombstone['id'], tombstone['local_id']) for tombstone in data['deleted']],
+            [(deleted.pk, 'local_1')]
+        )
+        self.assertEqual(self.changes(cursor=data['cursor'], later=True)['deleted'], [])
+    
+    def test_recent_rows_are_held_back(self):
+        settled = create_delivery(self.customer)
+        self.settled(settled)
+        recent = create_delivery(self.customer)
+        
+        data = self.changes()
+        self.assertEqual(self.ids(data['created']), [settled.pk])
+        
+        data = self.changes(cursor=data['cursor'], later=True)
+        self.assertEqual(self.ids(data['created']), [recent.pk])
+    
+    def test_scoped_by_role(self):
+        own = create_delivery(self.customer, partner=self.partner, status='assigned')
+        other = create_delivery(self.other)
+        self.settled(own, other)
+        
+        self.assertEqual(self.ids(self.changes(self.customer)['created']), [own.pk])
+        self.assertEqual(self.ids(self.changes(self.other)['created']), [other.pk])
+        self.assertEqual(self.ids(self.changes(self.partner.user)['created']), [own.pk])
+        self.assertEqual(self.ids(self.changes(self.admin)['created']), [own.pk, other.pk])
+        
+        cursor = self.changes(self.customer)['cursor']
+        self.client.force_authenticate(self.admin)
+        self.client.delete(f'/api/delivery/requests/{other.pk}/')
+        self.assertEqual(self.changes(self.customer, cursor, later=True)['deleted'], [])
+    
+    def test_tampered_cursor(self):
+        self.client.force_authenticate(self.customer)
+        tampered = base64.urlsafe_b64encode(b'{"deliveries":["yesterday",1]}').decode()
+        for cursor in ('not a cursor', tampered):
+            response = self.client.get('/api/delivery/sync/changes/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('cursor', response.data)
+
+
+class CompiledSerializerParityTests(APITestCase):
+    """
+    Compiled list serializers give the same output as DRF for the same rows.
+    """
+    
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='secret', role='admin'
+        )
+        customer = User.objects.create_user(
+            username='customer', email='customer@example.com', password='secret'
+        )
+        named = User.objects.create_user(
+            username='named', email='named@example.com', password='secret', role='partner',
+            first_name='Ram', last_name='Thapa'
+        )
+        unnamed = User.objects.create_user(
+            username='unnamed', email='unnamed@example.com', password='secret', role='partner'
+        )
+        located = DeliveryPartner.objects.create(
+            user=named, vehicle_type='motorcycle', rating=Decimal('4.25'),
+            total_deliveries=3, successful_deliveries=2,
+            current_lat=Decimal('27.71720000'), current_lng=Decimal('85.32400000')
+        )
+        unlocated = DeliveryPartner.objects.create(user=unnamed, vehicle_type='van')
+        
+        created_at = datetime(2026, 3, 1, 9, 30, 15, 123456, tzinfo=dt_timezone.utc)
+        for index, (partner, status) in enumerate([
+            (None, 'pending'),
+            (located, 'in_transit'),
+            (unlocated, 'delivered'),
+        ]):
+            create_delivery(
+                customer, partner=partner, status=status,
+                created_at=created_at + timedelta(hours=index),
+                pickup_lat=Decimal('27.71500000'), pickup_lng=Decimal('85.31200000'),
+                local_id=None if partner is None else f'local-{index}',
+                is_synced=partner is not None
+            )
+        self.client.force_authenticate(self.admin)
+    
+    def assertParity(self, serializer_class, queryset, fieldset=None):
+        fields = parse_fieldset(fieldset)
+        expected = serializer_class(queryset, many=True, fields=fields).data
+        compiled = CompiledSerializer.compile(serializer_class(fields=fields))
+        self.assertIsNotNone(compiled)
+        actual = compiled.serialize(queryset.values(*compiled.paths))
+        self.assertEqual(encode(actual), encode(expected))
+        return actual
+    
+    def test_delivery_list(self):
+        rows = self.assertParity(DeliveryRequestListSerializer, DeliveryRequest.objects.order_by('pk'))
+        
+        # DRF leaves out a field whose source crosses a null partner
+        self.assertNotIn('partner_name', rows[0])
+        self.assertEqual([row.get('partner_name') for row in rows[1:]], ['Ram Thapa', 'unnamed'])
+        self.assertEqual(rows[0]['created_at'], '2026-03-01T09:30:15.123456Z')
+        self.assertIsNone(rows[0]['local_id'])
+    
+    def test_delivery_list_sparse_fields(self):
+        queryset = DeliveryRequest.objects.order_by('pk')
+        for fieldset in [
+            'id,status,created_at',
+            'id,partner_name,status_display',
+            'pickup_address,local_id,is_synced',
+        ]:
+            with self.subTest(fields=fieldset):
+                rows = self.assertParity(DeliveryRequestListSerializer, queryset, fieldset)
+                self.assertLessEqual(set(rows[1]), set(fieldset.split(',')))
+    
+    def test_partner_list_decimals(self):
+        queryset = DeliveryPartner.objects.order_by('pk')
+        rows = self.assertParity(DeliveryPartnerListSerializer, queryset)
+        
+        self.assertEqual(rows[0]['rating'], '4.25')
+        self.assertEqual((rows[0]['current_lat'], rows[0]['current_lng']), ('27.71720000', '85.32400000'))
+        self.assertEqual(rows[0]['success_rate'], 2 / 3 * 100)
+        self.assertIsNone(rows[1]['current_lat'])
+        
+        for fieldset in ['id,user_name,rating', 'success_rate,vehicle_type_display,current_lat']:
+            with self.subTest(fields=fieldset):
+                self.assertParity(DeliveryPartnerListSerializer, queryset, fieldset)
+    
+    def test_nested_relations_are_not_compiled(self):
+        self.assertIsNone(CompiledSerializer.compile(
+            DeliveryRequestListSerializer(expand=['partner', 'customer'])
+        ))
+        self.assertIsNone(CompiledSerializer.compile(DeliveryPartnerListSerializer(expand=['user'])))
+    
+    def test_list_endpoints_match_drf(self):
+        for path in [
+            '/api/delivery/requests/',
+            '/api/delivery/requests/?fields=id,partner_name,created_at',
+            '/api/delivery/requests/?expand=partner,customer',
+            '/api/delivery/requests/?expand=partner&fields=id,partner.user_name,partner.rating',
+            '/api/partners/',
+            '/api/partners/?fields=id,rating,current_lat&expand=user',
+        ]:
+            with self.subTest(path=path):
+                compiled = self.client.get(path)
+                with override_settings(COMPILED_LIST_SERIALIZERS=False):
+                    drf = self.client.get(path)
+                self.assertEqual(compiled.status_code, 200)
+                self.assertEqual(json.loads(compiled.content), json.loads(drf.content))
+
+
+
+class SparseFieldsetTests(APITestCase):
+    """
+    ``?fields=`` trims responses and queries; ``?expand=`` embeds relations.
+    """
+    
+    def setUp(self):
+        self.customer = User.objects.create_user(
+            username='customer', email='customer@example.com', password='secret',
+            first_name='Sita', last_name='Sharma'
+        )
+        partner_user = User.objects.create_user(
+            username='partner', email='partner@example.com', password='secret', role='partner',
+            first_name='Ram', last_name='Thapa'
+        )
+        self.partner = DeliveryPartner.objects.create(user=partner_user, vehicle_type='motorcycle')
+        self.deliveries = [
+            create_delivery(self.customer, partner=self.partner, status='assigned'),
+            create_delivery(self.customer, partner=self.partner, status='assigned'),
+            create_delivery(self.customer),
+        ]
+        self.client.force_authenticate(self.customer)
+    
+    def get(self, path, **params):
+        response = self.client.get(path, params, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+    
+    def delivery_queries(self, queries):
+        return [
+            query['sql'] for query in queries
+            if 'FROM "delivery_requests"' in query['sql'] and 'COUNT(' not in query['sql']
+        ]
+    
+    def test_list_fields(self):
+        results = self.get('/api/delivery/requests/', fields='id,status')['results']
+        
+        self.assertEqual(len(results), 3)
+        for result in results:
+            self.assertEqual(set(result), {'id', 'status'})
+    
+    def test_detail_nested_fields(self):
+        delivery = self.deliveries[0]
+        data = self.get(f'/api/delivery/requests/{delivery.pk}/', fields='id,customer.email,status')
+        
+        self.assertEqual(data, {
+            'id': delivery.pk, 'customer': {'email': 'customer@example.com'}, 'status': 'assigned'
+        })
+    
+    def test_unknown_fields_are_ignored(self):
+        delivery = self.deliveries[0]
+        data = self.get(f'/api/delivery/requests/{delivery.pk}/', fields='id,bogus')
+        self.assertEqual(data, {'id': delivery.pk})
+        
+        results = self.get('/api/delivery/requests/', fields='id', expand='bogus')['results']
+        self.assertEqual(set(results[0]), {'id'})
+    
+    def test_expand(self):
+        delivery = self.deliveries[0]
+        data = self.get(
+            f'/api/delivery/requests/{delivery.pk}/', fields='id,partner.user_name', expand='partner'
+        )
+        self.assertEqual(data, {'id': delivery.pk, 'partner': {'user_name': 'Ram Thapa'}})
+    
+    def test_expand_joins_and_fields_do_not(self):
+        with self.assertNumQueries(3) as fields_only:
+            self.get('/api/delivery/requests/', fields='id,status')
+        with self.assertNumQueries(3) as expanded:
+            results = self.get(
+                '/api/delivery/requests/', fields='id,partner.user_name', expand='partner'
+            )['results']
+        
+        sql, = self.delivery_queries(fields_only.captured_queries)
+        self.assertNotIn('JOIN', sql)
+        self.assertNotIn('"delivery_notes"', sql)
+        sql, = self.delivery_queries(expanded.captured_queries)
+        self.assertIn('JOIN "delivery_partners"', sql)
+        self.assertEqual(
+            sorted(result['partner']['user_name'] for result in results if result['partner']),
+            ['Ram Thapa', 'Ram Thapa']
+        )
+
+
+class SyncLogRetentionTests(TestCase):
+    """
+    Old successful sync logs are folded into per-day summaries; the rest stay.
+    """
+    
+    def setUp(self):
+        customer = User.objects.create_user(
+            username='customer', email='customer@example.com', password='secret'
+        )
+        self.delivery = create_delivery(customer)
+        now = timezone.now()
+        self.before = now - timedelta(days=30)
+        self.first_day = (now - timedelta(days=40)).date()
+        self.second_day = self.first_day + timedelta(days=1)
+    
+    def log(self, day=None, sync_status='success', retry_count=0):
+        log, = SyncLog.objects.record([self.delivery], sync_status)
+        created_at = timezone.now() if day is None else datetime(
+            day.year, day.month, day.day, 12, tzinfo=dt_timezone.utc
+        )
+        SyncLog.objects.filter(pk=log.pk).update(created_at=created_at, retry_count=retry_count)
+        return log.pk
+    
+    def summaries(self):
+        return {
+            (summary.day, summary.sync_status): (summary.count, summary.retry_count)
+            for summary in SyncLogSummary.objects.all()
+        }
+    
+    def test_compact(self):
+        for retry_count in (0, 0, 2):
+            self.log(self.first_day, retry_count=retry_count)
+        self.log(self.second_day)
+        self.log(self.second_day)
+        kept = [self.log(self.first_day, 'failed', retry_count=3), self.log()]
+        
+        self.assertEqual(list(retention.compact_sync_logs(self.before, chunk_size=2)), [2, 2, 1])
+        
+        self.assertEqual(self.summaries(), {
+            (self.first_day, 'success'): (3, 2),
+            (self.second_day, 'success'): (2, 0),
+        })
+        self.assertEqual(sorted(SyncLog.objects.values_list('pk', flat=True)), sorted(kept))
+    
+    def test_clean_sync_logs_adds_to_summaries(self):
+        self.log(self.first_day)
+        call_command('clean_sync_logs', '--days', '30', stdout=io.StringIO())
+        self.log(self.first_day, retry_count=1)
+        
+        out = io.StringIO()
+        call_command('clean_sync_logs', '--days', '30', '--chunk-size', '1', stdout=out)
+        
+        self.assertIn('Compacted 1 successful logs', out.getvalue())
+        self.assertEqual(self.summaries(), {(self.first_day, 'success'): (2, 1)})
+        self.assertFalse(SyncLog.objects.exists())
+    
+    def test_error_message_kept_whole(self):
+        message = 'Validation failed: ' + 'x' * 2000
+        log, = SyncLog.objects.record([self.delivery], 'failed', error_message=message)
+        SyncLog.objects.filter(pk=log.pk).mark_failed(message + '!')
+        
+        self.assertEqual(SyncLog.objects.get(pk=log.pk).error_message, message + '!')
+
+
+class DeliveryExportTests(APITestCase):
+    """
+    Exports stream CSV or NDJSON rows matching the filters.
+    """
+    
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='secret', role='admin'
+        )
+        customer = User.objects.create_user(
+            username='customer', email='customer@example.com', password='secret'
+        )
+        self.deliveries = []
+        for day, status in ((1, 'delivered'), (2, 'cancelled'), (3, 'delivered')):
+            delivery = create_delivery(customer, status=status, delivery_notes='Gate, "blue" door')
+            DeliveryRequest.objects.filter(pk=delivery.pk).update(
+                created_at=datetime(2026, 3, day, 9, 30, tzinfo=dt_timezone.utc)
+            )
+            self.deliveries.append(delivery)
+        self.client.force_authenticate(self.admin)
+    
+    def export(self, **params):
+        response = self.client.get('/api/delivery/requests/export/', params)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content).decode()
+    
+    def test_csv(self):
+        response, body = self.export()
+        
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('attachment; filename="deliveries-', response['Content-Disposition'])
+        rows = list(csv.reader(io.StringIO(body)))
+        self.assertEqual(rows[0], export.COLUMNS)
+        records = [dict(zip(rows[0], row)) for row in rows[1:]]
+        self.assertEqual([int(record['id']) for record in records], [d.pk for d in self.deliveries])
+        self.assertEqual(records[0]['created_at'], '2026-03-01T09:30:00+00:00')
+        self.assertEqual(records[0]['delivery_notes'], 'Gate, "blue" door')
+        self.assertEqual(records[0]['pickup_lat'], '')
+    
+    def test_ndjson(self):
+        response, body = self.export(export_format='ndjson')
+        
+        self.assertEqual(response['Content-Type'], ndjson.CONTENT_TYPE)
+        records = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([record['id'] for record in records], [d.pk for d in self.deliveries])
+        self.assertEqual(list(records[0]), export.COLUMNS)
+        self.assertEqual(records[1]['status'], 'cancelled')
+        self.assertEqual(records[0]['created_at'], '2026-03-01T09:30:00Z')
+    
+    def test_filters(self):
+        _, body = self.export(
+            export_format='ndjson', start='2026-03-01T12:00:00Z', end='2026-03-04T00:00:00Z',
+            status='delivered'
+        )
+        self.assertEqual(
+            [json.loads(line)['id'] for line in body.splitlines()], [self.deliveries[2].pk]
+        )
+        
+        response = self.client.get('/api/delivery/requests/export/', {'status': 'lost'})
+        self.assertEqual(response.status_code, 400)
+    
+    def test_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'export.csv')
+            call_command(
+                'export_deliveries', '--start', '2026-03-02', '--status', 'delivered,cancelled',
+                '--output', path, '--chunk-size', '1', stderr=io.StringIO()
+            )
+            with open(path, newline='') as output:
+                rows = list(csv.reader(output))
+        
+        self.assertEqual(rows[0], export.COLUMNS)
+        self.assertEqual(
+            [int(row[0]) for row in rows[1:]], [self.deliveries[1].pk, self.deliveries[2].pk]
+        )
+        with self.assertRaises(CommandError):
+            call_command('export_deliveries', '--status', 'lost', stderr=io.StringIO())
+
+
+class ColumnarDeliveryListTests(APITestCase):
+    """
+    ``?format=columnar`` sends the delivery list as one array per field.
+    """
+    
+    def setUp(self):
+        customer = User.objects.create_user(
+            username='customer', email='customer@example.com', password='secret'
+        )
+        create_delivery(customer, pickup_lat='27.71500000', pickup_lng='85.31200000')
+        create_delivery(customer, status='cancelled')
+        self.client.force_authenticate(customer)
+    
+    def test_matches_json_list(self):
+        for compiled in (True, False):
+            with self.subTest(compiled=compiled), override_settings(COMPILED_LIST_SERIALIZERS=compiled):
+                results = self.client.get('/api/delivery/requests/').json()['results']
+                response = self.client.get('/api/delivery/requests/', {'format': 'columnar'})
+                self.assertEqual(response.status_code, 200)
+                
+                data = response.json()
+                self.assertEqual(data['count'], 2)
+                columns = data['results']
+                fields = list(DeliveryRequestListSerializer().fields)
+                self.assertEqual(
+                    {name: columns[name] for name in fields}, columnar.transpose(results, fields)
+                )
+                self.assertEqual(columns['pickup_lat'], [None, 27.715])
+                self.assertEqual(columns['dropoff_lng'], [None, None])
+    
+    def test_sparse_fields(self):
+        response = self.client.get(
+            '/api/delivery/requests/', {'format': 'columnar', 'fields': 'id,status,pickup_lat'}
+        )
+        self.assertEqual(set(response.json()['results']), {'id', 'status', 'pickup_lat'})
+
+
+class DeliveryEventsTests(APITestCase):
+    """
+    Event streams are served by the async view only.
+    """
+    
+    def setUp(self):
+        self.customer = User.objects.create_user(
+            username='customer', email='customer@example.com', password='secret'
+        )
+    
+    def test_wsgi_view_refuses_streams(self):
+        self.client.force_authenticate(self.customer)
+        
+        response = self.client.get('/api/delivery/events/', HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response.status_code, 501)
+        self.assertTrue(response.content.startswith(b'event: error\n'))
+        
+        response = self.client.get('/api/delivery/events/?delivery=abc', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 400)
+    
+    async def test_async_view_streams_events(self):
+        request = AsyncRequestFactory().get('/api/delivery/events/', headers={
+            'accept': 'text/event-stream',
+            'authorization': f'Bearer {AccessToken.for_user(self.customer)}',
+        })
+        response = await async_views.delivery_events_view(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        
+        frames = response.streaming_content
+        try:
+            self.assertEqual(await anext(frames), b'retry: 3000\n\n')
+            pubsub.publish([events.customer_channel(self.customer.pk)], {'type': 'status', 'id': 1})
+            self.assertEqual(
+                await anext(frames), b'event: status\ndata: {"type":"status","id":1}\n\n'
+            )
+        finally:
+            await frames.aclose()
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Local id keys are kept by PostgreSQL triggers')
+class LocalIdKeyTests(TestCase):
+    """
+    (customer, local_id) is unique across partitions, whatever the write path.
+    """
+    
+    def setUp(self):
+        self.customer = User.objects.create_user(
+            username='customer', email='customer@example.com', password='secret'
+        )
+        self.last_year = timezone.now() - timedelta(days=365)
+    
+    def assertDuplicateRejected(self, local_id, **fields):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            create_delivery(self.customer, local_id=local_id, **fields)
+    
+    def test_duplicate_in_another_month(self):
+        create_delivery(self.customer, local_id='a', created_at=self.last_year)
+        
+        self.assertDuplicateRejected('a')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            DeliveryRequest.objects.bulk_create([
+                DeliveryRequest(
+                    customer=self.customer, local_id='a', pickup_address='Thamel',
+                    dropoff_address='Patan', customer_name='Sita', customer_phone='9800000000'
+                )
+            ])
+        self.assertEqual(DeliveryRequest.objects.filter(local_id='a').count(), 1)
+    
+    def test_key_follows_updates_and_deletes(self):
+        delivery = create_delivery(self.customer, local_id='a', created_at=self.last_year)
+        DeliveryRequest.objects.filter(pk=delivery.pk).update(local_id='b')
+        
+        create_delivery(self.customer, local_id='a')
+        self.assertDuplicateRejected('b')
+        
+        DeliveryRequest.objects.filter(local_id='b').delete()
+        create_delivery(self.customer, local_id='b')
+    
+    def test_create_partition_keeps_keys(self):
+        table = DeliveryRequest._meta.db_table
+        month = partitions.add_months(partitions.month_start(timezone.now()), 60)
+        created_at = datetime(month.year, month.month, 15, tzinfo=dt_timezone.utc)
+        create_delivery(self.customer, local_id='a', created_at=created_at)
+        
+        with connection.cursor() as cursor:
+            run_deferred_checks(cursor)
+            partitions.create_partition(cursor, table, 'created_at', month)
+            cursor.execute(
+                f'SELECT local_id FROM "{partitions.partition_name(table, month)}"'
+            )
+            self.assertEqual(cursor.fetchall(), [('a',)])
+        
+        self.assertDuplicateRejected('a')
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Local id keys are kept by PostgreSQL triggers')
+class ConcurrentSyncTests(TransactionTestCase):
+    """
+    Concurrent syncs of one local id store one row, even across a month boundary.
+    """
+    
+    def setUp(self):
+        self.customer = User.objects.create_user(
+            username='customer', email='customer@example.com', password='secret'
+        )
+    
+    def tearDown(self):
+        # Flushing truncates the deliveries without firing their triggers
+        with connection.cursor() as cursor:
+            cursor.execute(f'TRUNCATE "{LOCAL_ID_KEYS_TABLE}"')
+    
+    def sync_concurrently(self):
+        """
+        Sync local id 'a' from two threads, one either side of midnight on
+        1 February, so the two inserts would land in different partitions.
+        """
+        clock = threading.local()
+        barrier = threading.Barrier(2)
+        errors = []
+        
+        def sync(now):
+            clock.now = now
+            try:
+                barrier.wait()
+                stored, failed = bulk_sync_deliveries(self.customer, [sync_item('a')])
+                self.assertEqual(failed, [])
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+        
+        threads = [
+            threading.Thread(target=sync, args=(now,))
+            for now in [
+                datetime(2026, 1, 31, 23, 59, 59, tzinfo=dt_timezone.utc),
+                datetime(2026, 2, 1, 0, 0, 1, tzinfo=dt_timezone.utc),
+            ]
+        ]
+        with mock.patch.object(services, 'timezone', mock.Mock(now=lambda: clock.now)):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        return errors
+    
+    def test_one_row(self):
+        self.assertEqual(self.sync_concurrently(), [])
+        self.assertEqual(DeliveryRequest.objects.filter(local_id='a').count(), 1)
+    
+    def test_one_row_without_lock(self):
+        with mock.patch.object(DeliveryRequest, 'lock_local_ids'):
+            errors = self.sync_concurrently()
+        
+        self.assertTrue(all(isinstance(error, IntegrityError) for error in errors), errors)
+        self.assertEqual(DeliveryRequest.objects.filter(local_id='a').count(), 1)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Partitions are maintained on PostgreSQL')
+class MaintainPartitionsTests(TestCase):
+    """
+    maintain_partitions creates upcoming partitions and archives old ones
+    together with the rows that reference them.
+    """
+    
+    def setUp(self):
+        self.customer = User.objects.create_user(
+            username='customer', email='customer@example.com', password='secret'
+        )
+        self.current = partitions.month_start(timezone.now())
+        self.old = partitions.add_months(self.current, -30)
+        self.unfinished = partitions.add_months(self.current, -29)
+        
+        with connection.cursor() as cursor:
+            for table in (DeliveryRequest._meta.db_table, SyncLog._meta.db_table):
+                for month in (self.old, self.unfinished):
+                    partitions.create_partition(cursor, table, 'created_at', month)
+        
+        self.delivery = create_delivery(
+            self.customer, local_id='old', status='delivered',
+            created_at=datetime(self.old.year, self.old.month, 10, tzinfo=dt_timezone.utc)
+        )
+        self.delivery.record_status_change('in_transit', 'delivered')
+        SyncLog.objects.record([self.delivery])
+        create_delivery(
+            self.customer, local_id='pending',
+            created_at=datetime(self.unfinished.year, self.unfinished.month, 10, tzinfo=dt_timezone.utc)
+        )
+        with connection.cursor() as cursor:
+            run_deferred_checks(cursor)
+        
+        self.name = partitions.partition_name(DeliveryRequest._meta.db_table, self.old)
+        self.archived = [
+            self.name,
+            f'{self.name}_{DeliveryStatusChange._meta.db_table}',
+            f'{self.name}_{SyncLog._meta.db_table}',
+            partitions.partition_name(SyncLog._meta.db_table, self.old),
+        ]
+    
+    def maintain(self, *args):
+        out = io.StringIO()
+        call_command(
+            'maintain_partitions', '--keep-months', '24', '--months-ahead', '5', *args, stdout=out
+        )
+        return out.getvalue()
+    
+    def exists(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT to_regclass(%s)', [name])
+            return cursor.fetchone()[0] is not None
+    
+    def test_archive_to_schema(self):
+        output = self.maintain()
+        
+        for name in self.archived:
+            self.assertTrue(self.exists(f'{partitions.ARCHIVE_SCHEMA}.{name}'), name)
+            self.assertFalse(self.exists(name), name)
+        self.assertFalse(DeliveryStatusChange.objects.filter(request_id=self.delivery.pk).exists())
+        self.assertFalse(SyncLog.objects.filter(request_id=self.delivery.pk).exists())
+        self.assertFalse(DeliveryRequest.objects.filter(local_id='old').exists())
+        
+        unfinished = partitions.partition_name(DeliveryRequest._meta.db_table, self.unfinished)
+        self.assertIn(f'Skipped {unfinished}', output)
+        self.assertTrue(DeliveryRequest.objects.filter(local_id='pending').exists())
+        
+        with connection.cursor() as cursor:
+            self.assertIn(
+                partitions.partition_name(
+                    DeliveryRequest._meta.db_table, partitions.add_months(self.current, 5)
+                ),
+                partitions.list_partitions(cursor, DeliveryRequest._meta.db_table)
+            )
+    
+    def test_resync_archived_local_id_creates_delivery(self):
+        self.maintain()
+        
+        stored, failed = bulk_sync_deliveries(self.customer, [sync_item('old')])
+        self.assertEqual(failed, [])
+        self.assertNotEqual(stored[0].pk, self.delivery.pk)
+        self.assertEqual(DeliveryRequest.objects.filter(local_id='old').count(), 1)
+    
+    def test_archive_to_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.maintain('--dump-dir', directory)
+            
+            for name in self.archived:
+                self.assertTrue(os.path.exists(os.path.join(directory, f'{name}.csv.gz')), name)
+                self.assertFalse(self.exists(name), name)
+                self.assertFalse(self.exists(f'{partitions.ARCHIVE_SCHEMA}.{name}'), name)
+            
+            path = os.path.join(directory, f'{self.name}_{DeliveryStatusChange._meta.db_table}.csv.gz')
+            with gzip.open(path, 'rt') as archive:
+                rows = list(csv.DictReader(archive))
+            self.assertEqual([row['to_status'] for row in rows], ['delivered'])
+    
+    def test_dry_run(self):
+        output = self.maintain('--dry-run')
+        
+        self.assertIn(f'Would archive {self.name}', output)
+        self.assertTrue(self.exists(self.name))
+        self.assertEqual(DeliveryStatusChange.objects.filter(request_id=self.delivery.pk).count(), 1)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Query plans are checked on PostgreSQL')
+class QueryPlanTests(TestCase):
+    """
+    The hot delivery queries use the indexes added for them.
+    
+    Deliveries are shaped like production: mostly finished, a few active or
+    unsynced. On the partitioned table the plan scans the partitions'
+    indexes; each is traced back to the index it belongs to.
+    """
+    rows = 20000
+    customers = 200
+    partners = 50
+    
+    @classmethod
+    def setUpTestData(cls):
+        # Unusable passwords; hashing real ones would dominate the run
+        users = User.objects.bulk_create(
+            [
+                User(
+                    username=f'plan-customer-{index}', email=f'plan-customer-{index}@example.com',
+                    password='!', role='customer'
+                )
+                for index in range(cls.customers)
+            ] + [
+                User(
+                    username=f'plan-partner-{index}', email=f'plan-partner-{index}@example.com',
+                    password='!', role='partner'
+                )
+                for index in range(cls.partners)
+            ]
+        )
+        partners = DeliveryPartner.objects.bulk_create([
+            DeliveryPartner(user=user, vehicle_type='bicycle', is_available=True, is_online=True)
+            for user in users[cls.customers:]
+        ])
+        
+        generator = random.Random(48)
+        now = timezone.now()
+        deliveries = []
+        for index in range(cls.rows):
+            roll = generator.random()
+            if roll < 0.03:
+                status = generator.choice(ACTIVE_STATUSES)
+            elif roll < 0.05:
+                status = 'pending'
+            else:
+                status = generator.choice(['delivered', 'delivered', 'delivered', 'cancelled'])
+            deliveries.append(DeliveryRequest(
+                customer=users[generator.randrange(cls.customers)],
+                partner=None if status == 'pending' else generator.choice(partners),
+                pickup_address=f'{index} Pickup Street',
+                dropoff_address=f'{index} Dropoff Street',
+                customer_name='Plan Customer',
+                customer_phone='9800000000',
+                status=status,
+                is_synced=generator.random() >= 0.02,
+                created_at=now - timedelta(seconds=generator.randrange(90 * 24 * 3600)),
+            ))
+        DeliveryRequest.objects.bulk_create(deliveries, batch_size=2000)
+        
+        with connection.cursor() as cursor:
+            for model in (User, DeliveryPartner, DeliveryRequest):
+                cursor.execute(f'ANALYZE {connection.ops.quote_name(model._meta.db_table)}')
+        
+        cls.partner = partners[0]
+        cls.customer = users[cls.customers - 1]
+    
+    def assertUsesIndex(self, queryset, index):
+        plan = json.loads(queryset.explain(format='json'))[0]['Plan']
+        used = parent_indexes(scan_indexes(plan))
+        self.assertIn(index, used, f'Plan used {", ".join(sorted(used)) or "no index"}:\n'
+                      f'{queryset.explain()}')
+    
+    def test_partner_busy(self):
+        # DeliveryPartner.is_busy
+        self.assertUsesIndex(
+            self.partner.delivery_requests.filter(status__in=ACTIVE_STATUSES).values('pk')[:1],
+            'delivery_partner_active_idx'
+        )
+    
+    def test_available_partners(self):
+        # compute_available_partners, assign_delivery_partner
+        self.assertUsesIndex(
+            DeliveryPartner.objects.filter(
+                is_available=True, is_online=True
+            ).exclude(delivery_requests__status__in=ACTIVE_STATUSES),
+            'delivery_partner_active_idx'
+        )
+    
+    def test_customer_recent(self):
+        # The changes feed and history for a customer
+        self.assertUsesIndex(
+            scope_for_user(self.customer)[0].order_by('-created_at')[:20],
+            'delivery_customer_recent_idx'
+        )
+    
+    def test_pending_sync(self):
+        # pending_sync_requests_view
+        self.assertUsesIndex(
+            DeliveryRequest.objects.filter(is_synced=False), 'delivery_unsynced_idx'
+        )
+
+
+def run_deferred_checks(cursor):
+    """
+    Run the foreign key checks deferred to commit, which a test never
+    reaches; PostgreSQL won't alter a table while they are pending.
+    """
+    cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+
+def scan_indexes(plan):
+    """
+    Names of the indexes scanned anywhere in an EXPLAIN (FORMAT JSON) plan.
+    """
+    names = set()
+    if 'Index Name' in plan:
+        names.add(plan['Index Name'])
+    for child in plan.get('Plans', ()):
+        names |= scan_indexes(child)
+    return names
+
+
+def parent_indexes(names):
+    """
+    Map partition index names to the partitioned index they belong to.
+    """
+    if not names:
+        return set()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname, coalesce(parent.relname, child.relname)
+            FROM pg_class AS child
+            LEFT JOIN pg_inherits ON pg_inherits.inhrelid = child.oid
+            LEFT JOIN pg_class AS parent ON parent.oid = pg_inherits.inhparent
+            WHERE child.relname = ANY(%s)
+            """,
+            [list(names)]
+        )
+        return {parent for _, parent in cursor.fetchall()}
+
+
+def encode(data):
+    return json.dumps(data, cls=JSONEncoder, sort_keys=True)
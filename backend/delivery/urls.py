@@ -1,28 +1,48 @@
+from django.conf import settings
 from django.urls import path
 from .views import (
     DeliveryRequestListView, DeliveryRequestDetailView,
     DeliveryRequestStatusUpdateView, SyncLogListView,
     offline_sync_view, bulk_sync_view, delivery_statistics_view,
-    pending_sync_requests_view, assign_partner_view
+    pending_sync_requests_view, assign_partner_view, delivery_analytics_view,
+    delivery_changes_view, bulk_sync_stream_view, sync_reconcile_view,
+    bulk_status_update_view, delivery_export_view, delivery_events_view
 )
 
+# Under ASGI (see sajilo_life/asgi.py) the hot reads are served by async views
+if settings.ASYNC_VIEWS:
+    from .async_views import (
+        delivery_request_detail_view, delivery_statistics_view, delivery_events_view
+    )
+else:
+    delivery_request_detail_view = DeliveryRequestDetailView.as_view()
+
 app_name = 'delivery'
 
 urlpatterns = [
     # Delivery requests
     path('requests/', DeliveryRequestListView.as_view(), name='request_list'),
-    path('requests/<int:pk>/', DeliveryRequestDetailView.as_view(), name='request_detail'),
+    path('requests/status/bulk/', bulk_status_update_view, name='bulk_status_update'),
+    path('requests/export/', delivery_export_view, name='request_export'),
+    path('requests/<int:pk>/', delivery_request_detail_view, name='request_detail'),
     path('requests/<int:pk>/status/', DeliveryRequestStatusUpdateView.as_view(), name='request_status_update'),
     path('requests/<int:pk>/assign-partner/', assign_partner_view, name='assign_partner'),
     
     # Sync operations
     path('sync/', offline_sync_view, name='offline_sync'),
     path('sync/bulk/', bulk_sync_view, name='bulk_sync'),
+    path('sync/bulk/stream/', bulk_sync_stream_view, name='bulk_sync_stream'),
+    path('sync/reconcile/', sync_reconcile_view, name='sync_reconcile'),
     path('sync/pending/', pending_sync_requests_view, name='pending_sync'),
+    path('sync/changes/', delivery_changes_view, name='sync_changes'),
+    
+    # Push events
+    path('events/', delivery_events_view, name='events'),
     
     # Sync logs
     path('requests/<int:request_id>/sync-logs/', SyncLogListView.as_view(), name='sync_logs'),
     
     # Statistics
     path('statistics/', delivery_statistics_view, name='statistics'),
+    path('analytics/', delivery_analytics_view, name='analytics'),
 ] 
\ No newline at end of file
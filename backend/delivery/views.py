@@ -1,26 +1,83 @@
 from rest_framework import status, generics, permissions
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import (
+    api_view, parser_classes, permission_classes, renderer_classes
+)
 from rest_framework.response import Response
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from django.db.models import Q, Count, Avg
 from django.utils import timezone
 from datetime import timedelta
-from .models import DeliveryRequest, SyncLog
+from .models import (
+    ACTIVE_STATUSES, DeliveryRequest, DeliveryStatusChange, DeliveryTombstone, SyncLog,
+    VersionConflict
+)
+from . import export
+from .aggregates import duration_aggregates, to_minutes
+from .analytics import get_delivery_series, invalidate_buckets
+from .changes import DEFAULT_LIMIT, decode_cursor, get_changes, scope_for_user
+from .services import (
+    bulk_sync_deliveries, bulk_transition_status, reconcile_digests, stream_sync_deliveries
+)
 from .serializers import (
     DeliveryRequestSerializer, DeliveryRequestCreateSerializer,
     DeliveryRequestUpdateSerializer, DeliveryRequestStatusUpdateSerializer,
     DeliveryRequestListSerializer, SyncLogSerializer, OfflineSyncSerializer,
-    DeliveryStatisticsSerializer
+    DeliveryStatisticsSerializer, DeliveryAnalyticsQuerySerializer,
+    DeliveryAnalyticsBucketSerializer, DeliveryChangesQuerySerializer,
+    DeliveryTombstoneSerializer, SyncReconcileSerializer, BulkStatusUpdateSerializer,
+    DeliveryExportQuerySerializer, DeliveryEventsQuerySerializer
+)
+from users.permissions import (
+    IsOwnerOrPartnerOrAdmin, IsCustomerOrAdmin, IsAdminUser, IsPartnerOrAdmin
 )
-from users.permissions import IsOwnerOrPartnerOrAdmin, IsCustomerOrAdmin
 from partners.services import assign_delivery_partner
+from sajilo_life import cache, columnar, layouts, messagepack, ndjson, sse
+from sajilo_life.compiled import CompiledListMixin
+from sajilo_life.conditional import ConditionalListMixin, ConditionalRetrieveMixin
+from sajilo_life.fieldsets import SparseFieldsetMixin
+
+
+def version_conflict_response(pk):
+    """
+    409 response carrying the current state of a delivery request.
+    """
+    try:
+        current = DeliveryRequest.objects.select_related('customer', 'partner__user').get(pk=pk)
+    except DeliveryRequest.DoesNotExist:
+        return Response(
+            {'error': 'Delivery request not found.'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    return Response({
+        'error': 'Delivery request was modified by another request.',
+        'delivery_request': DeliveryRequestSerializer(current).data
+    }, status=status.HTTP_409_CONFLICT)
 
 
-class DeliveryRequestListView(generics.ListCreateAPIView):
+class VersionConflictMixin:
+    """
+    Turn optimistic concurrency conflicts on update into 409 responses.
+    """
+    
+    def update(self, request, *args, **kwargs):
+        try:
+            return super().update(request, *args, **kwargs)
+        except VersionConflict as exc:
+            return version_conflict_response(exc.args[0])
+
+
+class DeliveryRequestListView(SparseFieldsetMixin, ConditionalListMixin, CompiledListMixin,
+                              generics.ListCreateAPIView):
     """
     List and create delivery requests.
     """
     serializer_class = DeliveryRequestListSerializer
     permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = columnar.renderer_classes()
+    # Map markers for ?format=columnar
+    columnar_fields = ['pickup_lat', 'pickup_lng', 'dropoff_lat', 'dropoff_lng']
     filterset_fields = ['status', 'is_synced']
     search_fields = ['pickup_address', 'dropoff_address', 'customer_name']
     ordering_fields = ['created_at', 'status']
@@ -37,17 +94,23 @@ class DeliveryRequestListView(generics.ListCreateAPIView):
     
     def perform_create(self, serializer):
         delivery_request = serializer.save()
+        cache.invalidate_on_commit(cache.DELIVERY_STATISTICS)
+        created_at = delivery_request.created_at
+        transaction.on_commit(lambda: invalidate_buckets(created_at))
         
         # Try to assign a partner automatically
         assign_delivery_partner(delivery_request)
 
 
-class DeliveryRequestDetailView(generics.RetrieveUpdateDestroyAPIView):
+class DeliveryRequestDetailView(SparseFieldsetMixin, ConditionalRetrieveMixin, VersionConflictMixin,
+                                generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update, or delete a delivery request.
     """
     serializer_class = DeliveryRequestSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrPartnerOrAdmin]
+    # Read by the ETag and the object permission check
+    sparse_required_paths = ['updated_at', 'customer__id', 'partner__user__id']
     
     def get_queryset(self):
         # Return all delivery requests for all users
@@ -57,9 +120,20 @@ class DeliveryRequestDetailView(generics.RetrieveUpdateDestroyAPIView):
         if self.request.method in ['PUT', 'PATCH']:
             return DeliveryRequestUpdateSerializer
         return DeliveryRequestSerializer
+    
+    def perform_destroy(self, instance):
+        scopes = [cache.DELIVERY_STATISTICS, cache.AVAILABLE_PARTNERS]
+        if instance.partner_id:
+            scopes.append(cache.partner_scope(instance.partner_id))
+        created_at = instance.created_at
+        with transaction.atomic():
+            DeliveryTombstone.for_delivery(instance).save()
+            instance.delete()
+        cache.invalidate_on_commit(*scopes)
+        transaction.on_commit(lambda: invalidate_buckets(created_at))
 
 
-class DeliveryRequestStatusUpdateView(generics.UpdateAPIView):
+class DeliveryRequestStatusUpdateView(VersionConflictMixin, generics.UpdateAPIView):
     """
     Update delivery request status.
     """
@@ -84,6 +158,8 @@ class SyncLogListView(generics.ListAPIView):
 
 
 @api_view(['POST'])
+@renderer_classes(messagepack.renderer_classes())
+@parser_classes(messagepack.parser_classes())
 @permission_classes([permissions.IsAuthenticated, IsCustomerOrAdmin])
 def offline_sync_view(request):
     """
@@ -101,83 +177,281 @@ def offline_sync_view(request):
 
 
 @api_view(['POST'])
+@renderer_classes(messagepack.renderer_classes())
+@parser_classes(messagepack.parser_classes())
 @permission_classes([permissions.IsAuthenticated])
 def bulk_sync_view(request):
     """
     Handle bulk sync of multiple delivery requests.
+    
+    Takes ``{"requests": [...]}`` or the rows layout
+    ``{"columns": [...], "rows": [[...], ...]}``, as JSON or MessagePack.
+    Rows-layout uploads get their synced requests back in the same layout.
     """
-    requests_data = request.data.get('requests', [])
-    synced_requests = []
-    failed_requests = []
-    
-    for request_data in requests_data:
-        serializer = OfflineSyncSerializer(data=request_data, context={'request': request})
-        if serializer.is_valid():
-            delivery_request = serializer.save()
-            synced_requests.append(DeliveryRequestSerializer(delivery_request).data)
-        else:
-            failed_requests.append({
-                'local_id': request_data.get('local_id'),
-                'errors': serializer.errors
-            })
+    rows_layout = layouts.is_rows_layout(request.data)
+    row_failures = []
+    if rows_layout:
+        try:
+            requests_data = layouts.rows_to_objects(request.data['columns'], request.data['rows'])
+        except layouts.LayoutError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        width = len(request.data['columns'])
+        row_failures = [
+            {
+                'local_id': None,
+                'row': index,
+                'errors': {'non_field_errors': [f'Expected a list of {width} values.']}
+            }
+            for index, item in enumerate(requests_data) if item is None
+        ]
+        requests_data = [item for item in requests_data if item is not None]
+    else:
+        requests_data = request.data.get('requests', [])
+        if not isinstance(requests_data, list):
+            return Response(
+                {'error': "'requests' must be a list."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+    
+    # Validate everything first, then insert all valid items in one batch
+    delivery_requests, failed_requests = bulk_sync_deliveries(
+        request.user, requests_data, context={'request': request}
+    )
+    failed_requests = row_failures + failed_requests
+    
+    # Serialized from the inserted instances; no re-query needed
+    synced_requests = DeliveryRequestSerializer(delivery_requests, many=True).data
+    message = f'Synced {len(synced_requests)} requests, {len(failed_requests)} failed.'
+    if rows_layout:
+        synced_requests = layouts.objects_to_rows(
+            synced_requests, columns=list(DeliveryRequestSerializer().fields)
+        )
     
     return Response({
-        'message': f'Synced {len(synced_requests)} requests, {len(failed_requests)} failed.',
+        'message': message,
         'synced_requests': synced_requests,
         'failed_requests': failed_requests
     }, status=status.HTTP_200_OK)
 
 
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def bulk_sync_stream_view(request):
+    """
+    Handle streaming bulk sync of delivery requests uploaded as NDJSON.
+    
+    Each line of the body is one delivery request; each line of the response
+    is the result for one item, followed by a summary line.
+    """
+    if not ndjson.is_ndjson(request):
+        return Response(
+            {'error': f'Content-Type must be {ndjson.CONTENT_TYPE}.'},
+            status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+        )
+    
+    results = stream_sync_deliveries(
+        request.user,
+        ndjson.iter_lines(request._request),
+        context={'request': request}
+    )
+    
+    def with_summary(results):
+        counts = {'synced': 0, 'failed': 0}
+        for result in results:
+            counts[result['status']] += 1
+            yield result
+        yield {'summary': counts}
+    
+    return StreamingHttpResponse(
+        ndjson.encode_lines(with_summary(results)),
+        content_type=ndjson.CONTENT_TYPE
+    )
+
+
+@api_view(['POST'])
+@renderer_classes(messagepack.renderer_classes())
+@parser_classes(messagepack.parser_classes())
+@permission_classes([permissions.IsAuthenticated, IsCustomerOrAdmin])
+def sync_reconcile_view(request):
+    """
+    Compare client delivery digests with the server's copies.
+    
+    Returns the local IDs the client still needs to upload.
+    """
+    serializer = SyncReconcileSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    
+    missing, changed = reconcile_digests(request.user, serializer.validated_data['digests'])
+    
+    return Response({
+        'missing': missing,
+        'changed': changed
+    })
+
+
+@api_view(['GET'])
+@renderer_classes(messagepack.renderer_classes())
+@permission_classes([permissions.IsAuthenticated])
+def delivery_changes_view(request):
+    """
+    Get deliveries created, updated or deleted since the client's cursor.
+    """
+    serializer = DeliveryChangesQuerySerializer(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
+    
+    deliveries, tombstones = scope_for_user(request.user)
+    changes = get_changes(
+        deliveries,
+        tombstones,
+        serializer.validated_data.get('cursor') or decode_cursor(None),
+        serializer.validated_data.get('limit', DEFAULT_LIMIT)
+    )
+    
+    return Response({
+        'created': DeliveryRequestSerializer(changes['created'], many=True).data,
+        'updated': DeliveryRequestSerializer(changes['updated'], many=True).data,
+        'deleted': DeliveryTombstoneSerializer(changes['deleted'], many=True).data,
+        'cursor': changes['cursor'],
+        'has_more': changes['has_more']
+    })
+
+
+@api_view(['GET'])
+@renderer_classes(sse.renderer_classes())
+@permission_classes([permissions.IsAuthenticated])
+def delivery_events_view(request):
+    """
+    Push delivery status changes, assignments and partner locations as
+    server-sent events.
+    
+    Streams are only served by the async view under ASGI (see
+    ``async_views.delivery_events_view``): here each open stream would hold
+    a worker thread for minutes, so clients are told to poll the changes
+    feed instead.
+    """
+    serializer = DeliveryEventsQuerySerializer(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
+    
+    return Response(
+        {'error': 'Event streams are only served by the ASGI deployment; '
+                  'poll /api/delivery/sync/changes/ instead.'},
+        status=status.HTTP_501_NOT_IMPLEMENTED
+    )
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def delivery_statistics_view(request):
     """
     Get delivery statistics.
     """
-    user = request.user
-    
-    # Base queryset - show all delivery requests
-    queryset = DeliveryRequest.objects.all()
+    statistics = cache.get_or_compute(cache.DELIVERY_STATISTICS, compute_delivery_statistics)
+    return Response(statistics)
+
+
+def compute_delivery_statistics():
+    """
+    Compute serialized delivery statistics.
+    """
+    totals = DeliveryRequest.objects.aggregate(**statistics_aggregates())
     
-    # Calculate statistics
-    total_requests = queryset.count()
-    pending_requests = queryset.filter(status='pending').count()
-    active_requests = queryset.filter(status__in=['assigned', 'picked_up', 'in_transit']).count()
-    completed_requests = queryset.filter(status='delivered').count()
-    cancelled_requests = queryset.filter(status='cancelled').count()
+    # Calculate delivery time (pickup to dropoff) from status history
+    delivery_times = DeliveryStatusChange.objects.deliveries().aggregate(
+        **duration_aggregates()
+    )
     
+    return build_delivery_statistics(totals, delivery_times)
+
+
+def statistics_aggregates():
+    """
+    Request counts and average distance, computed in one query.
+    """
+    return {
+        'total_requests': Count('pk'),
+        'pending_requests': Count('pk', filter=Q(status='pending')),
+        'active_requests': Count('pk', filter=Q(status__in=ACTIVE_STATUSES)),
+        'completed_requests': Count('pk', filter=Q(status='delivered')),
+        'cancelled_requests': Count('pk', filter=Q(status='cancelled')),
+        'total_distance': Avg('actual_distance', filter=Q(status='delivered')),
+    }
+
+
+def build_delivery_statistics(totals, delivery_times):
+    """
+    Serialized statistics from the ``statistics_aggregates`` and
+    ``duration_aggregates`` results.
+    """
     # Calculate success rate
     success_rate = 0
-    if total_requests > 0:
-        success_rate = (completed_requests / total_requests) * 100
-    
-    # Calculate average delivery time
-    completed_deliveries = queryset.filter(status='delivered')
-    average_delivery_time = None
-    if completed_deliveries.exists():
-        # This is a simplified calculation - in real app, you'd track actual delivery times
-        average_delivery_time = 45.0  # Placeholder value
-    
-    # Calculate total distance
-    total_distance = None
-    if completed_deliveries.exists():
-        total_distance = completed_deliveries.aggregate(
-            total=Avg('actual_distance')
-        )['total']
+    if totals['total_requests'] > 0:
+        success_rate = (totals['completed_requests'] / totals['total_requests']) * 100
     
     statistics = {
-        'total_requests': total_requests,
-        'pending_requests': pending_requests,
-        'active_requests': active_requests,
-        'completed_requests': completed_requests,
-        'cancelled_requests': cancelled_requests,
+        'total_requests': totals['total_requests'],
+        'pending_requests': totals['pending_requests'],
+        'active_requests': totals['active_requests'],
+        'completed_requests': totals['completed_requests'],
+        'cancelled_requests': totals['cancelled_requests'],
         'success_rate': round(success_rate, 2),
-        'average_delivery_time': average_delivery_time,
-        'total_distance': total_distance,
+        'average_delivery_time': to_minutes(delivery_times['average']),
+        'median_delivery_time': to_minutes(delivery_times['p50']),
+        'p90_delivery_time': to_minutes(delivery_times['p90']),
+        'total_distance': totals['total_distance'],
     }
     
-    serializer = DeliveryStatisticsSerializer(statistics)
-    return Response(serializer.data)
+    return dict(DeliveryStatisticsSerializer(statistics).data)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated, IsAdminUser])
+def delivery_analytics_view(request):
+    """
+    Get time-bucketed delivery volume, completion and cancellation rates.
+    """
+    serializer = DeliveryAnalyticsQuerySerializer(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
+    
+    interval = serializer.validated_data['interval']
+    start = serializer.validated_data['start']
+    end = serializer.validated_data['end']
+    
+    series = get_delivery_series(interval, start, end)
+    
+    return Response({
+        'interval': interval,
+        'start': start,
+        'end': end,
+        'buckets': DeliveryAnalyticsBucketSerializer(series, many=True).data
+    })
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated, IsAdminUser])
+def delivery_export_view(request):
+    """
+    Stream delivery requests as CSV or NDJSON.
+    """
+    serializer = DeliveryExportQuerySerializer(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
+    params = serializer.validated_data
+    
+    queryset = export.export_queryset(
+        start=params.get('start'),
+        end=params.get('end'),
+        statuses=params.get('status'),
+        partner_id=params.get('partner')
+    )
+    export_format = params['export_format']
+    
+    response = StreamingHttpResponse(
+        export.encode(queryset, export_format),
+        content_type=export.FORMATS[export_format]
+    )
+    filename = f'deliveries-{timezone.now():%Y%m%d-%H%M%S}.{export_format}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
 
 
 @api_view(['GET'])
@@ -225,11 +499,33 @@ def assign_partner_view(request, pk):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    delivery_request.partner = partner
-    delivery_request.status = 'assigned'
-    delivery_request.save()
+    try:
+        delivery_request.assign_partner(partner, actor=request.user)
+    except VersionConflict:
+        return version_conflict_response(delivery_request.pk)
     
     return Response({
         'message': 'Partner assigned successfully.',
         'delivery_request': DeliveryRequestSerializer(delivery_request).data
-    }, status=status.HTTP_200_OK) 
\ No newline at end of file
+    }, status=status.HTTP_200_OK) 
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated, IsPartnerOrAdmin])
+def bulk_status_update_view(request):
+    """
+    Update the status of several delivery requests at once.
+    
+    Partners can update requests assigned to them; admins can update any
+    request. Returns one outcome per item.
+    """
+    serializer = BulkStatusUpdateSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    
+    results = bulk_transition_status(request.user, serializer.validated_data['updates'])
+    updated = sum(1 for result in results if result['outcome'] == 'updated')
+    
+    return Response({
+        'message': f'Updated {updated} requests, {len(results) - updated} failed.',
+        'results': results
+    }, status=status.HTTP_200_OK)
@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class PartnersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'partners' 
\ No newline at end of file
+    name = 'partners'
+    
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,43 @@
+"""
+Async partner read endpoints, served instead of their DRF views when
+``ASYNC_VIEWS`` is on (see ``sajilo_life/asyncviews.py``).
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework import exceptions
+
+from sajilo_life import columnar
+from sajilo_life.asyncviews import async_api_view, exception_response, render_response
+from sajilo_life.compiled import CompiledSerializer
+
+from . import views
+from .serializers import DeliveryPartnerListSerializer, NearbyPartnersSerializer
+from .services import filter_nearby_rows, nearby_partner_values
+
+
+@async_api_view(views.nearby_partners_view, renderer_classes=columnar.renderer_classes())
+async def nearby_partners_view(request):
+    """
+    Get nearby delivery partners.
+    """
+    # Model instances can't load their user on the event loop, so without
+    # compiled serializers the DRF view answers
+    compiled = CompiledSerializer.compile(DeliveryPartnerListSerializer())
+    if compiled is None or not getattr(settings, 'COMPILED_LIST_SERIALIZERS', True):
+        return await sync_to_async(views.nearby_partners_view)(request)
+
+    serializer = NearbyPartnersSerializer(data=request.GET)
+    if not serializer.is_valid():
+        return exception_response(request, exceptions.ValidationError(serializer.errors))
+
+    lat = serializer.validated_data['lat']
+    lng = serializer.validated_data['lng']
+    radius_km = serializer.validated_data.get('radius_km', 10.0)
+
+    rows = [row async for row in nearby_partner_values(compiled.paths)]
+    rows = filter_nearby_rows(rows, lat, lng, radius_km)
+    return render_response(request, {
+        'partners': compiled.serialize(rows),
+        'count': len(rows),
+        'radius_km': radius_km
+    })
@@ -1,10 +1,46 @@
 from django.db import models
+from django.db.models import DecimalField, F, Value
+from django.db.models.functions import Greatest, Least
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 from decimal import Decimal
+from math import asin, cos, radians, sin, sqrt
+from sajilo_life import cache
 
 User = get_user_model()
 
+# Rating adjustment per completed delivery, by final delivery status
+RATING_STEPS = {
+    'delivered': Decimal('0.1'),
+    'failed': Decimal('-0.2'),
+    'cancelled': Decimal('0'),
+}
+
+
+def success_rate(total_deliveries, successful_deliveries):
+    """
+    Percentage of deliveries that succeeded.
+    """
+    if total_deliveries == 0:
+        return 0.0
+    return (successful_deliveries / total_deliveries) * 100
+
+
+def distance_km(lat1, lng1, lat2, lng2):
+    """
+    Great-circle distance between two points, using the Haversine formula.
+    """
+    lat1, lng1, lat2, lng2 = map(radians, [float(lat1), float(lng1), float(lat2), float(lng2)])
+    
+    dlng = lng2 - lng1
+    dlat = lat2 - lat1
+    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlng/2)**2
+    c = 2 * asin(sqrt(a))
+    r = 6371  # Radius of earth in kilometers
+    
+    return c * r
+
 
 class DeliveryPartner(models.Model):
     """
@@ -101,18 +137,16 @@ class DeliveryPartner(models.Model):
         """
         Calculate delivery success rate.
         """
-        if self.total_deliveries == 0:
-            return 0.0
-        return (self.successful_deliveries / self.total_deliveries) * 100
+        return success_rate(self.total_deliveries, self.successful_deliveries)
     
     @property
     def is_busy(self):
         """
         Check if partner is currently busy with deliveries.
         """
-        return self.delivery_requests.filter(
-            status__in=['assigned', 'picked_up', 'in_transit']
-        ).exists()
+        from delivery.models import ACTIVE_STATUSES
+        
+        return self.delivery_requests.filter(status__in=ACTIVE_STATUSES).exists()
     
     def update_location(self, lat, lng):
         """
@@ -120,8 +154,11 @@ class DeliveryPartner(models.Model):
         """
         self.current_lat = lat
         self.current_lng = lng
-        self.last_active = models.timezone.now()
+        self.last_active = timezone.now()
         self.save()
+        
+        from delivery.events import partner_moved
+        partner_moved(self)
     
     def go_online(self):
         """
@@ -129,7 +166,7 @@ class DeliveryPartner(models.Model):
         """
         self.is_online = True
         self.is_available = True
-        self.last_active = models.timezone.now()
+        self.last_active = timezone.now()
         self.save()
     
     def go_offline(self):
@@ -140,6 +177,14 @@ class DeliveryPartner(models.Model):
         self.is_available = False
         self.save()
     
+    def invalidate_cached_status(self):
+        """
+        Drop cached responses that depend on this partner's status.
+        
+        Runs on every save and delete (see ``partners/signals.py``).
+        """
+        cache.invalidate_on_commit(cache.AVAILABLE_PARTNERS, cache.partner_scope(self.pk))
+    
     def update_rating(self, new_rating):
         """
         Update partner's rating.
@@ -152,12 +197,50 @@ class DeliveryPartner(models.Model):
         """
         Increment delivery count.
         """
-        self.total_deliveries += 1
-        if successful:
-            self.successful_deliveries += 1
-        else:
-            self.cancelled_deliveries += 1
-        self.save()
+        self.record_outcomes(
+            self.pk, {'delivered' if successful else 'cancelled': 1}, adjust_rating=False
+        )
+        self.refresh_from_db(fields=[
+            'total_deliveries', 'successful_deliveries', 'cancelled_deliveries',
+            'rating', 'updated_at'
+        ])
+    
+    @classmethod
+    def record_outcomes(cls, partner_id, outcomes, adjust_rating=True):
+        """
+        Count finished deliveries and adjust the rating in one UPDATE.
+        
+        ``outcomes`` maps a final delivery status (``delivered``, ``failed``
+        or ``cancelled``) to the number of deliveries that reached it. The
+        counters are incremented with F() expressions, so concurrent
+        completions never lose an update, and the rating is clamped to
+        0-5 in the database unless ``adjust_rating`` is False.
+        """
+        successful = outcomes.get('delivered', 0)
+        total = sum(outcomes.values())
+        if not total:
+            return 0
+        
+        rating_step = sum(RATING_STEPS[outcome] * count for outcome, count in outcomes.items())
+        rating_field = DecimalField(max_digits=3, decimal_places=2)
+        values = {
+            'total_deliveries': F('total_deliveries') + total,
+            'successful_deliveries': F('successful_deliveries') + successful,
+            'cancelled_deliveries': F('cancelled_deliveries') + (total - successful),
+            'updated_at': timezone.now(),
+        }
+        if adjust_rating and rating_step:
+            values['rating'] = Greatest(
+                Value(Decimal('0'), output_field=rating_field),
+                Least(
+                    Value(Decimal('5'), output_field=rating_field),
+                    F('rating') + Value(rating_step, output_field=rating_field),
+                    output_field=rating_field
+                ),
+                output_field=rating_field
+            )
+        
+        return cls.objects.filter(pk=partner_id).update(**values)
     
     def get_preferred_areas_list(self):
         """
@@ -177,21 +260,5 @@ class DeliveryPartner(models.Model):
         if max_distance is None:
             max_distance = self.max_distance
         
-        # Calculate distance using Haversine formula
-        from math import radians, cos, sin, asin, sqrt
-        
-        lat1, lng1 = float(self.current_lat), float(self.current_lng)
-        lat2, lng2 = float(lat), float(lng)
-        
-        # Convert to radians
-        lat1, lng1, lat2, lng2 = map(radians, [lat1, lng1, lat2, lng2])
-        
-        # Haversine formula
-        dlng = lng2 - lng1
-        dlat = lat2 - lat1
-        a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlng/2)**2
-        c = 2 * asin(sqrt(a))
-        r = 6371  # Radius of earth in kilometers
-        
-        distance = c * r
+        distance = distance_km(self.current_lat, self.current_lng, lat, lng)
         return distance <= float(max_distance) 
\ No newline at end of file
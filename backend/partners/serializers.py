@@ -1,9 +1,12 @@
 from rest_framework import serializers
-from .models import DeliveryPartner
+from .models import DeliveryPartner, success_rate
+from users.models import full_name
 from users.serializers import UserSerializer
+from sajilo_life.compiled import choice_display
+from sajilo_life.fieldsets import SparseFieldsetSerializerMixin
 
 
-class DeliveryPartnerSerializer(serializers.ModelSerializer):
+class DeliveryPartnerSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for DeliveryPartner model.
     """
@@ -26,6 +29,11 @@ class DeliveryPartnerSerializer(serializers.ModelSerializer):
             'id', 'user', 'rating', 'total_deliveries', 'successful_deliveries',
             'cancelled_deliveries', 'success_rate', 'is_busy', 'created_at', 'updated_at'
         ]
+        field_sources = {
+            'vehicle_type_display': ['vehicle_type'],
+            'success_rate': ['total_deliveries', 'successful_deliveries'],
+            'is_busy': [],
+        }
 
 
 class DeliveryPartnerCreateSerializer(serializers.ModelSerializer):
@@ -80,7 +88,7 @@ class DeliveryPartnerLocationSerializer(serializers.ModelSerializer):
         return value
 
 
-class DeliveryPartnerListSerializer(serializers.ModelSerializer):
+class DeliveryPartnerListSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for listing delivery partners with minimal data.
     """
@@ -95,6 +103,19 @@ class DeliveryPartnerListSerializer(serializers.ModelSerializer):
             'is_available', 'is_online', 'rating', 'total_deliveries',
             'success_rate', 'current_lat', 'current_lng'
         ]
+        expandable_fields = {
+            'user': (UserSerializer, {}),
+        }
+        field_sources = {
+            'user_name': ['user__first_name', 'user__last_name', 'user__username'],
+            'vehicle_type_display': ['vehicle_type'],
+            'success_rate': ['total_deliveries', 'successful_deliveries'],
+        }
+        compiled_fields = {
+            'user_name': full_name,
+            'vehicle_type_display': choice_display(DeliveryPartner.VEHICLE_CHOICES),
+            'success_rate': success_rate,
+        }
 
 
 class NearbyPartnersSerializer(serializers.Serializer):
@@ -125,7 +146,9 @@ class PartnerStatisticsSerializer(serializers.Serializer):
     cancelled_deliveries = serializers.IntegerField()
     failed_deliveries = serializers.IntegerField()
     success_rate = serializers.FloatField()
-    average_delivery_time = serializers.FloatField()
+    average_delivery_time = serializers.FloatField(allow_null=True)
+    median_delivery_time = serializers.FloatField(allow_null=True)
+    p90_delivery_time = serializers.FloatField(allow_null=True)
     total_earnings = serializers.FloatField()
     current_rating = serializers.FloatField()
     is_available = serializers.BooleanField()
@@ -1,5 +1,6 @@
 from django.db.models import Q
-from .models import DeliveryPartner
+from delivery.models import ACTIVE_STATUSES
+from .models import DeliveryPartner, distance_km
 
 
 def assign_delivery_partner(delivery_request):
@@ -19,7 +20,7 @@ def assign_delivery_partner(delivery_request):
         is_available=True,
         is_online=True
     ).exclude(
-        delivery_requests__status__in=['assigned', 'picked_up', 'in_transit']
+        delivery_requests__status__in=ACTIVE_STATUSES
     )
     
     # Filter partners within range
@@ -43,9 +44,7 @@ def assign_delivery_partner(delivery_request):
     
     if scored_partners:
         best_partner = scored_partners[0][0]
-        delivery_request.partner = best_partner
-        delivery_request.status = 'assigned'
-        delivery_request.save()
+        delivery_request.assign_partner(best_partner)
         return best_partner
     
     return None
@@ -60,14 +59,12 @@ def assign_partner_without_location(delivery_request):
         is_available=True,
         is_online=True
     ).exclude(
-        delivery_requests__status__in=['assigned', 'picked_up', 'in_transit']
+        delivery_requests__status__in=ACTIVE_STATUSES
     ).order_by('-rating', '-total_deliveries')
     
     if available_partners.exists():
         best_partner = available_partners.first()
-        delivery_request.partner = best_partner
-        delivery_request.status = 'assigned'
-        delivery_request.save()
+        delivery_request.assign_partner(best_partner)
         return best_partner
     
     return None
@@ -150,28 +147,40 @@ def get_nearby_partners(lat, lng, radius_km=10):
     return nearby_partners
 
 
-def update_partner_metrics(partner, delivery_successful=True):
+def get_nearby_partner_rows(lat, lng, radius_km, paths):
     """
-    Update partner metrics after delivery completion.
+    ``.values(*paths)`` rows of the partners ``get_nearby_partners`` returns.
     """
-    partner.increment_deliveries(successful=delivery_successful)
-    
-    # Update rating based on delivery outcome
-    if delivery_successful:
-        # Increase rating slightly for successful delivery
-        new_rating = min(5.0, float(partner.rating) + 0.1)
-        partner.update_rating(new_rating)
-    else:
-        # Decrease rating slightly for failed delivery
-        new_rating = max(0.0, float(partner.rating) - 0.2)
-        partner.update_rating(new_rating)
+    return filter_nearby_rows(nearby_partner_values(paths), lat, lng, radius_km)
+
+
+def nearby_partner_values(paths):
+    """
+    ``.values()`` of the partners nearby searches consider, with their location.
+    """
+    return DeliveryPartner.objects.filter(
+        is_available=True,
+        is_online=True
+    ).values(*set(paths) | {'current_lat', 'current_lng'})
+
+
+def filter_nearby_rows(rows, lat, lng, radius_km):
+    """
+    The ``nearby_partner_values`` rows within ``radius_km`` of a point.
+    """
+    return [
+        row for row in rows
+        if row['current_lat'] and row['current_lng']
+        and distance_km(row['current_lat'], row['current_lng'], lat, lng) <= float(radius_km)
+    ]
 
 
 def get_partner_statistics(partner):
     """
     Get comprehensive statistics for a partner.
     """
-    from delivery.models import DeliveryRequest
+    from delivery.models import DeliveryRequest, DeliveryStatusChange
+    from delivery.aggregates import duration_aggregates, to_minutes
     
     # Get delivery requests for this partner
     deliveries = DeliveryRequest.objects.filter(partner=partner)
@@ -187,8 +196,10 @@ def get_partner_statistics(partner):
     if total_deliveries > 0:
         success_rate = (completed_deliveries / total_deliveries) * 100
     
-    # Calculate average delivery time (simplified)
-    avg_delivery_time = 45.0  # Placeholder value
+    # Calculate delivery time (pickup to dropoff) from status history
+    delivery_times = DeliveryStatusChange.objects.filter(
+        partner=partner
+    ).deliveries().aggregate(**duration_aggregates())
     
     # Calculate total earnings (simplified)
     total_earnings = completed_deliveries * float(partner.hourly_rate) * 0.75  # 45 minutes average
@@ -199,7 +210,9 @@ def get_partner_statistics(partner):
         'cancelled_deliveries': cancelled_deliveries,
         'failed_deliveries': failed_deliveries,
         'success_rate': round(success_rate, 2),
-        'average_delivery_time': avg_delivery_time,
+        'average_delivery_time': to_minutes(delivery_times['average']),
+        'median_delivery_time': to_minutes(delivery_times['p50']),
+        'p90_delivery_time': to_minutes(delivery_times['p90']),
         'total_earnings': round(total_earnings, 2),
         'current_rating': float(partner.rating),
         'is_available': partner.is_available,
@@ -0,0 +1,18 @@
+"""
+Cache invalidation for partner writes.
+
+The available partner list and partner statistics are cached (see
+``sajilo_life/cache.py``). Every save or delete of a partner, including
+the admin, the partner endpoints and deletes cascaded from a user, drops
+them once the transaction commits.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import DeliveryPartner
+
+
+@receiver(post_save, sender=DeliveryPartner)
+@receiver(post_delete, sender=DeliveryPartner)
+def invalidate_partner_caches(sender, instance, **kwargs):
+    instance.invalidate_cached_status()
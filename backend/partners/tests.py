@@ -0,0 +1,168 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache as django_cache
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+from delivery.models import DeliveryRequest
+
+from sajilo_life import columnar
+from sajilo_life.compiled import CompiledSerializer
+
+from .models import DeliveryPartner
+from .serializers import DeliveryPartnerListSerializer
+
+User = get_user_model()
+
+
+class AvailablePartnersCacheTests(APITestCase):
+    """
+    Partner writes drop the cached available partner list.
+    """
+    
+    def setUp(self):
+        django_cache.clear()
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='secret', role='admin'
+        )
+        partner_user = User.objects.create_user(
+            username='partner', email='partner@example.com', password='secret', role='partner'
+        )
+        self.partner = DeliveryPartner.objects.create(
+            user=partner_user, vehicle_type='motorcycle', is_available=True, is_online=True
+        )
+        self.client.force_authenticate(self.admin)
+    
+    def available_ids(self):
+        response = self.client.get('/api/partners/available/')
+        self.assertEqual(response.status_code, 200)
+        return [partner['id'] for partner in response.data['partners']]
+    
+    def test_status_update_invalidates(self):
+        self.assertEqual(self.available_ids(), [self.partner.pk])
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f'/api/partners/{self.partner.pk}/status/', {'is_available': False, 'is_online': False}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.available_ids(), [])
+    
+    def test_delete_invalidates(self):
+        self.assertEqual(self.available_ids(), [self.partner.pk])
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f'/api/partners/{self.partner.pk}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.available_ids(), [])
+    
+    def test_cascaded_delete_invalidates(self):
+        self.assertEqual(self.available_ids(), [self.partner.pk])
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.partner.user.delete()
+        self.assertEqual(self.available_ids(), [])
+    
+    def test_location_update_invalidates(self):
+        self.assertEqual(self.available_ids(), [self.partner.pk])
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f'/api/partners/{self.partner.pk}/location/',
+                {'current_lat': '27.71720000', 'current_lng': '85.32400000'}
+            )
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get('/api/partners/available/')
+        self.assertEqual(response.data['partners'][0]['current_lat'], '27.71720000')
+
+
+class PartnerOutcomeTests(APITestCase):
+    """
+    A delivery reaching a final status counts once towards its partner.
+    """
+    
+    def setUp(self):
+        customer = User.objects.create_user(
+            username='customer', email='customer@example.com', password='secret'
+        )
+        partner_user = User.objects.create_user(
+            username='partner', email='partner@example.com', password='secret', role='partner'
+        )
+        self.partner = DeliveryPartner.objects.create(
+            user=partner_user, vehicle_type='motorcycle', rating=Decimal('4.00')
+        )
+        self.delivery = DeliveryRequest.objects.create(
+            customer=customer, partner=self.partner, status='in_transit',
+            pickup_address='Thamel, Kathmandu', dropoff_address='Jawalakhel, Lalitpur',
+            customer_name='Sita Sharma', customer_phone='+9779800000000'
+        )
+        self.client.force_authenticate(partner_user)
+    
+    def test_final_transition_counts_once(self):
+        response = self.client.patch(
+            f'/api/delivery/requests/{self.delivery.pk}/status/', {'status': 'delivered'}
+        )
+        self.assertEqual(response.status_code, 200)
+        
+        self.partner.refresh_from_db()
+        self.assertEqual(self.partner.total_deliveries, 1)
+        self.assertEqual(self.partner.successful_deliveries, 1)
+        self.assertEqual(self.partner.cancelled_deliveries, 0)
+        self.assertEqual(self.partner.rating, Decimal('4.10'))
+
+
+class ColumnarPartnersTests(APITestCase):
+    """
+    ``?format=columnar`` sends the same partners as one array per field.
+    """
+    
+    def setUp(self):
+        django_cache.clear()
+        locations = [
+            ('27.71720000', '85.32400000', True),
+            ('27.66440000', '85.31880000', True),
+            ('28.20960000', '83.98560000', True),
+            ('27.70000000', '85.30000000', False),
+        ]
+        for index, (lat, lng, online) in enumerate(locations):
+            user = User.objects.create_user(
+                username=f'partner{index}', email=f'partner{index}@example.com', password='secret',
+                role='partner', first_name='Ram', last_name=f'Thapa {index}'
+            )
+            DeliveryPartner.objects.create(
+                user=user, vehicle_type='motorcycle', current_lat=lat, current_lng=lng,
+                is_available=True, is_online=online, rating=Decimal('4.50')
+            )
+        customer = User.objects.create_user(
+            username='customer', email='customer@example.com', password='secret'
+        )
+        self.client.force_authenticate(customer)
+        self.fields = list(DeliveryPartnerListSerializer().fields)
+    
+    def assertColumnar(self, path, params):
+        response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200)
+        columns = self.client.get(path, dict(params, format='columnar'))
+        self.assertEqual(columns.status_code, 200)
+        
+        expected = columnar.transpose(response.json()['partners'], self.fields)
+        self.assertEqual(columns.json()['partners'], expected)
+        self.assertIsInstance(expected['current_lat'][0], float)
+        return columns.json()
+    
+    def test_nearby(self):
+        params = {'lat': '27.70000000', 'lng': '85.32000000', 'radius_km': 10}
+        data = self.assertColumnar('/api/partners/nearby/', params)
+        self.assertEqual(data['count'], 2)
+        self.assertEqual(len(data['partners']['id']), 2)
+        
+        with override_settings(COMPILED_LIST_SERIALIZERS=False):
+            self.assertColumnar('/api/partners/nearby/', params)
+        with mock.patch.object(CompiledSerializer, 'compile', return_value=None):
+            self.assertColumnar('/api/partners/nearby/', params)
+    
+    def test_available(self):
+        data = self.assertColumnar('/api/partners/available/', {})
+        self.assertEqual(len(data['partners']['id']), 3)
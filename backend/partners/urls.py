@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 from .views import (
     DeliveryPartnerListView, DeliveryPartnerDetailView,
@@ -6,6 +7,10 @@ from .views import (
     available_partners_view, go_online_view, go_offline_view
 )
 
+# Under ASGI (see sajilo_life/asgi.py) the hot reads are served by async views
+if settings.ASYNC_VIEWS:
+    from .async_views import nearby_partners_view
+
 app_name = 'partners'
 
 urlpatterns = [
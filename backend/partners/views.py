@@ -1,6 +1,7 @@
 from rest_framework import status, generics, permissions
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
 from rest_framework.response import Response
+from django.conf import settings
 from django.db.models import Q
 from .models import DeliveryPartner
 from .serializers import (
@@ -10,12 +11,20 @@ from .serializers import (
     NearbyPartnersSerializer, PartnerStatisticsSerializer,
     PartnerAssignmentSerializer
 )
-from .services import get_nearby_partners, get_partner_statistics, assign_delivery_partner
+from .services import (
+    get_nearby_partners, get_nearby_partner_rows, get_partner_statistics, assign_delivery_partner
+)
 from users.permissions import IsPartnerOrAdmin, IsAdminUser
-from delivery.models import DeliveryRequest
+from delivery.models import ACTIVE_STATUSES, DeliveryRequest, VersionConflict
+from delivery.views import version_conflict_response
+from sajilo_life import cache, columnar
+from sajilo_life.compiled import CompiledListMixin, CompiledSerializer
+from sajilo_life.conditional import ConditionalListMixin, ConditionalRetrieveMixin
+from sajilo_life.fieldsets import SparseFieldsetMixin
 
 
-class DeliveryPartnerListView(generics.ListCreateAPIView):
+class DeliveryPartnerListView(SparseFieldsetMixin, ConditionalListMixin, CompiledListMixin,
+                              generics.ListCreateAPIView):
     """
     List and create delivery partners.
     """
@@ -39,7 +48,8 @@ class DeliveryPartnerListView(generics.ListCreateAPIView):
         serializer.save(user=self.request.user)
 
 
-class DeliveryPartnerDetailView(generics.RetrieveUpdateDestroyAPIView):
+class DeliveryPartnerDetailView(SparseFieldsetMixin, ConditionalRetrieveMixin,
+                                generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update, or delete a delivery partner.
     """
@@ -57,6 +67,12 @@ class DeliveryPartnerDetailView(generics.RetrieveUpdateDestroyAPIView):
         if self.request.method in ['PUT', 'PATCH']:
             return DeliveryPartnerUpdateSerializer
         return DeliveryPartnerSerializer
+    
+    sparse_required_paths = ['updated_at']
+    
+    def get_etag_parts(self, instance):
+        # is_busy comes from the partner's deliveries, not from updated_at
+        return super().get_etag_parts(instance) + [instance.is_busy]
 
 
 class DeliveryPartnerStatusView(generics.UpdateAPIView):
@@ -106,6 +122,7 @@ class DeliveryPartnerLocationView(generics.UpdateAPIView):
 
 
 @api_view(['GET'])
+@renderer_classes(columnar.renderer_classes())
 @permission_classes([permissions.IsAuthenticated])
 def nearby_partners_view(request):
     """
@@ -118,11 +135,24 @@ def nearby_partners_view(request):
     lng = serializer.validated_data['lng']
     radius_km = serializer.validated_data.get('radius_km', 10.0)
     
+    compiled = None
+    if columnar.is_columnar(request) and getattr(settings, 'COMPILED_LIST_SERIALIZERS', True):
+        compiled = CompiledSerializer.compile(DeliveryPartnerListSerializer())
+    if compiled is not None:
+        rows = get_nearby_partner_rows(lat, lng, radius_km, compiled.paths)
+        return Response({
+            'partners': compiled.serialize_columns(rows),
+            'count': len(rows),
+            'radius_km': radius_km
+        })
+    
     nearby_partners = get_nearby_partners(lat, lng, radius_km)
-    partner_serializer = DeliveryPartnerListSerializer(nearby_partners, many=True)
+    partners = DeliveryPartnerListSerializer(nearby_partners, many=True).data
+    if columnar.is_columnar(request):
+        partners = columnar.transpose(partners, list(DeliveryPartnerListSerializer().fields))
     
     return Response({
-        'partners': partner_serializer.data,
+        'partners': partners,
         'count': len(nearby_partners),
         'radius_km': radius_km
     })
@@ -159,10 +189,12 @@ def partner_statistics_view(request, pk=None):
                 status=status.HTTP_404_NOT_FOUND
             )
     
-    statistics = get_partner_statistics(partner)
-    serializer = PartnerStatisticsSerializer(statistics)
+    statistics = cache.get_or_compute(
+        cache.partner_scope(partner.pk),
+        lambda: dict(PartnerStatisticsSerializer(get_partner_statistics(partner)).data)
+    )
     
-    return Response(serializer.data)
+    return Response(statistics)
 
 
 @api_view(['POST'])
@@ -195,9 +227,10 @@ def assign_partner_view(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        delivery_request.partner = partner
-        delivery_request.status = 'assigned'
-        delivery_request.save()
+        try:
+            delivery_request.assign_partner(partner, actor=request.user)
+        except VersionConflict:
+            return version_conflict_response(delivery_request.pk)
         
         return Response({
             'message': 'Partner assigned successfully.',
@@ -220,24 +253,36 @@ def assign_partner_view(request):
 
 
 @api_view(['GET'])
+@renderer_classes(columnar.renderer_classes())
 @permission_classes([permissions.IsAuthenticated])
 def available_partners_view(request):
     """
     Get all available delivery partners.
     """
+    data = cache.get_or_compute(cache.AVAILABLE_PARTNERS, compute_available_partners)
+    if columnar.is_columnar(request):
+        fields = list(DeliveryPartnerListSerializer().fields)
+        data = dict(data, partners=columnar.transpose(data['partners'], fields))
+    return Response(data)
+
+
+def compute_available_partners():
+    """
+    Compute the serialized list of available delivery partners.
+    """
     available_partners = DeliveryPartner.objects.filter(
         is_available=True,
         is_online=True
     ).exclude(
-        delivery_requests__status__in=['assigned', 'picked_up', 'in_transit']
+        delivery_requests__status__in=ACTIVE_STATUSES
     ).order_by('-rating', '-total_deliveries')
     
-    serializer = DeliveryPartnerListSerializer(available_partners, many=True)
+    partners = DeliveryPartnerListSerializer(available_partners, many=True).data
     
-    return Response({
-        'partners': serializer.data,
-        'count': available_partners.count()
-    })
+    return {
+        'partners': [dict(partner) for partner in partners],
+        'count': len(partners)
+    }
 
 
 @api_view(['POST'])
@@ -0,0 +1,24 @@
+"""
+ASGI config for sajilo_life project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+The hot read endpoints are served by async views here unless ``ASYNC_VIEWS``
+is set to False, and each worker process runs at most
+``ASYNC_DB_CONNECTIONS`` requests at once.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sajilo_life.settings')
+os.environ.setdefault('ASYNC_VIEWS', 'True')
+
+application = get_asgi_application()
+
+from sajilo_life.asyncviews import DatabaseConnectionLimit  # noqa: E402
+
+application = DatabaseConnectionLimit(application)
@@ -0,0 +1,218 @@
+"""
+Async versions of hot read endpoints, for the ASGI deployment.
+
+DRF views are synchronous, so under ASGI each request to one holds a worker
+thread. ``async_api_view`` serves the common case of a hot read endpoint,
+an authenticated ``GET`` negotiated to JSON, with an async view on the
+event loop. Everything else (other methods, the browsable API and other
+formats, query options such as sparse fieldsets) is handed to the
+endpoint's DRF view, so clients get the same responses from either.
+
+Content negotiation, authentication and permission checks are DRF's own,
+and responses and errors are rendered the way DRF renders them.
+
+``DatabaseConnectionLimit`` keeps an ASGI worker within its share of the
+database's connections.
+"""
+import asyncio
+import functools
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import Http404, HttpResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework import exceptions, permissions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .fastjson import FastJSONRenderer
+
+DEFAULT_DB_CONNECTIONS = 20
+
+
+def negotiate(request, renderer_classes):
+    """
+    The ``(renderer, media type)`` DRF picks for ``request``, or None if
+    none of ``renderer_classes`` is acceptable.
+    """
+    negotiator = api_settings.DEFAULT_CONTENT_NEGOTIATION_CLASS()
+    try:
+        return negotiator.select_renderer(Request(request), [cls() for cls in renderer_classes])
+    except (exceptions.NotAcceptable, Http404):
+        return None
+
+
+def render_response(request, data, status=200, headers=None):
+    """
+    A response rendered with the renderer negotiated for ``request``.
+    """
+    renderer = request.accepted_renderer
+    response = HttpResponse(
+        renderer.render(data, request.accepted_media_type, {}),
+        content_type=renderer.media_type,
+        status=status,
+        headers=headers
+    )
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+
+def authenticate_header(request):
+    """
+    ``WWW-Authenticate`` for 401 responses, from the first authentication class.
+    """
+    authenticators = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    return authenticators[0]().authenticate_header(request) if authenticators else None
+
+
+def exception_response(request, exc):
+    """
+    The response DRF's exception handler gives for an ``APIException``.
+    """
+    if isinstance(exc.detail, (list, dict)):
+        data = exc.detail
+    else:
+        data = {'detail': exc.detail}
+
+    headers = None
+    status = exc.status_code
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        header = authenticate_header(request)
+        if header:
+            headers = {'WWW-Authenticate': header}
+        else:
+            status = 403
+    return render_response(request, data, status=status, headers=headers)
+
+
+def _authenticate(request):
+    for authenticator in [cls() for cls in api_settings.DEFAULT_AUTHENTICATION_CLASSES]:
+        try:
+            result = authenticator.authenticate(request)
+        except exceptions.APIException as exc:
+            return exception_response(request, exc)
+        if result is not None:
+            request.user, request.auth = result
+            return None
+
+    request.user, request.auth = AnonymousUser(), None
+    return None
+
+
+async def authenticate(request):
+    """
+    Authenticate ``request`` with the API's authentication classes and set
+    ``request.user``; returns an error response if the credentials are bad.
+    """
+    # Looking the user up queries, so this runs in a thread
+    return await sync_to_async(_authenticate)(request)
+
+
+def check_permissions(request, permission_classes, obj=None):
+    """
+    An error response if one of ``permission_classes`` denies the request
+    (or access to ``obj``), else None.
+    """
+    for permission in [cls() for cls in permission_classes]:
+        if obj is None:
+            allowed = permission.has_permission(request, None)
+        else:
+            allowed = permission.has_object_permission(request, None, obj)
+        if allowed:
+            continue
+
+        if not request.user.is_authenticated:
+            return exception_response(request, exceptions.NotAuthenticated())
+        return exception_response(
+            request, exceptions.PermissionDenied(detail=getattr(permission, 'message', None))
+        )
+    return None
+
+
+def async_api_view(fallback, permission_classes=(permissions.IsAuthenticated,),
+                   renderer_classes=None, async_renderer_classes=(FastJSONRenderer,),
+                   fallback_params=()):
+    """
+    Serve authenticated ``GET`` requests with the decorated async view and
+    all others with ``fallback``, the DRF view for the same URL.
+
+    ``renderer_classes`` are the DRF view's. Requests negotiated to one of
+    ``async_renderer_classes`` and without any of ``fallback_params`` are
+    served asynchronously, once authentication and ``permission_classes``
+    pass; the view renders with ``render_response``.
+    """
+    if renderer_classes is None:
+        renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    sync_fallback = sync_to_async(fallback)
+
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            negotiated = None
+            if request.method == 'GET' and not set(fallback_params) & request.GET.keys():
+                negotiated = negotiate(request, renderer_classes)
+            if negotiated is None or type(negotiated[0]) not in async_renderer_classes:
+                return await sync_fallback(request, *args, **kwargs)
+            request.accepted_renderer, request.accepted_media_type = negotiated
+
+            response = await authenticate(request)
+            if response is None:
+                response = check_permissions(request, permission_classes)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            return response
+
+        # Like DRF views: JWT requests don't carry a CSRF token
+        wrapper.csrf_exempt = True
+        return wrapper
+
+    return decorator
+
+
+class DatabaseConnectionLimit:
+    """
+    ASGI wrapper letting at most ``ASYNC_DB_CONNECTIONS`` requests per
+    worker process run at once.
+
+    Django runs the synchronous parts of each ASGI request in a thread of
+    the request's own, with its own database connection, so a burst of
+    requests could open more connections than PostgreSQL allows. Requests
+    wait for a slot here instead. A streaming response gives its slot back
+    once its body starts, so held event streams don't keep one.
+
+    This wraps the application rather than being a middleware: with
+    synchronous middleware in the stack, Django runs the whole stack in the
+    request's thread, where waiting would block it.
+    """
+
+    def __init__(self, application):
+        self.application = application
+        self.slots = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.application(scope, receive, send)
+
+        if self.slots is None:
+            self.slots = asyncio.Semaphore(
+                getattr(settings, 'ASYNC_DB_CONNECTIONS', DEFAULT_DB_CONNECTIONS)
+            )
+        await self.slots.acquire()
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                self.slots.release()
+
+        async def send_and_release(message):
+            if message['type'] == 'http.response.body' and message.get('more_body'):
+                release()
+            await send(message)
+
+        try:
+            await self.application(scope, receive, send_and_release)
+        finally:
+            release()
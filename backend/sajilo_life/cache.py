@@ -0,0 +1,169 @@
+"""
+Caching helpers for computed API responses.
+
+Values are stored under versioned keys (``api:<scope>:<version>:<key>``).
+Invalidating a scope bumps its version, so a computation that started before
+the invalidation can never overwrite the fresh value with a stale one.
+
+``aget_or_compute`` is the same for async views, using the cache's async
+API and an async ``compute``.
+"""
+import asyncio
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+# Cache scopes
+DELIVERY_STATISTICS = 'delivery-statistics'
+PARTNER_STATISTICS = 'partner-statistics'
+AVAILABLE_PARTNERS = 'available-partners'
+DELIVERY_ANALYTICS = 'delivery-analytics'
+
+DEFAULT_TTL = 60
+
+# How long a worker may hold the recompute lock, and how often waiters poll
+LOCK_TIMEOUT = 10
+POLL_INTERVAL = 0.05
+
+_MISSING = object()
+
+
+def get_cache():
+    """
+    Cache backend used for API responses.
+    """
+    return caches[getattr(settings, 'API_CACHE_ALIAS', 'default')]
+
+
+def partner_scope(partner_id):
+    """
+    Per-partner statistics scope.
+    """
+    return f'{PARTNER_STATISTICS}:{partner_id}'
+
+
+def get_ttl(scope):
+    """
+    Configured TTL for a scope, looked up by its base name.
+    """
+    ttls = getattr(settings, 'API_CACHE_TTLS', {})
+    return ttls.get(scope.split(':')[0], DEFAULT_TTL)
+
+
+def _version_key(scope):
+    return f'api:{scope}:version'
+
+
+def get_version(scope):
+    """
+    Current version of a scope.
+    """
+    cache = get_cache()
+    version = cache.get(_version_key(scope))
+    if version is None:
+        # Start from a timestamp so a lost version key can't resurrect
+        # entries written under an older version.
+        cache.add(_version_key(scope), time.time_ns(), timeout=None)
+        version = cache.get(_version_key(scope), 0)
+    return version
+
+
+async def aget_version(scope):
+    """
+    Current version of a scope, for async callers.
+    """
+    cache = get_cache()
+    version = await cache.aget(_version_key(scope))
+    if version is None:
+        await cache.aadd(_version_key(scope), time.time_ns(), timeout=None)
+        version = await cache.aget(_version_key(scope), 0)
+    return version
+
+
+def invalidate(*scopes):
+    """
+    Invalidate every cached value in the given scopes.
+    """
+    cache = get_cache()
+    for scope in scopes:
+        try:
+            cache.incr(_version_key(scope))
+        except ValueError:
+            cache.add(_version_key(scope), time.time_ns(), timeout=None)
+
+
+def invalidate_on_commit(*scopes):
+    """
+    Invalidate scopes once the current transaction commits.
+    """
+    transaction.on_commit(lambda: invalidate(*scopes))
+
+
+def get_or_compute(scope, compute, key='default', ttl=None):
+    """
+    Return the cached value for ``scope``/``key`` or compute and store it.
+
+    Concurrent misses are coalesced: only the worker holding the lock runs
+    ``compute``, the others wait for its result.
+    """
+    cache = get_cache()
+    cache_key = f'api:{scope}:{get_version(scope)}:{key}'
+
+    value = cache.get(cache_key, _MISSING)
+    if value is not _MISSING:
+        return value
+
+    lock_key = f'{cache_key}:lock'
+    if cache.add(lock_key, 1, timeout=LOCK_TIMEOUT):
+        try:
+            value = compute()
+            cache.set(cache_key, value, get_ttl(scope) if ttl is None else ttl)
+        finally:
+            cache.delete(lock_key)
+        return value
+
+    # Another worker is recomputing; wait for its result
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        value = cache.get(cache_key, _MISSING)
+        if value is not _MISSING:
+            return value
+        if cache.get(lock_key) is None:
+            break
+
+    return compute()
+
+
+async def aget_or_compute(scope, compute, key='default', ttl=None):
+    """
+    ``get_or_compute`` for async views; ``compute`` is a coroutine function.
+    """
+    cache = get_cache()
+    cache_key = f'api:{scope}:{await aget_version(scope)}:{key}'
+
+    value = await cache.aget(cache_key, _MISSING)
+    if value is not _MISSING:
+        return value
+
+    lock_key = f'{cache_key}:lock'
+    if await cache.aadd(lock_key, 1, timeout=LOCK_TIMEOUT):
+        try:
+            value = await compute()
+            await cache.aset(cache_key, value, get_ttl(scope) if ttl is None else ttl)
+        finally:
+            await cache.adelete(lock_key)
+        return value
+
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(POLL_INTERVAL)
+        value = await cache.aget(cache_key, _MISSING)
+        if value is not _MISSING:
+            return value
+        if await cache.aget(lock_key) is None:
+            break
+
+    return await compute()
@@ -0,0 +1,62 @@
+"""
+Columnar JSON responses for map-style clients.
+
+``?format=columnar`` selects ColumnarJSONRenderer, and views that support it
+send their list of objects as one array per field::
+
+    {"id": [1, 2], "current_lat": [27.7172, 27.6644], ...}
+
+instead of repeating every key in every row. Coordinates (``*_lat`` and
+``*_lng`` fields) are sent as plain floats rather than decimal strings.
+"""
+from rest_framework.settings import api_settings
+
+from .fastjson import FastJSONRenderer
+
+FORMAT = 'columnar'
+
+
+class ColumnarJSONRenderer(FastJSONRenderer):
+    """
+    JSON renderer selected by ``?format=columnar``.
+    """
+    format = FORMAT
+
+
+def renderer_classes():
+    """
+    Default renderers, plus the columnar format.
+    """
+    return list(api_settings.DEFAULT_RENDERER_CLASSES) + [ColumnarJSONRenderer]
+
+
+def is_columnar(request):
+    """
+    Whether ``request`` asked for the columnar format.
+    """
+    renderer = getattr(request, 'accepted_renderer', None)
+    return renderer is not None and renderer.format == FORMAT
+
+
+def is_coordinate(name):
+    return name.endswith(('_lat', '_lng'))
+
+
+def to_float(value):
+    return None if value is None else float(value)
+
+
+def column(name, values):
+    """
+    Values of field ``name`` as a column, with coordinates as floats.
+    """
+    if is_coordinate(name):
+        return [to_float(value) for value in values]
+    return list(values)
+
+
+def transpose(objects, fields):
+    """
+    Turn a list of serialized objects into one column per field.
+    """
+    return {name: column(name, [obj.get(name) for obj in objects]) for name in fields}
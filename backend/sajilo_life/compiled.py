@@ -0,0 +1,197 @@
+"""
+Compiled read-only serialization for list responses.
+
+A ModelSerializer builds a model instance per row and walks every field's
+``get_attribute``/``to_representation``. For flat, read-only list
+serializers the same output can be produced from ``.values()`` rows with a
+precompiled plan: one ORM path (or a few, for computed fields) and one
+converter per field. Serializers whose fields can't be compiled (nested
+serializers, methods without ``Meta.compiled_fields``) keep the DRF path.
+"""
+from django.conf import settings
+from rest_framework import serializers, status
+from rest_framework.response import Response
+
+from .columnar import column, is_columnar, is_coordinate
+from .fieldsets import parse_fieldset, relations_for_path
+
+# Fields whose to_representation is the identity on values read from the DB
+IDENTITY_FIELDS = (
+    serializers.BooleanField,
+    serializers.IntegerField,
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.PrimaryKeyRelatedField,
+)
+
+SKIP = object()
+
+
+def choice_display(choices):
+    """
+    ``get_FOO_display`` for a choices list, as a compiled field function.
+    """
+    labels = {value: str(label) for value, label in choices}
+    return lambda value: labels.get(value, value)
+
+
+class CompiledSerializer:
+    """
+    Serialize ``.values()`` rows with the same output as a serializer.
+    """
+
+    def __init__(self, plan):
+        self.plan = plan
+        self.paths = sorted({
+            path
+            for _, paths, guards, _, _, _ in plan
+            for path in list(paths) + list(guards)
+        })
+
+    @classmethod
+    def compile(cls, serializer):
+        """
+        Build a plan for ``serializer``, or return None if it can't be compiled.
+        """
+        if not isinstance(serializer, serializers.ModelSerializer):
+            return None
+
+        model = serializer.Meta.model
+        field_sources = getattr(serializer.Meta, 'field_sources', {})
+        compiled_fields = getattr(serializer.Meta, 'compiled_fields', {})
+
+        plan = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.BaseSerializer):
+                return None
+
+            if name in compiled_fields:
+                paths = field_sources.get(name)
+                if paths is None:
+                    return None
+                function = compiled_fields[name]
+            elif field.source == '*' or name in field_sources:
+                return None
+            else:
+                paths = [field.source.replace('.', '__')]
+                function = None
+
+            guards = set()
+            for path in paths:
+                relations = relations_for_path(model, path)
+                if relations is None:
+                    return None
+                # DRF skips a field whose source crosses a null relation
+                guards.update(relations)
+
+            converter = None if isinstance(field, IDENTITY_FIELDS) else field.to_representation
+            missing = None if field.allow_null else SKIP
+            plan.append((name, paths, sorted(guards), function, converter, missing))
+
+        return cls(plan)
+
+    def to_representation(self, row):
+        data = {}
+        for name, paths, guards, function, converter, missing in self.plan:
+            if any(row[guard] is None for guard in guards):
+                if missing is not SKIP:
+                    data[name] = missing
+                continue
+
+            if function is None:
+                value = row[paths[0]]
+            else:
+                value = function(*[row[path] for path in paths])
+
+            if value is None:
+                data[name] = None
+            elif converter is None:
+                data[name] = value
+            else:
+                data[name] = converter(value)
+        return data
+
+    def serialize(self, rows):
+        return [self.to_representation(row) for row in rows]
+
+    def serialize_columns(self, rows):
+        """
+        Serialize ``rows`` as one list per field, for the columnar format.
+
+        Coordinates are floats, and a field DRF would leave out of an object
+        (its source crosses a null relation) is None.
+        """
+        columns = {}
+        for name, paths, guards, function, converter, _ in self.plan:
+            if is_coordinate(name):
+                converter = float
+            if not guards and function is None and converter is None:
+                columns[name] = [row[paths[0]] for row in rows]
+                continue
+
+            values = []
+            for row in rows:
+                if any(row[guard] is None for guard in guards):
+                    values.append(None)
+                    continue
+                if function is None:
+                    value = row[paths[0]]
+                else:
+                    value = function(*[row[path] for path in paths])
+                values.append(value if value is None or converter is None else converter(value))
+            columns[name] = values
+        return columns
+
+
+class CompiledListMixin:
+    """
+    List view mixin serializing pages from ``.values()`` rows when possible.
+
+    Disabled with ``COMPILED_LIST_SERIALIZERS = False``, except for the
+    columnar format, which is always built from ``.values()`` rows.
+    ``columnar_fields`` names extra model fields sent only in columnar
+    responses (e.g. coordinates for a map).
+    """
+    columnar_fields = []
+
+    def list(self, request, *args, **kwargs):
+        if is_columnar(request):
+            return self.list_columns(request)
+
+        compiled = None
+        if getattr(settings, 'COMPILED_LIST_SERIALIZERS', True):
+            compiled = CompiledSerializer.compile(self.get_serializer())
+        if compiled is None:
+            return super().list(request, *args, **kwargs)
+
+        rows = self.filter_queryset(self.get_queryset()).values(*compiled.paths)
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(compiled.serialize(page))
+        return Response(compiled.serialize(rows))
+
+    def list_columns(self, request):
+        compiled = CompiledSerializer.compile(self.get_serializer())
+        if compiled is None:
+            return Response(
+                {'error': 'The columnar format does not support expanded relations.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        fields = parse_fieldset(request.query_params.get('fields'))
+        extra = [name for name in self.columnar_fields if fields is None or name in fields]
+        paths = compiled.paths + [name for name in extra if name not in compiled.paths]
+        rows = self.filter_queryset(self.get_queryset()).values(*paths)
+
+        page = self.paginate_queryset(rows)
+        rows = list(rows if page is None else page)
+        data = compiled.serialize_columns(rows)
+        for name in extra:
+            data[name] = column(name, [row[name] for row in rows])
+
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
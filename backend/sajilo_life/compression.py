@@ -0,0 +1,298 @@
+"""
+Response compression for API clients on slow mobile links.
+
+Negotiates brotli (when the ``brotli`` package is installed) or gzip from
+``Accept-Encoding``, compresses API responses above
+``API_COMPRESSION_MIN_SIZE`` bytes and streaming responses chunk by chunk,
+and leaves responses that already carry a ``Content-Encoding`` alone.
+
+Only the API's data formats are compressed. HTML pages (the admin and the
+browsable API) carry CSRF tokens, and compressing them next to reflected
+input would expose the tokens to BREACH.
+
+Each compressed response gets a ``Server-Timing: compress`` entry with the
+CPU time spent and the size before and after, and the totals per endpoint
+are kept in ``stats`` for the compression metrics view.
+"""
+import gzip
+import re
+import threading
+import time
+import zlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DEFAULT_MIN_SIZE = 1024
+DEFAULT_GZIP_LEVEL = 6
+DEFAULT_BROTLI_QUALITY = 4
+
+COMPRESSIBLE_TYPES = (
+    'application/json',
+    'application/x-ndjson',
+    'application/msgpack',
+    'text/csv',
+    'text/event-stream',
+)
+
+accept_encoding_re = re.compile(r'\s*([^\s;,]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?')
+
+
+def accepted_encodings(header):
+    """
+    Encodings accepted by an ``Accept-Encoding`` header, with their q-values.
+    """
+    encodings = {}
+    for part in header.split(','):
+        match = accept_encoding_re.match(part)
+        if not match:
+            continue
+        try:
+            quality = float(match.group(2)) if match.group(2) else 1.0
+        except ValueError:
+            continue
+        encodings[match.group(1).lower()] = quality
+    return encodings
+
+
+def choose_encoding(header):
+    """
+    The best encoding we support for ``header``, or None.
+    """
+    encodings = accepted_encodings(header)
+    supported = ['br', 'gzip'] if brotli is not None else ['gzip']
+
+    best = None
+    for encoding in supported:
+        quality = encodings.get(encoding, encodings.get('*', 0))
+        if quality > 0 and (best is None or quality > best[1]):
+            best = (encoding, quality)
+    return best[0] if best else None
+
+
+def is_compressible(content_type):
+    media_type = content_type.split(';')[0].strip().lower()
+    return media_type in COMPRESSIBLE_TYPES or media_type.endswith('+json')
+
+
+def compress(content, encoding):
+    if encoding == 'br':
+        quality = getattr(settings, 'API_COMPRESSION_BROTLI_QUALITY', DEFAULT_BROTLI_QUALITY)
+        return brotli.compress(content, quality=quality)
+    level = getattr(settings, 'API_COMPRESSION_GZIP_LEVEL', DEFAULT_GZIP_LEVEL)
+    return gzip.compress(content, compresslevel=level, mtime=0)
+
+
+class StreamCompressor:
+    """
+    Incremental compressor that flushes after every chunk.
+
+    Flushing keeps streamed NDJSON results flowing to the client as they are
+    produced instead of waiting for the compressor's buffer to fill. Sizes
+    and CPU time are recorded in ``stats`` when the stream ends.
+    """
+
+    def __init__(self, encoding, endpoint):
+        self.encoding = encoding
+        self.endpoint = endpoint
+        self.original = 0
+        self.compressed = 0
+        self.cpu_seconds = 0.0
+
+        if encoding == 'br':
+            quality = getattr(settings, 'API_COMPRESSION_BROTLI_QUALITY', DEFAULT_BROTLI_QUALITY)
+            compressor = brotli.Compressor(quality=quality)
+            self._process = lambda chunk: compressor.process(chunk) + compressor.flush()
+            self._finish = compressor.finish
+        else:
+            level = getattr(settings, 'API_COMPRESSION_GZIP_LEVEL', DEFAULT_GZIP_LEVEL)
+            compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self._process = lambda chunk: (
+                compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            )
+            self._finish = compressor.flush
+
+    def process(self, chunk):
+        started = time.thread_time()
+        data = self._process(chunk)
+        self.cpu_seconds += time.thread_time() - started
+        self.original += len(chunk)
+        self.compressed += len(data)
+        return data
+
+    def finish(self):
+        started = time.thread_time()
+        data = self._finish()
+        self.cpu_seconds += time.thread_time() - started
+        self.compressed += len(data)
+        return data
+
+    def record(self):
+        stats.record(
+            self.endpoint, self.encoding, self.original, self.compressed, self.cpu_seconds
+        )
+
+    def wrap(self, content):
+        try:
+            for chunk in content:
+                data = self.process(chunk)
+                if data:
+                    yield data
+            yield self.finish()
+        finally:
+            self.record()
+
+    async def wrap_async(self, content):
+        try:
+            async for chunk in content:
+                data = self.process(chunk)
+                if data:
+                    yield data
+            yield self.finish()
+        finally:
+            self.record()
+
+
+class CompressionStats:
+    """
+    Per-endpoint compression totals for this process.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {}
+
+    def record(self, endpoint, encoding, original, compressed, cpu_seconds):
+        with self.lock:
+            entry = self.endpoints.setdefault(endpoint, {
+                'responses': 0,
+                'original_bytes': 0,
+                'compressed_bytes': 0,
+                'cpu_seconds': 0.0,
+                'encodings': {},
+            })
+            entry['responses'] += 1
+            entry['original_bytes'] += original
+            entry['compressed_bytes'] += compressed
+            entry['cpu_seconds'] += cpu_seconds
+            entry['encodings'][encoding] = entry['encodings'].get(encoding, 0) + 1
+
+    def snapshot(self):
+        with self.lock:
+            endpoints = {name: dict(entry, encodings=dict(entry['encodings']))
+                         for name, entry in self.endpoints.items()}
+
+        for entry in endpoints.values():
+            entry['cpu_seconds'] = round(entry['cpu_seconds'], 6)
+            entry['ratio'] = (
+                round(entry['original_bytes'] / entry['compressed_bytes'], 2)
+                if entry['compressed_bytes'] else None
+            )
+            entry['cpu_ms_per_response'] = round(
+                entry['cpu_seconds'] * 1000 / entry['responses'], 3
+            )
+            entry['cpu_ms_per_mb'] = (
+                round(entry['cpu_seconds'] * 1000 / (entry['original_bytes'] / 1024 / 1024), 3)
+                if entry['original_bytes'] else None
+            )
+        return endpoints
+
+    def reset(self):
+        with self.lock:
+            self.endpoints = {}
+
+
+stats = CompressionStats()
+
+
+def endpoint_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is not None and match.view_name:
+        return match.view_name
+    return 'unresolved'
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with brotli or gzip, negotiated per request.
+
+    Works in either mode, so under ASGI it doesn't force the middleware
+    stack into a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        if not self.should_compress(response):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        endpoint = endpoint_name(request)
+        if response.streaming:
+            compressor = StreamCompressor(encoding, endpoint)
+            if response.is_async:
+                response.streaming_content = compressor.wrap_async(response.streaming_content)
+            else:
+                response.streaming_content = compressor.wrap(response.streaming_content)
+            del response.headers['Content-Length']
+        else:
+            min_size = getattr(settings, 'API_COMPRESSION_MIN_SIZE', DEFAULT_MIN_SIZE)
+            if len(response.content) < min_size:
+                return response
+
+            started = time.thread_time()
+            compressed = compress(response.content, encoding)
+            cpu_seconds = time.thread_time() - started
+
+            if len(compressed) >= len(response.content):
+                return response
+
+            stats.record(endpoint, encoding, len(response.content), len(compressed), cpu_seconds)
+            timing = (
+                f'compress;dur={cpu_seconds * 1000:.3f};'
+                f'desc="{encoding} {len(response.content)}->{len(compressed)}"'
+            )
+            if response.has_header('Server-Timing'):
+                timing = f"{response.headers['Server-Timing']}, {timing}"
+            response.headers['Server-Timing'] = timing
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # The compressed body is a different representation of the resource.
+        # make_etag's tags are already weak, so 304s carry the same tag.
+        etag = response.headers.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    @staticmethod
+    def should_compress(response):
+        if response.has_header('Content-Encoding'):
+            return False
+        if response.status_code < 200 or response.status_code in (204, 304):
+            return False
+        return is_compressible(response.get('Content-Type', ''))
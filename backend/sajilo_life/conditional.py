@@ -0,0 +1,96 @@
+"""
+ETag / conditional GET support for API views.
+
+ETags are derived from cheap fingerprints (``id`` + ``updated_at`` for a
+single object, ``max(updated_at)`` + row count for a filtered list) so a
+matching ``If-None-Match`` can be answered with 304 without serializing the
+payload.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from rest_framework.response import Response
+
+
+def make_etag(*parts):
+    """
+    Build a weak ETag from fingerprint parts.
+    
+    Weak, because the body may be sent compressed or not; the same tag then
+    goes on the 200 (whatever its encoding) and on the 304.
+    """
+    digest = hashlib.sha1('|'.join(str(part) for part in parts).encode()).hexdigest()
+    return f'W/"{digest}"'
+
+
+def not_modified_response(request, etag):
+    """
+    Return a 304 response when ``If-None-Match`` matches ``etag``, else None.
+    """
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        response['ETag'] = etag
+    return response
+
+
+def queryset_fingerprint(queryset):
+    """
+    ``(max(updated_at), count)`` for a queryset in a single aggregate query.
+    """
+    fingerprint = queryset.order_by().aggregate(
+        last_updated=Max('updated_at'),
+        count=Count('*')
+    )
+    return fingerprint['last_updated'], fingerprint['count']
+
+
+class ConditionalRetrieveMixin:
+    """
+    Answer ``GET`` on a detail view with 304 when the object is unchanged.
+    """
+
+    def get_etag_parts(self, instance):
+        return [instance.pk, instance.updated_at.isoformat()]
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag = make_etag(
+            type(instance).__name__,
+            request.accepted_media_type,
+            request.get_full_path(),
+            *self.get_etag_parts(instance)
+        )
+
+        response = not_modified_response(request, etag)
+        if response is not None:
+            return response
+
+        serializer = self.get_serializer(instance)
+        return Response(serializer.data, headers={'ETag': etag})
+
+
+class ConditionalListMixin:
+    """
+    Answer ``GET`` on a list view with 304 when the filtered rows are unchanged.
+    """
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        last_updated, count = queryset_fingerprint(queryset)
+        etag = make_etag(
+            queryset.model.__name__,
+            request.accepted_media_type,
+            request.user.pk,
+            request.get_full_path(),
+            last_updated.isoformat() if last_updated else '',
+            count
+        )
+
+        response = not_modified_response(request, etag)
+        if response is not None:
+            return response
+
+        response = super().list(request, *args, **kwargs)
+        response['ETag'] = etag
+        return response
@@ -0,0 +1,92 @@
+"""
+Fast JSON rendering and parsing for the API.
+
+With ``API_JSON_ENGINE = 'orjson'`` (the default) and orjson installed,
+responses are encoded and request bodies decoded with orjson. Types orjson
+doesn't handle natively (Decimal, timedelta, lazy strings, ...) go through
+DRF's JSONEncoder so the output matches the stdlib renderer. Without orjson,
+or with ``API_JSON_ENGINE = 'stdlib'``, DRF's stdlib implementation is used.
+"""
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ORJSON_OPTIONS = (orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+_default = JSONEncoder().default
+
+
+def use_orjson():
+    """
+    Whether the orjson engine is configured and available.
+    """
+    return orjson is not None and getattr(settings, 'API_JSON_ENGINE', 'orjson') == 'orjson'
+
+
+def dumps(data):
+    """
+    Encode ``data`` as compact UTF-8 JSON bytes.
+    """
+    if use_orjson():
+        return orjson.dumps(data, default=_default, option=ORJSON_OPTIONS)
+    return json.dumps(
+        data, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')
+    ).encode()
+
+
+def loads(data):
+    """
+    Decode JSON from bytes or str.
+    """
+    if use_orjson():
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer using orjson for compact output.
+
+    Indented output (``Accept: application/json; indent=4``, the browsable
+    API) is left to the stdlib renderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None or not use_orjson() or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(data, default=_default, option=ORJSON_OPTIONS)
+
+        # Same escaping as JSONRenderer: keep the output a strict JavaScript subset
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class FastJSONParser(JSONParser):
+    """
+    JSONParser using orjson for UTF-8 request bodies.
+    """
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if not use_orjson() or encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -0,0 +1,193 @@
+"""
+Sparse fieldsets for API responses.
+
+``?fields=`` is a comma-separated list of the fields to return; fields of a
+nested object are selected with a dot (``customer.email``). ``?expand=``
+names relations to embed as nested objects. Views using
+SparseFieldsetMixin also narrow the queryset to the columns and joins the
+selected fields read, so a list asking for five fields fetches only those.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+
+def parse_fieldset(value):
+    """
+    Parse ``a,b.c,b.d`` into ``{'a': {}, 'b': {'c': {}, 'd': {}}}``.
+
+    Returns None for a missing or empty value, meaning "all fields".
+    """
+    if not value:
+        return None
+
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for name in path.strip().split('.'):
+            if name:
+                node = node.setdefault(name, {})
+    return tree or None
+
+
+def parse_expand(value):
+    """
+    Parse ``a,b`` into a list of relation names.
+    """
+    if not value:
+        return []
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def relations_for_path(model, path):
+    """
+    Relations traversed by an ORM path, or None if it isn't a plain column.
+    """
+    parts = path.split('__')
+    relations = []
+    for index, part in enumerate(parts):
+        try:
+            field = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            return None
+        if not field.concrete:
+            return None
+        if index < len(parts) - 1:
+            if not field.is_relation:
+                return None
+            relations.append('__'.join(parts[:index + 1]))
+            model = field.related_model
+    return relations
+
+
+def _field_paths(serializer, prefix=''):
+    """
+    ORM paths read by a serializer's readable fields.
+    """
+    meta = getattr(serializer, 'Meta', None)
+    field_sources = getattr(meta, 'field_sources', {})
+
+    paths = []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if name in field_sources:
+            paths.extend(prefix + path for path in field_sources[name])
+        elif isinstance(field, serializers.BaseSerializer):
+            if isinstance(field, serializers.ListSerializer):
+                return None
+            source = prefix + field.source.replace('.', '__')
+            nested = _field_paths(field, source + '__')
+            if nested is None:
+                return None
+            paths.append(source)
+            paths.extend(nested)
+        elif field.source == '*':
+            return None
+        else:
+            paths.append(prefix + field.source.replace('.', '__'))
+    return paths
+
+
+def optimize_queryset(queryset, serializer, required_paths=()):
+    """
+    Restrict ``queryset`` to the columns and joins ``serializer`` reads,
+    plus ``required_paths``.
+
+    Falls back to the unrestricted queryset when a field reads something
+    that isn't a plain column (a method or property without ``field_sources``).
+    """
+    paths = _field_paths(serializer)
+    if paths is None:
+        return queryset
+
+    model = queryset.model
+    columns = {model._meta.pk.name}
+    joins = set()
+    for path in list(required_paths) + paths:
+        relations = relations_for_path(model, path)
+        if relations is None:
+            return queryset
+        columns.add(path)
+        columns.update(relations)
+        joins.update(relations)
+
+    if joins:
+        queryset = queryset.select_related(*sorted(joins))
+    return queryset.only(*sorted(columns))
+
+
+class SparseFieldsetSerializerMixin:
+    """
+    Serializer mixin honouring ``fields`` and ``expand``.
+
+    Both are read from the request's query parameters unless passed as
+    keyword arguments or the serializer is ``nested`` in another one.
+    ``Meta.expandable_fields`` maps a relation name to a
+    ``(serializer_class, kwargs)`` pair rendered when the relation is
+    expanded. ``Meta.field_sources`` maps computed fields to the ORM paths
+    they read, for queryset narrowing.
+    """
+
+    def __init__(self, *args, fields=None, expand=None, nested=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = None if nested else self.context.get('request')
+        if fields is None and request is not None:
+            fields = parse_fieldset(request.query_params.get('fields'))
+        if expand is None and request is not None:
+            expand = parse_expand(request.query_params.get('expand'))
+        self.sparse_fields = fields
+        self.expand = expand or []
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selected = self.sparse_fields
+        expandable = getattr(self.Meta, 'expandable_fields', {})
+
+        for name in self.expand:
+            if name in expandable:
+                serializer_class, kwargs = expandable[name]
+                if issubclass(serializer_class, SparseFieldsetSerializerMixin):
+                    subfields = selected.get(name) if selected else None
+                    kwargs = dict(kwargs, fields=subfields or None, nested=True)
+                fields[name] = serializer_class(read_only=True, **kwargs)
+
+        if selected is None:
+            return fields
+
+        kept = {}
+        for name, field in fields.items():
+            if name not in selected and name not in self.expand:
+                continue
+            subfields = selected.get(name)
+            if subfields and isinstance(field, serializers.Serializer) and not isinstance(
+                field, SparseFieldsetSerializerMixin
+            ):
+                for nested_name in list(field.fields):
+                    if nested_name not in subfields:
+                        field.fields.pop(nested_name)
+            kept[name] = field
+        return kept
+
+
+class SparseFieldsetMixin:
+    """
+    View mixin narrowing the queryset of safe requests to the selected fields.
+
+    ``sparse_required_paths`` lists ORM paths the view itself reads from the
+    objects (ETags, permission checks) so they are always fetched.
+    """
+    sparse_required_paths = []
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method not in ('GET', 'HEAD'):
+            return queryset
+
+        params = self.request.query_params
+        if not params.get('fields') and not params.get('expand'):
+            return queryset
+
+        serializer = self.get_serializer()
+        if not isinstance(serializer, SparseFieldsetSerializerMixin):
+            return queryset
+        return optimize_queryset(queryset, serializer, self.sparse_required_paths)
@@ -0,0 +1,59 @@
+"""
+Compact layouts for list payloads.
+
+The rows layout sends the field names once and each item as an array of
+values in the same order::
+
+    {"columns": ["local_id", "pickup_address"], "rows": [["l1", "Thamel"], ...]}
+
+instead of repeating every key in every object.
+"""
+
+
+class LayoutError(ValueError):
+    pass
+
+
+def is_rows_layout(data):
+    """
+    Whether a request body uses the rows layout.
+    """
+    return hasattr(data, 'get') and 'columns' in data and 'rows' in data
+
+
+def rows_to_objects(columns, rows):
+    """
+    Expand rows-layout data into a list of objects.
+
+    Raises LayoutError if ``columns`` isn't a list of unique field names or
+    ``rows`` isn't a list. A row that isn't a list of ``len(columns)`` values
+    is returned as None so the caller can report it per item.
+    """
+    if (
+        not isinstance(columns, list)
+        or not all(isinstance(column, str) for column in columns)
+        or len(set(columns)) != len(columns)
+    ):
+        raise LayoutError("'columns' must be a list of unique field names.")
+    if not isinstance(rows, list):
+        raise LayoutError("'rows' must be a list.")
+
+    width = len(columns)
+    return [
+        dict(zip(columns, row)) if isinstance(row, list) and len(row) == width else None
+        for row in rows
+    ]
+
+
+def objects_to_rows(objects, columns=None):
+    """
+    Collapse a list of objects into rows-layout data.
+
+    ``columns`` defaults to the keys of the first object.
+    """
+    if columns is None:
+        columns = list(objects[0]) if objects else []
+    return {
+        'columns': columns,
+        'rows': [[obj.get(column) for column in columns] for obj in objects],
+    }
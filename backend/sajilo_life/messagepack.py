@@ -0,0 +1,70 @@
+"""
+MessagePack request and response bodies for the sync endpoints.
+
+MessagePack carries the same data as the JSON API in a compact binary
+encoding, which matters for offline sync uploads over 2G/3G. Clients opt in
+with ``Content-Type: application/msgpack`` and/or
+``Accept: application/msgpack``; JSON stays the default. The classes are
+only offered when the ``msgpack`` package is installed.
+"""
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MEDIA_TYPE = 'application/msgpack'
+
+_default = JSONEncoder().default
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Renderer which serializes to MessagePack.
+
+    Values MessagePack has no type for (Decimal, datetime, ...) are converted
+    the same way as in JSON responses.
+    """
+    media_type = MEDIA_TYPE
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_default, use_bin_type=True)
+
+
+class MessagePackParser(BaseParser):
+    """
+    Parses MessagePack request bodies.
+    """
+    media_type = MEDIA_TYPE
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, TypeError) as exc:
+            raise ParseError('MessagePack parse error - %s' % (str(exc) or type(exc).__name__))
+
+
+def renderer_classes():
+    """
+    Default renderers, plus MessagePack when available.
+    """
+    extra = [MessagePackRenderer] if msgpack is not None else []
+    return list(api_settings.DEFAULT_RENDERER_CLASSES) + extra
+
+
+def parser_classes():
+    """
+    Default parsers, plus MessagePack when available.
+    """
+    extra = [MessagePackParser] if msgpack is not None else []
+    return list(api_settings.DEFAULT_PARSER_CLASSES) + extra
@@ -0,0 +1,55 @@
+"""
+Newline-delimited JSON helpers for streaming request and response bodies.
+"""
+from . import fastjson
+
+CONTENT_TYPE = 'application/x-ndjson'
+
+MAX_LINE_BYTES = 64 * 1024
+
+
+def is_ndjson(request):
+    """
+    Whether the request body is NDJSON.
+    """
+    return request.content_type.split(';')[0].strip() == CONTENT_TYPE
+
+
+def iter_lines(stream, max_line_bytes=MAX_LINE_BYTES):
+    """
+    Parse an NDJSON stream one line at a time.
+
+    Yields ``(line_number, obj, error)`` where exactly one of ``obj`` and
+    ``error`` is set. Blank lines are skipped; over-long lines are reported
+    and discarded without being buffered.
+    """
+    line_number = 0
+    while True:
+        line = stream.readline(max_line_bytes + 1)
+        if not line:
+            return
+        line_number += 1
+
+        if len(line) > max_line_bytes and not line.endswith(b'\n'):
+            # Drain the rest of the over-long line
+            while line and not line.endswith(b'\n'):
+                line = stream.readline(max_line_bytes + 1)
+            yield line_number, None, f'Line exceeds {max_line_bytes} bytes.'
+            continue
+
+        line = line.strip()
+        if not line:
+            continue
+
+        try:
+            yield line_number, fastjson.loads(line), None
+        except ValueError:
+            yield line_number, None, 'Invalid JSON.'
+
+
+def encode_lines(objects):
+    """
+    Encode objects as NDJSON lines.
+    """
+    for obj in objects:
+        yield fastjson.dumps(obj) + b'\n'
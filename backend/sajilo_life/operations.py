@@ -0,0 +1,93 @@
+"""
+Migration operations for building indexes without blocking writes.
+
+PostgreSQL can't ``CREATE INDEX CONCURRENTLY`` on a partitioned table, so
+on those the index is created ``ON ONLY`` the parent, where it starts out
+invalid, then concurrently on each partition and attached to it. The
+parent index becomes valid once every partition has one; partitions
+created later get theirs when they are attached. Plain tables use Django's
+own concurrent operations unchanged.
+
+Partitioned indexes can't be dropped concurrently either, so removing one
+is a plain ``DROP INDEX``, which briefly locks the table.
+"""
+from django.contrib.postgres import operations
+
+from . import partitions
+
+# PostgreSQL truncates longer identifiers
+MAX_NAME_LENGTH = 63
+
+
+def partition_index_name(partition, name):
+    return f'{partition}_{name}'[:MAX_NAME_LENGTH]
+
+
+def _is_partitioned(schema_editor, model):
+    with schema_editor.connection.cursor() as cursor:
+        return partitions.is_partitioned(cursor, model._meta.db_table)
+
+
+def add_index(schema_editor, model, index):
+    if not _is_partitioned(schema_editor, model):
+        schema_editor.add_index(model, index, concurrently=True)
+        return
+
+    table = model._meta.db_table
+    quote = schema_editor.quote_name
+    with schema_editor.connection.cursor() as cursor:
+        names = partitions.list_partitions(cursor, table)
+
+    statement = index.create_sql(model, schema_editor)
+    statement.parts['table'] = f'ONLY {quote(table)}'
+    schema_editor.execute(statement, params=None)
+
+    for partition in names:
+        name = partition_index_name(partition, index.name)
+        statement = index.create_sql(model, schema_editor, concurrently=True)
+        statement.parts.update(table=quote(partition), name=quote(name))
+        schema_editor.execute(statement, params=None)
+        schema_editor.execute(f'ALTER INDEX {quote(index.name)} ATTACH PARTITION {quote(name)}')
+
+
+def remove_index(schema_editor, model, index):
+    concurrently = not _is_partitioned(schema_editor, model)
+    schema_editor.remove_index(model, index, concurrently=concurrently)
+
+
+class AddIndexConcurrently(operations.AddIndexConcurrently):
+    """
+    ``AddIndexConcurrently`` that also works on partitioned tables.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        self._ensure_not_in_transaction(schema_editor)
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            add_index(schema_editor, model, self.index)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        self._ensure_not_in_transaction(schema_editor)
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            remove_index(schema_editor, model, self.index)
+
+
+class RemoveIndexConcurrently(operations.RemoveIndexConcurrently):
+    """
+    ``RemoveIndexConcurrently`` that also works on partitioned tables.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        self._ensure_not_in_transaction(schema_editor)
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            index = from_state.models[app_label, self.model_name_lower].get_index_by_name(self.name)
+            remove_index(schema_editor, model, index)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        self._ensure_not_in_transaction(schema_editor)
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            index = to_state.models[app_label, self.model_name_lower].get_index_by_name(self.name)
+            add_index(schema_editor, model, index)
@@ -0,0 +1,261 @@
+"""
+Monthly range partitioning of PostgreSQL tables by a timestamp column.
+
+A partitioned table has one partition per calendar month (UTC), named
+``<table>_pYYYY_MM``, plus ``<table>_default`` for rows outside them, so
+inserts never fail when partitions haven't been created ahead of time.
+Models and queries are unchanged: Django reads and writes the parent table
+and PostgreSQL routes rows and prunes partitions.
+
+PostgreSQL requires primary keys and unique indexes on a partitioned table
+to include the partition column, so callers pass them explicitly to
+``partition_table``. Foreign keys *to* a partitioned table aren't possible
+on ``id`` alone; referencing models use ``db_constraint=False``.
+"""
+import gzip
+import re
+from datetime import date
+
+DEFAULT_SUFFIX = '_default'
+
+# Monthly partitions kept ready beyond the current month
+MONTHS_AHEAD = 3
+
+ARCHIVE_SCHEMA = 'archive'
+
+
+def month_start(moment):
+    return date(moment.year, moment.month, 1)
+
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f'{table}_p{month.year:04d}_{month.month:02d}'
+
+
+def partition_month(table, name):
+    """
+    The month a partition named by ``partition_name`` holds, or None.
+    """
+    match = re.fullmatch(re.escape(table) + r'_p(\d{4})_(\d{2})', name)
+    if match is None:
+        return None
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+
+def bound(month):
+    return f"'{month.isoformat()} 00:00:00+00'"
+
+
+def is_partitioned(cursor, table):
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [table])
+    row = cursor.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+def list_partitions(cursor, table):
+    """
+    Names of the partitions attached to ``table``.
+    """
+    cursor.execute(
+        """
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent = %s::regclass
+        ORDER BY child.relname
+        """,
+        [table]
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def create_partition(cursor, table, column, month):
+    """
+    Create and attach the partition for ``month``.
+
+    Rows for that month that landed in the default partition are moved into
+    the new partition before it is attached. The move isn't a delete as far
+    as the table's triggers are concerned, so they don't fire for it.
+    """
+    name = partition_name(table, month)
+    lower, upper = bound(month), bound(add_months(month, 1))
+    default = f'{table}{DEFAULT_SUFFIX}'
+
+    cursor.execute(f'CREATE TABLE "{name}" (LIKE "{table}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+    cursor.execute(f'ALTER TABLE "{default}" DISABLE TRIGGER USER')
+    cursor.execute(
+        f'WITH moved AS ('
+        f'DELETE FROM "{default}" '
+        f'WHERE "{column}" >= {lower} AND "{column}" < {upper} RETURNING *'
+        f') INSERT INTO "{name}" SELECT * FROM moved'
+    )
+    cursor.execute(f'ALTER TABLE "{default}" ENABLE TRIGGER USER')
+    cursor.execute(
+        f'ALTER TABLE "{table}" ATTACH PARTITION "{name}" FOR VALUES FROM ({lower}) TO ({upper})'
+    )
+    return name
+
+
+def ensure_partitions(cursor, table, column, first_month, last_month):
+    """
+    Create the missing monthly partitions from ``first_month`` to ``last_month``.
+    """
+    existing = set(list_partitions(cursor, table))
+    created = []
+    month = first_month
+    while month <= last_month:
+        if partition_name(table, month) not in existing:
+            created.append(create_partition(cursor, table, column, month))
+        month = add_months(month, 1)
+    return created
+
+
+def _table_definition(cursor, table):
+    """
+    Index definitions and outgoing foreign keys to recreate after a rebuild.
+
+    Unique indexes (including the primary key) are left out; the caller
+    supplies them because they change with the partition key.
+    """
+    cursor.execute(
+        """
+        SELECT pg_get_indexdef(indexrelid)
+        FROM pg_index
+        WHERE indrelid = %s::regclass AND NOT indisunique
+        ORDER BY indexrelid
+        """,
+        [table]
+    )
+    indexes = [row[0] for row in cursor.fetchall()]
+
+    cursor.execute(
+        """
+        SELECT conname, pg_get_constraintdef(oid)
+        FROM pg_constraint
+        WHERE conrelid = %s::regclass AND contype = 'f'
+        ORDER BY conname
+        """,
+        [table]
+    )
+    foreign_keys = cursor.fetchall()
+    return indexes, foreign_keys
+
+
+def _rebuild(cursor, table, column, primary_key, unique_indexes, partitioned):
+    old = f'{table}_rebuild'
+    indexes, foreign_keys = _table_definition(cursor, table)
+
+    cursor.execute(f'ALTER TABLE "{table}" RENAME TO "{old}"')
+    cursor.execute(
+        f'CREATE TABLE "{table}" '
+        f'(LIKE "{old}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING IDENTITY)'
+        + (f' PARTITION BY RANGE ("{column}")' if partitioned else '')
+    )
+
+    if partitioned:
+        cursor.execute(f'CREATE TABLE "{table}{DEFAULT_SUFFIX}" PARTITION OF "{table}" DEFAULT')
+        cursor.execute(f'SELECT min("{column}"), now() FROM "{old}"')
+        oldest, now = cursor.fetchone()
+        current = month_start(now)
+        ensure_partitions(
+            cursor, table, column,
+            month_start(oldest) if oldest else current,
+            add_months(current, MONTHS_AHEAD)
+        )
+
+    cursor.execute(f'INSERT INTO "{table}" SELECT * FROM "{old}"')
+    cursor.execute(f'DROP TABLE "{old}"')
+
+    # The identity sequence was recreated; continue from the copied ids and
+    # take back the original sequence name
+    cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+    sequence = cursor.fetchone()[0]
+    cursor.execute(
+        f"SELECT setval(%s, coalesce((SELECT max(id) FROM \"{table}\"), 0) + 1, false)", [sequence]
+    )
+    if sequence.split('.')[-1] != f'{table}_id_seq':
+        cursor.execute(f'ALTER SEQUENCE {sequence} RENAME TO "{table}_id_seq"')
+
+    cursor.execute(
+        f'ALTER TABLE "{table}" ADD CONSTRAINT "{table}_pkey" PRIMARY KEY '
+        f'({", ".join(primary_key)})'
+    )
+    for name, definition in unique_indexes:
+        cursor.execute(f'CREATE UNIQUE INDEX "{name}" ON "{table}" {definition}')
+    for definition in indexes:
+        cursor.execute(definition)
+    for name, definition in foreign_keys:
+        cursor.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{name}" {definition}')
+
+
+def partition_table(cursor, table, column, primary_key, unique_indexes=()):
+    """
+    Rebuild ``table`` as a table partitioned by month on ``column``.
+
+    Existing rows are copied into monthly partitions from the oldest row's
+    month up to ``MONTHS_AHEAD`` months from now. Non-unique indexes,
+    constraints, defaults, the identity sequence and outgoing foreign keys
+    are carried over; ``primary_key`` (a list of columns) and
+    ``unique_indexes`` (``(name, "(columns) ...")`` pairs) must include
+    ``column``. Foreign keys referencing the table must be dropped first.
+    """
+    _rebuild(cursor, table, column, primary_key, unique_indexes, partitioned=True)
+
+
+def unpartition_table(cursor, table, primary_key, unique_indexes=()):
+    """
+    Rebuild a partitioned ``table`` as a plain table; the reverse of
+    ``partition_table``. Detached partitions are not copied back.
+    """
+    _rebuild(cursor, table, None, primary_key, unique_indexes, partitioned=False)
+
+
+def detach_partition(cursor, table, name):
+    """
+    Detach partition ``name`` from ``table``.
+
+    A detached partition keeps the foreign keys it inherited; they are
+    dropped so archived rows don't block deleting live users or partners.
+    """
+    cursor.execute(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"')
+    cursor.execute(
+        "SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'",
+        [name]
+    )
+    for (constraint,) in cursor.fetchall():
+        cursor.execute(f'ALTER TABLE "{name}" DROP CONSTRAINT "{constraint}"')
+
+
+def move_referencing_rows(cursor, partition, table, column, name):
+    """
+    Move the rows of ``table`` whose ``column`` holds an id of a row in
+    ``partition`` into a new table ``name``, to be archived with it.
+    """
+    cursor.execute(f'CREATE TABLE "{name}" (LIKE "{table}" INCLUDING DEFAULTS)')
+    cursor.execute(
+        f'WITH moved AS ('
+        f'DELETE FROM "{table}" WHERE "{column}" IN (SELECT id FROM "{partition}") RETURNING *'
+        f') INSERT INTO "{name}" SELECT * FROM moved'
+    )
+
+
+def archive_to_schema(cursor, name, schema=ARCHIVE_SCHEMA):
+    """
+    Move a detached partition into ``schema``, where it stays queryable.
+    """
+    cursor.execute(f'CREATE SCHEMA IF NOT EXISTS "{schema}"')
+    cursor.execute(f'ALTER TABLE "{name}" SET SCHEMA "{schema}"')
+
+
+def archive_to_file(cursor, name, path):
+    """
+    Write a detached partition to a gzipped CSV file and drop it.
+    """
+    with gzip.open(path, 'wb') as output:
+        cursor.copy_expert(f'COPY "{name}" TO STDOUT WITH (FORMAT csv, HEADER)', output)
+    cursor.execute(f'DROP TABLE "{name}"')
@@ -0,0 +1,268 @@
+"""
+Publish/subscribe for pushing events to connected clients.
+
+Events are dicts with a ``type`` key published to named channels. Each
+event is encoded once at publish time and handed to subscribers as a
+``(type, data)`` pair, ``data`` being the JSON bytes.
+
+The backend is chosen by ``EVENTS_BACKEND``:
+
+- ``InProcessBackend`` (the default) delivers to subscribers in the same
+  process. It needs no extra services, which suits local development and
+  a single server process.
+- ``RedisBackend`` fans events out through Redis pub/sub, so an event
+  published by any worker reaches clients connected to any other.
+
+Subscriber queues are bounded. A subscriber that falls too far behind is
+marked ``overflowed`` and should disconnect; its client reconnects and
+catches up instead of the server buffering without limit.
+
+Async views subscribe with ``asubscribe`` and wait with ``aget``, which
+park on the event loop instead of holding a thread per connection.
+"""
+import asyncio
+import logging
+import queue
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from . import fastjson
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKEND = 'sajilo_life.pubsub.InProcessBackend'
+
+# Events buffered per subscriber before it is cut off
+QUEUE_SIZE = 256
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """
+    The configured backend, created on first use.
+    """
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = import_string(getattr(settings, 'EVENTS_BACKEND', DEFAULT_BACKEND))()
+    return _backend
+
+
+def publish(channels, event):
+    """
+    Publish ``event`` to each of ``channels``.
+
+    Events are best effort: a backend failure is logged, never raised into
+    the request that made the change.
+    """
+    message = (event['type'], fastjson.dumps(event))
+    try:
+        backend = get_backend()
+        for channel in set(channels):
+            backend.publish(channel, message)
+    except Exception:
+        logger.exception('Could not publish %s event', event['type'])
+
+
+def publish_on_commit(channels, event):
+    """
+    Publish once the current transaction commits, so clients never hear
+    about changes that were rolled back.
+    """
+    transaction.on_commit(lambda: publish(channels, event))
+
+
+def subscribe(channels):
+    return get_backend().subscribe(list(channels))
+
+
+async def asubscribe(channels):
+    return await get_backend().asubscribe(list(channels))
+
+
+class InProcessSubscription:
+    def __init__(self, backend, channels, queue_size=QUEUE_SIZE):
+        self.backend = backend
+        self.channels = channels
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.overflowed = False
+        # (loop, event) of an ``aget`` waiting for the next message
+        self.waiter = None
+
+    def put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            self.overflowed = True
+
+        waiter = self.waiter
+        if waiter is not None:
+            loop, event = waiter
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # The waiter's event loop has been closed
+                pass
+
+    def get(self, timeout=None):
+        """
+        The next ``(type, data)`` message, or None after ``timeout`` seconds.
+        """
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    async def aget(self, timeout=None):
+        """
+        ``get`` for async callers; publishers in other threads wake it up.
+        """
+        try:
+            return self.queue.get_nowait()
+        except queue.Empty:
+            pass
+
+        event = asyncio.Event()
+        self.waiter = (asyncio.get_running_loop(), event)
+        try:
+            # Check again: a message may have arrived before the waiter was set
+            if self.queue.empty() and not self.overflowed:
+                await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self.waiter = None
+
+        try:
+            return self.queue.get_nowait()
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.backend.unsubscribe(self)
+
+    async def aclose(self):
+        self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class InProcessBackend:
+    """
+    Deliver events to subscribers in this process.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = defaultdict(set)
+
+    def publish(self, channel, message):
+        with self.lock:
+            subscribers = list(self.subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.put(message)
+
+    def subscribe(self, channels):
+        subscription = InProcessSubscription(self, channels)
+        with self.lock:
+            for channel in channels:
+                self.subscribers[channel].add(subscription)
+        return subscription
+
+    async def asubscribe(self, channels):
+        return self.subscribe(channels)
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            for channel in subscription.channels:
+                subscribers = self.subscribers.get(channel)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.subscribers[channel]
+
+
+class RedisSubscription:
+    def __init__(self, pubsub):
+        self.pubsub = pubsub
+        # Redis buffers for slow subscribers itself
+        self.overflowed = False
+
+    def get(self, timeout=None):
+        message = self.pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        if message is None:
+            return None
+        event_type, _, data = message['data'].partition(b'\n')
+        return event_type.decode(), data
+
+    def close(self):
+        self.pubsub.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class AsyncRedisSubscription(RedisSubscription):
+    """
+    ``RedisSubscription`` over a ``redis.asyncio`` pubsub connection.
+    """
+
+    async def aget(self, timeout=None):
+        message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        if message is None:
+            return None
+        event_type, _, data = message['data'].partition(b'\n')
+        return event_type.decode(), data
+
+    async def aclose(self):
+        await self.pubsub.aclose()
+
+
+class RedisBackend:
+    """
+    Fan events out across processes through Redis pub/sub.
+    """
+
+    prefix = 'events:'
+
+    def __init__(self, url=None):
+        try:
+            import redis
+        except ImportError as exc:
+            raise ImproperlyConfigured('RedisBackend requires the redis package.') from exc
+        self.url = url or settings.EVENTS_REDIS_URL
+        self.client = redis.Redis.from_url(self.url)
+        self.async_client = None
+
+    def publish(self, channel, message):
+        event_type, data = message
+        self.client.publish(self.prefix + channel, event_type.encode() + b'\n' + data)
+
+    def subscribe(self, channels):
+        pubsub = self.client.pubsub()
+        pubsub.subscribe(*[self.prefix + channel for channel in channels])
+        return RedisSubscription(pubsub)
+
+    async def asubscribe(self, channels):
+        if self.async_client is None:
+            import redis.asyncio
+            self.async_client = redis.asyncio.Redis.from_url(self.url)
+        pubsub = self.async_client.pubsub()
+        await pubsub.subscribe(*[self.prefix + channel for channel in channels])
+        return AsyncRedisSubscription(pubsub)
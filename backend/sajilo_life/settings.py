@@ -41,6 +41,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'sajilo_life.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -70,6 +71,12 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'sajilo_life.wsgi.application'
+ASGI_APPLICATION = 'sajilo_life.asgi.application'
+
+# Route the hot read endpoints to async views; asgi.py turns this on
+ASYNC_VIEWS = config('ASYNC_VIEWS', default=False, cast=bool)
+# Requests each ASGI worker process runs at once, each with a database connection
+ASYNC_DB_CONNECTIONS = config('ASYNC_DB_CONNECTIONS', default=20, cast=int)
 
 # Database
 DATABASES = {
@@ -83,6 +90,53 @@ DATABASES = {
     }
 }
 
+# Cache
+# LocMem for local use; point CACHE_BACKEND/CACHE_LOCATION at a shared cache
+# (e.g. django.core.cache.backends.redis.RedisCache) in production.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='sajilo-life'),
+    }
+}
+
+# Cached API responses (see sajilo_life/cache.py), TTLs in seconds
+API_CACHE_ALIAS = config('API_CACHE_ALIAS', default='default')
+API_CACHE_TTLS = {
+    'delivery-statistics': 60,
+    'partner-statistics': 60,
+    'available-partners': 15,
+    'delivery-analytics': 60 * 60 * 24,
+}
+
+# JSON engine for API requests and responses: 'orjson' (falls back to the
+# stdlib when orjson isn't installed) or 'stdlib', see sajilo_life/fastjson.py
+API_JSON_ENGINE = config('API_JSON_ENGINE', default='orjson')
+
+# Response compression (see sajilo_life/compression.py); brotli is used
+# when the brotli package is installed
+API_COMPRESSION_MIN_SIZE = config('API_COMPRESSION_MIN_SIZE', default=1024, cast=int)
+API_COMPRESSION_GZIP_LEVEL = 6
+API_COMPRESSION_BROTLI_QUALITY = 4
+
+# Serialize list pages from .values() rows (see sajilo_life/compiled.py)
+COMPILED_LIST_SERIALIZERS = config('COMPILED_LIST_SERIALIZERS', default=True, cast=bool)
+
+# Successful sync logs older than this are compacted into daily summaries
+# by `manage.py clean_sync_logs` (see delivery/retention.py)
+SYNC_LOG_RETENTION_DAYS = config('SYNC_LOG_RETENTION_DAYS', default=30, cast=int)
+
+# Push events (see sajilo_life/pubsub.py and delivery/events.py). The
+# in-process backend only reaches clients connected to the same process;
+# use sajilo_life.pubsub.RedisBackend with more than one.
+EVENTS_BACKEND = config('EVENTS_BACKEND', default='sajilo_life.pubsub.InProcessBackend')
+EVENTS_REDIS_URL = config('EVENTS_REDIS_URL', default=config('REDIS_URL', default='redis://localhost:6379/0'))
+EVENTS_HEARTBEAT_SECONDS = 15
+# Streams are closed after this long and clients reconnect
+EVENTS_STREAM_SECONDS = config('EVENTS_STREAM_SECONDS', default=300, cast=int)
+# At most one location event per partner this often, in seconds
+EVENTS_LOCATION_INTERVAL = config('EVENTS_LOCATION_INTERVAL', default=5, cast=int)
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -128,6 +182,15 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'sajilo_life.fastjson.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'sajilo_life.fastjson.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_FILTER_BACKENDS': (
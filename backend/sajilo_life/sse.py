@@ -0,0 +1,128 @@
+"""
+Server-sent events (``text/event-stream``) responses.
+
+``astream`` turns a pubsub subscription into SSE frames. A comment line is
+sent every ``EVENTS_HEARTBEAT_SECONDS`` so proxies keep idle connections
+open, and the stream ends after ``EVENTS_STREAM_SECONDS`` so long-lived
+connections are recycled; clients reconnect on their own (``EventSource``
+does after the ``retry`` delay).
+
+Streams are only served by async views under ASGI. A synchronous stream
+would hold a WSGI worker thread for its whole lifetime, and under ASGI
+Django buffers a synchronous streaming response in full.
+"""
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+
+from . import fastjson
+
+CONTENT_TYPE = 'text/event-stream'
+
+DEFAULT_HEARTBEAT_SECONDS = 15
+DEFAULT_STREAM_SECONDS = 300
+
+# Reconnect delay suggested to clients, in milliseconds
+RETRY_MS = 3000
+
+
+def encode_event(event_type, data):
+    """
+    One SSE frame; ``data`` is single-line JSON bytes.
+    """
+    return b'event: ' + event_type.encode() + b'\ndata: ' + data + b'\n\n'
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets DRF accept ``Accept: text/event-stream``; errors raised before the
+    stream starts are sent as a single ``error`` event.
+    """
+    media_type = CONTENT_TYPE
+    format = 'sse'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return encode_event('error', fastjson.dumps(data))
+
+
+def renderer_classes():
+    """
+    Default renderers, plus the event stream.
+    """
+    return list(api_settings.DEFAULT_RENDERER_CLASSES) + [EventStreamRenderer]
+
+
+def stream_limits(heartbeat=None, lifetime=None):
+    """
+    ``(heartbeat, lifetime)`` in seconds, defaulting to the settings.
+    """
+    if heartbeat is None:
+        heartbeat = getattr(settings, 'EVENTS_HEARTBEAT_SECONDS', DEFAULT_HEARTBEAT_SECONDS)
+    if lifetime is None:
+        lifetime = getattr(settings, 'EVENTS_STREAM_SECONDS', DEFAULT_STREAM_SECONDS)
+    return heartbeat, lifetime
+
+
+async def astream(subscription, heartbeat=None, lifetime=None):
+    """
+    Yield SSE frames for ``subscription`` until the lifetime runs out, the
+    subscriber overflows or the client goes away; then unsubscribe.
+    """
+    heartbeat, lifetime = stream_limits(heartbeat, lifetime)
+
+    try:
+        yield f'retry: {RETRY_MS}\n\n'.encode()
+
+        now = time.monotonic()
+        deadline = now + lifetime
+        next_heartbeat = now + heartbeat
+        while now < deadline:
+            message = await subscription.aget(timeout=min(next_heartbeat, deadline) - now)
+            if subscription.overflowed:
+                yield encode_event('overflow', b'{}')
+                return
+            if message is not None:
+                yield encode_event(*message)
+
+            now = time.monotonic()
+            if now >= next_heartbeat:
+                yield b': keepalive\n\n'
+                next_heartbeat = now + heartbeat
+    finally:
+        await subscription.aclose()
+
+
+def release_connection():
+    """
+    Close the database connection unless a transaction is using it; the
+    stream doesn't query and may stay open for minutes.
+    """
+    if not connection.in_atomic_block:
+        connection.close()
+
+
+async def async_event_stream_response(subscription):
+    """
+    A streaming response for ``subscription``, for async views.
+
+    The request's database connection is released first.
+    """
+    # The connection belongs to the thread the view's queries ran in
+    await sync_to_async(release_connection)()
+    return _streaming_response(astream(subscription))
+
+
+def _streaming_response(frames):
+    response = StreamingHttpResponse(frames, content_type=CONTENT_TYPE)
+    response['Cache-Control'] = 'no-cache'
+    # Tell nginx not to buffer the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,203 @@
+import gzip
+import io
+import json
+import uuid
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import skipUnless
+
+from asgiref.sync import iscoroutinefunction
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.http import JsonResponse
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+
+from delivery.models import DeliveryRequest
+
+from . import fastjson, partitions
+from .compression import CompressionMiddleware
+
+User = get_user_model()
+
+
+@override_settings(API_COMPRESSION_MIN_SIZE=0)
+class CompressionTests(APITestCase):
+    """
+    API data formats are compressed; HTML pages are not.
+    """
+    
+    def setUp(self):
+        self.customer = User.objects.create_user(
+            username='customer', email='customer@example.com', password='secret'
+        )
+        self.delivery = DeliveryRequest.objects.create(
+            customer=self.customer,
+            pickup_address='Thamel, Kathmandu', dropoff_address='Jawalakhel, Lalitpur',
+            customer_name='Sita Sharma', customer_phone='+9779800000000'
+        )
+        self.client.force_authenticate(self.customer)
+        self.path = f'/api/delivery/requests/{self.delivery.pk}/'
+    
+    def test_json_is_compressed(self):
+        response = self.client.get(
+            self.path, HTTP_ACCEPT='application/json', HTTP_ACCEPT_ENCODING='gzip'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+    
+    # The browsable API's assets aren't collected in tests
+    @override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+    def test_html_is_not_compressed(self):
+        response = self.client.get(self.path, HTTP_ACCEPT='text/html', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/html'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+    
+    def test_not_modified_carries_the_same_etag(self):
+        headers = {'HTTP_ACCEPT': 'application/json', 'HTTP_ACCEPT_ENCODING': 'gzip'}
+        response = self.client.get(self.path, **headers)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('W/"'))
+        
+        response = self.client.get(self.path, HTTP_IF_NONE_MATCH=etag, **headers)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        
+        response = self.client.get(self.path, HTTP_ACCEPT='application/json')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response['ETag'], etag)
+    
+    async def test_async_stack_stays_async(self):
+        data = {'results': [{'id': pk, 'status': 'pending'} for pk in range(50)]}
+        
+        async def get_response(request):
+            return JsonResponse(data)
+        
+        middleware = CompressionMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        
+        request = AsyncRequestFactory().get('/', headers={'Accept-Encoding': 'gzip'})
+        response = await middleware(request)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.content)), data)
+
+
+@skipUnless(fastjson.orjson is not None, 'orjson is not installed')
+class FastJSONTests(APITestCase):
+    """
+    orjson output and parsing match DRF's stdlib JSON.
+    """
+    
+    def test_renderer_matches_stdlib(self):
+        data = {
+            'id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+            'amount': Decimal('12.50'),
+            'rating': Decimal('4.1'),
+            'created_at': datetime(2026, 3, 1, 9, 30, 15, 123456, tzinfo=dt_timezone.utc),
+            'local_time': datetime(2026, 3, 1, 15, 15, tzinfo=dt_timezone(timedelta(hours=5, minutes=45))),
+            'duration': timedelta(minutes=30),
+            'label': gettext_lazy('Pending'),
+            'notes': 'Leave at the gate \u2028 ठमेल',
+            'items': [None, True, 1.5],
+        }
+        
+        rendered = fastjson.FastJSONRenderer().render(data)
+        self.assertEqual(rendered, JSONRenderer().render(data))
+        self.assertIn(b'"2026-03-01T09:30:15.123456Z"', rendered)
+    
+    def test_parser_rejects_malformed_json(self):
+        parser = fastjson.FastJSONParser()
+        self.assertEqual(parser.parse(io.BytesIO(b'{"a": [1, 2]}')), {'a': [1, 2]})
+        with self.assertRaises(ParseError):
+            parser.parse(io.BytesIO(b'{"a": [1, 2'))
+        
+        user = User.objects.create_user(
+            username='customer', email='customer@example.com', password='secret'
+        )
+        self.client.force_authenticate(user)
+        response = self.client.post(
+            '/api/delivery/sync/bulk/', b'{"requests": [{"local_id": ',
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('JSON parse error', response.data['detail'])
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Partitioning is PostgreSQL only')
+class PartitionTests(TestCase):
+    """
+    Tables are rebuilt as monthly partitions and back, keeping rows and ids.
+    """
+    
+    def setUp(self):
+        self.cursor = connection.cursor()
+        self.addCleanup(self.cursor.close)
+        self.cursor.execute(
+            "CREATE TABLE partition_test ("
+            "id bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY, "
+            "created_at timestamptz NOT NULL, note text NOT NULL DEFAULT '')"
+        )
+        self.cursor.execute("CREATE INDEX partition_test_note ON partition_test (note)")
+        self.insert('2026-01-15', '2026-02-10', '2026-02-20')
+    
+    def insert(self, *days):
+        for day in days:
+            self.cursor.execute(
+                "INSERT INTO partition_test (created_at, note) VALUES (%s, 'x') RETURNING id", [day]
+            )
+        return self.cursor.fetchone()[0]
+    
+    def count(self, table):
+        self.cursor.execute(f'SELECT count(*) FROM "{table}"')
+        return self.cursor.fetchone()[0]
+    
+    def test_partition_and_unpartition(self):
+        partitions.partition_table(self.cursor, 'partition_test', 'created_at', ['id', 'created_at'])
+        
+        self.assertTrue(partitions.is_partitioned(self.cursor, 'partition_test'))
+        names = partitions.list_partitions(self.cursor, 'partition_test')
+        last = partitions.add_months(partitions.month_start(timezone.now()), partitions.MONTHS_AHEAD)
+        self.assertIn('partition_test_default', names)
+        self.assertIn('partition_test_p2026_01', names)
+        self.assertIn(partitions.partition_name('partition_test', last), names)
+        self.assertEqual(self.count('partition_test_p2026_01'), 1)
+        self.assertEqual(self.count('partition_test_p2026_02'), 2)
+        self.cursor.execute(
+            "SELECT indexdef FROM pg_indexes WHERE indexname = 'partition_test_note'"
+        )
+        self.assertIn('(note)', self.cursor.fetchone()[0])
+        # The identity continues after the copied ids
+        self.assertEqual(self.insert('2026-02-21'), 4)
+        
+        partitions.unpartition_table(self.cursor, 'partition_test', ['id'])
+        
+        self.assertFalse(partitions.is_partitioned(self.cursor, 'partition_test'))
+        self.assertEqual(self.count('partition_test'), 4)
+        self.assertEqual(self.insert('2026-02-22'), 5)
+    
+    def test_create_partition_moves_default_rows(self):
+        partitions.partition_table(self.cursor, 'partition_test', 'created_at', ['id', 'created_at'])
+        self.insert('2031-05-01', '2031-06-01')
+        self.assertEqual(self.count('partition_test_default'), 2)
+        
+        name = partitions.create_partition(
+            self.cursor, 'partition_test', 'created_at', date(2031, 5, 1)
+        )
+        
+        self.assertEqual(name, 'partition_test_p2031_05')
+        self.assertEqual(self.count(name), 1)
+        self.assertEqual(self.count('partition_test_default'), 1)
+        self.assertEqual(self.count('partition_test'), 5)
+        self.assertEqual(
+            partitions.ensure_partitions(
+                self.cursor, 'partition_test', 'created_at', date(2031, 5, 1), date(2031, 6, 1)
+            ),
+            ['partition_test_p2031_06']
+        )
+        self.assertEqual(self.count('partition_test_default'), 0)
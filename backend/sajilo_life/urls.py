@@ -10,6 +10,7 @@ from drf_spectacular.views import (
     SpectacularSwaggerView,
     SpectacularRedocView,
 )
+from .views import compression_metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -23,6 +24,9 @@ urlpatterns = [
     path('api/auth/', include('users.urls')),
     path('api/delivery/', include('delivery.urls')),
     path('api/partners/', include('partners.urls')),
+    
+    # Operational metrics
+    path('api/metrics/compression/', compression_metrics_view, name='compression-metrics'),
 ]
 
 # Serve media files in development
@@ -0,0 +1,18 @@
+from rest_framework import permissions
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+
+from users.permissions import IsAdminUser
+from . import compression
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated, IsAdminUser])
+def compression_metrics_view(request):
+    """
+    Per-endpoint response compression metrics for this server process.
+    """
+    return Response({
+        'brotli_available': compression.brotli is not None,
+        'endpoints': compression.stats.snapshot()
+    })
@@ -3,6 +3,13 @@ from django.db import models
 from django.core.validators import RegexValidator
 
 
+def full_name(first_name, last_name, username):
+    """
+    Display name: first and last name, or the username if both are blank.
+    """
+    return f"{first_name} {last_name}".strip() or username
+
+
 class User(AbstractUser):
     """
     Custom User model with role-based authentication.
@@ -51,4 +58,4 @@ class User(AbstractUser):
         return self.role == 'customer'
     
     def get_full_name(self):
-        return f"{self.first_name} {self.last_name}".strip() or self.username 
\ No newline at end of file
+        return full_name(self.first_name, self.last_name, self.username) 
\ No newline at end of file